@@ -1,9 +1,6 @@
 """
 This code block defines:
 
-A Node class to represent a node (city) in the graph with properties
- for its current cost g, heuristic estimate h, and the evaluation function e.
-
 An astar function that implements the A* search algorithm to find the 
 shortest path between a start and goal city within a road map.
 
@@ -13,8 +10,24 @@ and prioritizes nodes with a lower estimated cost.
 A manhattan_distance heuristic function, which calculates an estimated 
 distance between two cities based on their coordinates.
 
-A helper function add_to_open to manage the open set (priority queue) 
-for the A* search.
+A GeodesicHeuristic class, a great-circle (haversine) lower bound
+calibrated against the road lengths so that it is admissible and
+consistent. Cities whose coordinates do not fit their roads are moved
+next to their neighbours before the calibration, so a single bad
+coordinate cannot shrink the bound for the whole network. Unlike manhattan_distance, which adds raw degrees and
+compares them with kilometres, it keeps A* exact.
+
+The open set is a heap of plain (e, g, index) tuples, where
+g(c) is the actual shortest path cost from start to node c,
+h(c) is the heuristic estimate from c to goal and e(c) = g(c) + h(c).
+A best_g list indexed by node replaces the linear scan of the open
+set: a neighbour is only pushed when it improves its best known g,
+and outdated heap entries are skipped when they are popped (lazy
+deletion). h_func is evaluated at most once per node and cached.
+
+A bidirectional_astar function with the same arguments and return
+format. It runs A* from both ends with average potentials built
+from a consistent heuristic and stops with the exact shortest path.
 
 The algorithm searches for the shortest path by exploring the most 
 promising nodes first, based on the cost to reach the node plus the 
@@ -25,64 +38,138 @@ This approach is beneficial for efficient pathfinding in geographic
 information systems and route planning applications.
 """
 
-import heapq
+from heapq import heappush, heappop
 import math
 
-from country_removal_simulation import cities_deleted_c, roads_deleted_c, road_map
-
-
-class Node:
-    # Initialize nodes
-    def __init__(self, city, g, h, parent=None):
-        self.city = city
-        self.parent = parent
-        self.g = g  # g(c): actual shortest path cost from start to node c
-        self.h = h  # h(c): heuristic estimate from c to goal
-        self.e = self.g + self.h  # e(c): evaluation function
-
-    def __lt__(self, other):
-        return self.e < other.e
+from csr_graph import as_csr_graph, check_graph_version
+from dijkstra_shortest_path import join_paths
+from network_api import load_geodesic_heuristic, load_road_graph, load_scenario
 
 
 def astar(start, goal, h_func, road_map, cities_dict4):
     if start not in cities_dict4 or (goal not in cities_dict4):
         return "The chosen city (cities) ar not in the road network"
-    open_heap = []
-    closed_set = set()
-    start_node = Node(start, 0, h_func(start, goal, cities_dict4))
-    heapq.heappush(open_heap, start_node)
+    # road_map may be a dict of dicts or a CSRGraph; nodes are dense indices
+    graph = as_csr_graph(road_map)
+    if start not in graph or goal not in graph:
+        return "The chosen city (cities) ar not in the road network"
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    city_ids = graph.city_ids
+    source = graph.index_of[start]
+    goal_index = graph.index_of[goal]
+
+    best_g = [float("inf")] * len(graph)
+    parent = [-1] * len(graph)
+    h_cache = [None] * len(graph)
+    closed = bytearray(len(graph))
+
+    best_g[source] = 0
+    h_cache[source] = h_func(start, goal, cities_dict4)
+    open_heap = [(h_cache[source], 0, source)]
 
     while open_heap:
-        current_node = heapq.heappop(open_heap)
-        closed_set.add(current_node.city)
+        e, g, current = heappop(open_heap)
+        if closed[current] or g > best_g[current]:
+            # outdated entry, a better one was pushed later
+            continue
+        closed[current] = 1
 
-        if current_node.city == goal:
+        if current == goal_index:
             path = []
-            while current_node is not None:
-                path.append((current_node.city, current_node.g))
-                current_node = current_node.parent
+            while current != -1:
+                path.append((city_ids[current], best_g[current]))
+                current = parent[current]
             return path[::-1]  # Return reversed path
 
-        neighbors = road_map.get(current_node.city, {})
-        for neighbor_city, road_distance in neighbors.items():
-            if neighbor_city in closed_set:
+        start_edge, end_edge = offsets[current], offsets[current + 1]
+        for neighbor, road_distance in zip(
+            targets[start_edge:end_edge], weights[start_edge:end_edge]
+        ):
+            if closed[neighbor]:
                 continue
 
-            g = current_node.g + road_distance
-            h = h_func(neighbor_city, goal, cities_dict4)
-            neighbor_node = Node(neighbor_city, g, h, current_node)
+            g_neighbor = g + road_distance
+            if g_neighbor >= best_g[neighbor]:
+                continue
+            best_g[neighbor] = g_neighbor
+            parent[neighbor] = current
 
-            if add_to_open(open_heap, neighbor_node):
-                heapq.heappush(open_heap, neighbor_node)
+            h = h_cache[neighbor]
+            if h is None:
+                h = h_func(city_ids[neighbor], goal, cities_dict4)
+                h_cache[neighbor] = h
+            heappush(open_heap, (g_neighbor + h, g_neighbor, neighbor))
 
     print(f"There is no path from {start} to {goal}.")
 
 
-def add_to_open(open_heap, neighbor_node):
-    for node in open_heap:
-        if neighbor_node.city == node.city and neighbor_node.g >= node.g:
-            return False
-    return True
+def bidirectional_astar(start, goal, h_func, road_map, cities_dict4):
+    # Bidirectional A* with the average potentials
+    #   p_f(v) = (h(v, goal) - h(v, start)) / 2   and   p_b(v) = -p_f(v).
+    # Both searches then see the same non-negative reduced road lengths,
+    # and the search can stop once key_f + key_b >= mu, where the keys are
+    # g_f(v) + p_f(v) and g_b(v) - p_f(v) and mu is the best connection.
+    # h_func must be consistent (GeodesicHeuristic is; manhattan is not).
+    if start not in cities_dict4 or (goal not in cities_dict4):
+        return "The chosen city (cities) ar not in the road network"
+    graph = as_csr_graph(road_map)
+    if start not in graph or goal not in graph:
+        return "The chosen city (cities) ar not in the road network"
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    city_ids = graph.city_ids
+    source = graph.index_of[start]
+    goal_index = graph.index_of[goal]
+
+    potential_cache = [None] * len(graph)
+
+    def potential(v):
+        p = potential_cache[v]
+        if p is None:
+            city = city_ids[v]
+            to_goal = h_func(city, goal, cities_dict4)
+            p = (to_goal - h_func(city, start, cities_dict4)) / 2
+            potential_cache[v] = p
+        return p
+
+    inf = float("inf")
+    best_g = ([inf] * len(graph), [inf] * len(graph))
+    parent = ([-1] * len(graph), [-1] * len(graph))
+    best_g[0][source] = 0
+    best_g[1][goal_index] = 0
+    open_heaps = (
+        [(potential(source), 0, source)],
+        [(-potential(goal_index), 0, goal_index)],
+    )
+    sign = (1, -1)
+    mu, meet = (0, source) if source == goal_index else (inf, -1)
+
+    while open_heaps[0] and open_heaps[1]:
+        if open_heaps[0][0][0] + open_heaps[1][0][0] >= mu:
+            break
+        side = 0 if open_heaps[0][0][0] <= open_heaps[1][0][0] else 1
+        g_side, g_other, parent_side = best_g[side], best_g[1 - side], parent[side]
+
+        e, g, current = heappop(open_heaps[side])
+        if g > g_side[current]:
+            continue
+        start_edge, end_edge = offsets[current], offsets[current + 1]
+        for neighbor, road_distance in zip(
+            targets[start_edge:end_edge], weights[start_edge:end_edge]
+        ):
+            g_neighbor = g + road_distance
+            if g_neighbor < g_side[neighbor]:
+                g_side[neighbor] = g_neighbor
+                parent_side[neighbor] = current
+                key = g_neighbor + sign[side] * potential(neighbor)
+                heappush(open_heaps[side], (key, g_neighbor, neighbor))
+            if g_side[neighbor] + g_other[neighbor] < mu:
+                mu = g_side[neighbor] + g_other[neighbor]
+                meet = neighbor
+
+    if meet == -1:
+        print(f"There is no path from {start} to {goal}.")
+        return None
+    return join_paths(graph, best_g[0], parent[0], parent[1], meet)
 
 
 def manhattan_distance(city, goal, cities_dict4):
@@ -102,11 +189,173 @@ def h_func(city, goal, cities_dict4):
     return manhattan_distance(city, goal, cities_dict4)
 
 
+EARTH_RADIUS_KM = 6371.0088
+
+# A road shorter than this share of the median road / great-circle ratio
+# cannot connect the coordinates of its ends; one of them is misplaced
+OUTLIER_RATIO = 0.5
+
+
+def haversine_distance(city, goal, cities_dict4):
+    # Great-circle distance in km between the coordinates of two cities
+    lat1, lon1 = map(math.radians, cities_dict4[city].coordinate_x_y)
+    lat2, lon2 = map(math.radians, cities_dict4[goal].coordinate_x_y)
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(h, 1.0)))
+
+
+class GeodesicHeuristic:
+    # Admissible and consistent heuristic: h(v) = scale * haversine(v, goal).
+    # The scale is the smallest ratio road distance / great-circle distance
+    # over all roads, so h(u) - h(v) <= scale * haversine(u, v) <= distance(u, v)
+    # holds for every road, even when some roads in the data are shorter
+    # than the straight line. Cities with implausible coordinates would
+    # drive the scale towards 0, so they are moved first (see
+    # _relocate_outliers). Coordinates are kept in contiguous arrays
+    # indexed by the dense node index of the graph.
+
+    def __init__(self, graph, latitude, longitude, outlier_ratio=OUTLIER_RATIO):
+        import numpy as np
+
+        self.graph = graph
+        self.graph_version = graph.version
+        self.latitude = np.radians(np.asarray(latitude, dtype=np.float64))
+        self.longitude = np.radians(np.asarray(longitude, dtype=np.float64))
+        self.cos_latitude = np.cos(self.latitude)
+        self.relocated = self._relocate_outliers(outlier_ratio)
+        # Plain lists for the scalar lookups done by astar()
+        self._lat = self.latitude.tolist()
+        self._lon = self.longitude.tolist()
+        self._cos = self.cos_latitude.tolist()
+        self.scale = self._calibrate()
+
+    @classmethod
+    def from_cities(cls, graph, cities_dict4, outlier_ratio=OUTLIER_RATIO):
+        coordinates = [cities_dict4[city].coordinate_x_y for city in graph.city_ids]
+        return cls(
+            graph,
+            [latitude for latitude, _ in coordinates],
+            [longitude for _, longitude in coordinates],
+            outlier_ratio,
+        )
+
+    def _haversine(self, sources, targets):
+        import numpy as np
+
+        h = (
+            np.sin((self.latitude[targets] - self.latitude[sources]) / 2) ** 2
+            + self.cos_latitude[sources]
+            * self.cos_latitude[targets]
+            * np.sin((self.longitude[targets] - self.longitude[sources]) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+    def _relocate_outliers(self, outlier_ratio):
+        # Finds the roads whose length is implausibly short for the distance
+        # between their ends and blames the end with the larger share of such
+        # roads (Montreuil, 416, sits 194 km from a neighbour 10 km away).
+        # Each blamed city is moved to the candidate position (its own, the
+        # mean of its neighbours or one of theirs) where its worst road fits
+        # best. The heuristic only has to be consistent for the coordinates
+        # it uses, so A* stays exact. Returns the moved cities.
+        import numpy as np
+
+        offsets, targets, weights, city_ids = self.graph.as_numpy()
+        sources = np.repeat(np.arange(len(self.graph)), np.diff(offsets))
+        great_circle = self._haversine(sources, targets)
+        positive = great_circle > 0
+        if not positive.any():
+            return []
+        ratio = np.full(len(targets), np.inf)
+        ratio[positive] = weights[positive] / great_circle[positive]
+        implausible = ratio < outlier_ratio * np.median(ratio[positive])
+        if not implausible.any():
+            return []
+
+        share = np.bincount(sources[implausible], minlength=len(self.graph)) / (
+            np.maximum(np.diff(offsets), 1)
+        )
+        blamed = np.where(share[sources] >= share[targets], sources, targets)
+        relocated = []
+        for v in np.unique(blamed[implausible]).tolist():
+            neighbors = targets[offsets[v] : offsets[v + 1]]
+            roads = weights[offsets[v] : offsets[v + 1]]
+            candidates = [(self.latitude[v], self.longitude[v])]
+            candidates.append(
+                (self.latitude[neighbors].mean(), self.longitude[neighbors].mean())
+            )
+            candidates.extend(zip(self.latitude[neighbors], self.longitude[neighbors]))
+
+            def worst_ratio(position):
+                self.latitude[v], self.longitude[v] = position
+                self.cos_latitude[v] = np.cos(position[0])
+                distance = self._haversine(np.full_like(neighbors, v), neighbors)
+                with np.errstate(divide="ignore"):
+                    return np.min(roads / distance, initial=np.inf)
+
+            best = max(candidates, key=worst_ratio)
+            worst_ratio(best)
+            if best != candidates[0]:
+                relocated.append(int(city_ids[v]))
+        return relocated
+
+    def _calibrate(self):
+        import numpy as np
+
+        offsets, targets, weights, _ = self.graph.as_numpy()
+        if len(targets) == 0:
+            return 1.0
+        sources = np.repeat(np.arange(len(self.graph)), np.diff(offsets))
+        great_circle = self._haversine(sources, targets)
+        positive = great_circle > 0
+        if not positive.any():
+            return 1.0
+        # a tiny safety margin keeps rounding errors from breaking consistency
+        return float(np.min(weights[positive] / great_circle[positive])) * (1 - 1e-9)
+
+    def potentials(self, goal):
+        # Vectorised h(v) for every node v towards goal (a city code)
+        import numpy as np
+
+        check_graph_version(self.graph, self.graph_version, "geodesic heuristic")
+        goal_index = self.graph.index_of[goal]
+        nodes = np.arange(len(self.graph))
+        return self.scale * self._haversine(nodes, np.full_like(nodes, goal_index))
+
+    def __call__(self, city, goal, cities_dict4=None):
+        if self.graph.version != self.graph_version:
+            check_graph_version(self.graph, self.graph_version, "geodesic heuristic")
+        u = self.graph.index_of[city]
+        v = self.graph.index_of[goal]
+        h = (
+            math.sin((self._lat[v] - self._lat[u]) / 2) ** 2
+            + self._cos[u]
+            * self._cos[v]
+            * math.sin((self._lon[v] - self._lon[u]) / 2) ** 2
+        )
+        return self.scale * 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(h, 1.0)))
+
+    def __repr__(self):
+        return f"GeodesicHeuristic(scale={self.scale:.3f}, relocated={self.relocated})"
+
+
 # Example usage:
+def main(removed_countries=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+    geodesic = load_geodesic_heuristic(removed_countries)
+    print(f"Calibrated heuristic: {geodesic}")
+
+    # Barcelona to Bari
+    path_astar = astar(43, 44, geodesic, road_graph, cities_deleted_c)
+    # Aachen to Bologna
+    path_astar2 = astar(2, 79, geodesic, road_graph, cities_deleted_c)
+    print(path_astar)
+    print(path_astar2)
+
 
-# Barcelona to Bari
-path_astar = astar(43, 44, h_func, road_map, cities_deleted_c)
-# Aachen to Bologna
-path_astar2 = astar(2, 79, h_func, road_map, cities_deleted_c)
-print(path_astar)
-print(path_astar2)
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 """
-This code block defines and executes a function that:
+This code block defines and (when run) executes a function that:
 
 Runs both Dijkstra's algorithm and the A* algorithm 200 times 
 with randomly chosen pairs of cities from the updated road network.
@@ -11,10 +11,15 @@ Collects the length of the path found by each algorithm and the corresponding ru
 
 Calculates the average runtime for paths of the same length.
 
-Saves the path lengths and their respective average runtimes to a file named data_runtime.txt.
+Saves the path lengths and runtimes of the run to a file named data_runtime.txt.
 
 Plots the average runtimes against the path lengths for both algorithms, 
-generating a graph that visualizes the performance comparison.
+generating a graph that visualizes the performance comparison. 
+The plot is saved to runtime_analysis.png, so the analysis also runs 
+without a display.
+
+For percentiles, settled nodes and heap pushes on a fixed, seeded set 
+of queries, and for comparisons with an earlier run, use benchmark.py.
 
 -----
 
@@ -27,8 +32,8 @@ algorithm for real-world applications where performance is critical.
 
 import random
 
-from country_removal_simulation import cities_deleted_c, road_map
-from Astar_pathfinding import astar, h_func
+from network_api import load_geodesic_heuristic, load_road_graph, load_scenario
+from Astar_pathfinding import astar
 from dijkstra_shortest_path import dijkstra
 
 import time
@@ -36,102 +41,67 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
 
 
-def run_time_analysis():
+def average_runtimes(x_values, y_values):
+    # Average runtime per path length in a single pass over the measurements
+    totals = {}
+    for length, runtime in zip(x_values, y_values):
+        total, count = totals.get(length, (0.0, 0))
+        totals[length] = (total + runtime, count + 1)
+    unique_lengths = sorted(totals)
+    return unique_lengths, [
+        totals[length][0] / totals[length][1] for length in unique_lengths
+    ]
+
+
+def run_time_analysis(
+    road_graph,
+    cities_deleted_c,
+    h_func,
+    repetitions=200,
+    seed=None,
+    data_path="data_runtime.txt",
+    plot_path="runtime_analysis.png",
+):
     # initialize list to hold x and y values for plotting
     x_dijkstra = []
     y_dijkstra = []
     x_astar = []
     y_astar = []
 
-    try:
-        with open("data_runtime.txt", "r") as data:
-
-            for i, line in enumerate(data, 1):
-                if i == 1:
-                    x_dijkstra = line.split(",")[:-1]
-                elif i == 2:
-                    y_dijkstra = line.split(",")[:-1]
-                elif i == 3:
-                    x_astar = line.split(",")[:-1]
-                elif i == 4:
-                    y_astar = line.split(",")[:-1]
-    except:
-        with open("data_runtime.txt", "w") as data:
-            pass
-
-    for rep in range(200):
-        city1 = random.choice(list(cities_deleted_c.keys()))
-        city2 = random.choice(list(cities_deleted_c.keys()))
-
-        # print(f"\n{city1} --> {city2}")#\nDijkstra:")
+    rng = random.Random(seed)
+    cities = list(cities_deleted_c.keys())
+    for rep in range(repetitions):
+        city1 = rng.choice(cities)
+        city2 = rng.choice(cities)
+
         start_time_d = time.perf_counter()
-        dijkstra_imp = dijkstra(road_map, city1, city2, cities_deleted_c)
+        dijkstra_imp = dijkstra(road_graph, city1, city2, cities_deleted_c)
         end_time_d = time.perf_counter()
-        runtime_d = float((end_time_d - start_time_d) * 1000)  # Convert to milliseconds
-        # print(runtime_d)
-        len_dijk = int(len(dijkstra_imp))
-        # print(len_dijk)
+        runtime_d = (end_time_d - start_time_d) * 1000  # Convert to milliseconds
 
-        if len_dijk >= 1:
-            x_dijkstra.append(len_dijk)
+        if dijkstra_imp:
+            x_dijkstra.append(len(dijkstra_imp))
             y_dijkstra.append(runtime_d)
 
-        # print(f"\n{city1} --> {city2}")#\nA*:")
         start_time_a = time.perf_counter()
-        astar_imp = astar(city1, city2, h_func, road_map, cities_deleted_c)
+        astar_imp = astar(city1, city2, h_func, road_graph, cities_deleted_c)
         end_time_a = time.perf_counter()
-        runtime_a = float((end_time_a - start_time_a) * 1000)  # Convert to milliseconds
-        # print(runtime_a)
-
-        try:
-            len_astar = int(len(astar_imp))
-            # print(len_astar)
-        except:
-            len_astar = 0
-            # print(len_astar)
-
-        if len_astar >= 1:
-            x_astar.append(len_astar)
+        runtime_a = (end_time_a - start_time_a) * 1000  # Convert to milliseconds
+
+        # astar returns a message or None when there is no path
+        if isinstance(astar_imp, list) and astar_imp:
+            x_astar.append(len(astar_imp))
             y_astar.append(runtime_a)
 
-        def average_runtimes(x_values, y_values):
-            unique_lengths = sorted(set(x_values))
-            indices_per_length = {
-                length: [i for i, x in enumerate(x_values) if x == length]
-                for length in unique_lengths
-            }
-            return [
-                sum(y_values[i] for i in indices) / len(indices)
-                for length, indices in indices_per_length.items()
-            ]
-
-        x_dijkstra = [int(len_dijk) for len_dijk in x_dijkstra]
-        x_astar = [int(len_astar) for len_astar in x_astar]
-        y_dijkstra = [float(runtime_d) for runtime_d in y_dijkstra]
-        y_astar = [float(runtime_a) for runtime_a in y_astar]
-
-        y_dijkstra_averages = average_runtimes(x_dijkstra, y_dijkstra)
-        y_astar_averages = average_runtimes(x_astar, y_astar)
-
-        # Unique lengths are sorted
-        x_dijkstra_unique = sorted(set(x_dijkstra))
-        x_astar_unique = sorted(set(x_astar))
-
-    if len_dijk and len_astar:
-        with open("data_runtime.txt", "w") as data:
-            for item in x_dijkstra:
-                data.write(str(item) + ",")
-            data.write("\n")
-            for item in y_dijkstra:
-                data.write(str(item) + ",")
-            data.write("\n")
-            for item in x_astar:
-                data.write(str(item) + ",")
-            data.write("\n")
-            for item in y_astar:
-                data.write(str(item) + ",")
-
-        data.close()
+    # Averages are computed once, after all measurements
+    x_dijkstra_unique, y_dijkstra_averages = average_runtimes(x_dijkstra, y_dijkstra)
+    x_astar_unique, y_astar_averages = average_runtimes(x_astar, y_astar)
+
+    # The file holds the measurements of this run only
+    if data_path:
+        with open(data_path, "w") as data:
+            for values in (x_dijkstra, y_dijkstra, x_astar, y_astar):
+                data.write("".join(str(item) + "," for item in values) + "\n")
 
     plt.plot(x_dijkstra_unique, y_dijkstra_averages, "o-", label="Dijkstra")
     plt.plot(x_astar_unique, y_astar_averages, "o-", label="A*")
@@ -148,9 +118,24 @@ def run_time_analysis():
     # Display legend
     plt.legend()
 
-    # Show plot
-    plt.show()
+    # Save the plot instead of blocking on a window
+    if plot_path:
+        plt.savefig(plot_path)
+        print(f"Runtime plot written to {plot_path}")
+    plt.close()
+
+    return (x_dijkstra_unique, y_dijkstra_averages), (x_astar_unique, y_astar_averages)
+
+
+def main(removed_countries=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    # Run the analysis
+    run_time_analysis(
+        load_road_graph(removed_countries),
+        cities_deleted_c,
+        load_geodesic_heuristic(removed_countries),
+    )
 
 
-# Run the analysis
-run_time_analysis()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+This code block defines an arc-flags index that lets point-to-point
+searches skip roads that cannot lead to the destination:
+
+The cities are partitioned into regions. By default a region is a
+country (City.country_n); with levels > 0 every country is split
+further into up to 2**levels parts by repeatedly cutting it at the
+median latitude or longitude (the longer side).
+
+Every road direction (arc) gets a bitset with one flag per region:
+the flag of region R is set if the arc starts a shortest path to some
+city in R. ArcFlags.build computes the flags from the boundary cities
+of each region, the cities with a road into another region (with
+countries as regions these are the ends of the cross-country roads
+counted by road_connectivity_analysis.py). Any shortest path into R
+either stays inside R or enters it through a boundary city, so it is
+enough to:
+    - set flag R on every arc between two cities of R, and
+    - run one full Dijkstra search from every boundary city b of R
+      and set flag R on every arc u -> v with d(u, b) = w(u, v) + d(v, b).
+The roads are undirected, so the search from b gives the distances
+towards b as well.
+
+The queries (query, search, astar) work like dijkstra() and astar()
+but ignore every arc whose flag for the destination's region is not
+set, so they settle far fewer cities, most of them on the way to the
+destination. The paths found are shortest paths.
+
+The index can be saved to and loaded from an .npz file; loading
+checks that the file belongs to the same graph. Queries are refused
+once the roads of the graph change in place (CSRGraph.set_distance).
+"""
+
+from heapq import heappush, heappop
+import random
+import time
+
+import numpy as np
+
+from csr_graph import as_csr_graph, check_graph_version
+from dijkstra_shortest_path import build_path, dijkstra, dijkstra_search
+from distance_matrix import graph_fingerprint
+from network_api import load_geodesic_heuristic, load_road_graph, load_scenario
+
+ARC_FLAGS_FORMAT_VERSION = 1
+
+
+def country_regions(graph, cities_dict):
+    # Region (dense country number) of every node, and the country codes
+    countries = [cities_dict[city].country_n for city in graph.city_ids]
+    codes = sorted(set(countries))
+    number = {code: region for region, code in enumerate(codes)}
+    return np.array([number[code] for code in countries], dtype=np.int32), codes
+
+
+def kd_partition(regions, latitude, longitude, levels):
+    # Split every region into up to 2**levels parts at the median of its
+    # longer side; returns the new dense region numbers
+    regions = np.asarray(regions, dtype=np.int64)
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    for level in range(levels):
+        refined = regions * 2
+        for region in np.unique(regions):
+            members = np.flatnonzero(regions == region)
+            if len(members) < 2:
+                continue
+            spread_lat = np.ptp(latitude[members])
+            spread_lon = np.ptp(longitude[members])
+            values = (
+                latitude[members] if spread_lat >= spread_lon else longitude[members]
+            )
+            upper = values > np.median(values)
+            refined[members[upper]] += 1
+        regions = refined
+    _, regions = np.unique(regions, return_inverse=True)
+    return regions.astype(np.int32)
+
+
+class ArcFlags:
+    def __init__(self, graph, regions, flags, fingerprint=None):
+        self.graph = graph
+        self.graph_version = graph.version
+        self.regions = np.asarray(regions, dtype=np.int32)
+        # flags[arc] holds the region bits of the arc, packed (np.packbits)
+        self.flags = np.asarray(flags, dtype=np.uint8)
+        self.fingerprint = fingerprint or graph_fingerprint(graph)
+        self._region_of = self.regions.tolist()
+        self._columns = {}
+
+    @classmethod
+    def build(cls, map, cities_dict, levels=0, regions=None):
+        # regions: optional region number per dense node, else countries
+        # (refined by kd_partition when levels > 0)
+        graph = as_csr_graph(map)
+        if regions is None:
+            regions, _ = country_regions(graph, cities_dict)
+            if levels:
+                coordinates = [
+                    cities_dict[city].coordinate_x_y for city in graph.city_ids
+                ]
+                regions = kd_partition(
+                    regions,
+                    [latitude for latitude, _ in coordinates],
+                    [longitude for _, longitude in coordinates],
+                    levels,
+                )
+        regions = np.asarray(regions, dtype=np.int32)
+        region_count = int(regions.max()) + 1 if len(regions) else 0
+
+        offsets, targets, weights, _ = graph.as_numpy()
+        sources = np.repeat(np.arange(len(graph)), np.diff(offsets))
+        flags = np.zeros((len(targets), region_count), dtype=bool)
+
+        # arcs inside a region
+        inside = regions[sources] == regions[targets]
+        flags[inside, regions[sources[inside]]] = True
+
+        # boundary cities: tails of the arcs that leave their region
+        boundary = np.unique(sources[~inside])
+        for b in boundary.tolist():
+            dist = np.array(dijkstra_search(graph, b)[0])
+            reached = np.isfinite(dist[targets])
+            on_path = reached & (dist[sources] == weights + dist[targets])
+            flags[on_path, regions[b]] = True
+
+        return cls(graph, regions, np.packbits(flags, axis=1))
+
+    def __len__(self):
+        # number of regions
+        return int(self.regions.max()) + 1 if len(self.regions) else 0
+
+    def boundary_count(self):
+        offsets, targets, _, _ = self.graph.as_numpy()
+        sources = np.repeat(np.arange(len(self.graph)), np.diff(offsets))
+        return len(np.unique(sources[self.regions[sources] != self.regions[targets]]))
+
+    def flag_share(self):
+        # Average share of the regions flagged per arc (lower prunes more)
+        if not len(self.flags):
+            return 0.0
+        bits = np.unpackbits(self.flags, axis=1, count=len(self))
+        return float(bits.mean())
+
+    def _column(self, region):
+        # bytearray with the flag of region for every arc, cached per region
+        column = self._columns.get(region)
+        if column is None:
+            bits = (self.flags[:, region >> 3] >> (7 - (region & 7))) & 1
+            column = bytearray(bits.astype(np.uint8).tobytes())
+            self._columns[region] = column
+        return column
+
+    def search(self, source, target):
+        # dijkstra_search from dense index source to target, skipping the
+        # arcs that are not flagged for the region of target
+        check_graph_version(self.graph, self.graph_version, "arc flags")
+        graph = self.graph
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        allowed = self._column(self._region_of[target])
+        dist = [float("inf")] * len(graph)
+        pred = [-1] * len(graph)
+        dist[source] = 0
+        priority_queue = [(0, source)]
+
+        while priority_queue:
+            d, v = heappop(priority_queue)
+            if d > dist[v]:
+                continue
+            if v == target:
+                break
+            start, end = offsets[v], offsets[v + 1]
+            for w, road_distance, flagged in zip(
+                targets[start:end], weights[start:end], allowed[start:end]
+            ):
+                if not flagged:
+                    continue
+                distance = d + road_distance
+                if distance < dist[w]:
+                    dist[w] = distance
+                    pred[w] = v
+                    heappush(priority_queue, (distance, w))
+
+        return dist, pred
+
+    def query(self, origin, destination):
+        # Same arguments (without cities_dict) and result as dijkstra()
+        graph = self.graph
+        if origin not in graph or destination not in graph:
+            print(f"No path from {origin} to {destination}")
+            return []
+        target = graph.index_of[destination]
+        dist, pred = self.search(graph.index_of[origin], target)
+        if dist[target] == float("inf"):
+            print(f"No path from {origin} to {destination}")
+            return []
+        return build_path(graph, dist, pred, target)
+
+    def astar(self, start, goal, h_func, cities_dict4=None):
+        # astar() with the arc flags of the goal's region
+        check_graph_version(self.graph, self.graph_version, "arc flags")
+        graph = self.graph
+        if start not in graph or goal not in graph:
+            return "The chosen city (cities) ar not in the road network"
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        city_ids = graph.city_ids
+        source = graph.index_of[start]
+        goal_index = graph.index_of[goal]
+        allowed = self._column(self._region_of[goal_index])
+
+        best_g = [float("inf")] * len(graph)
+        parent = [-1] * len(graph)
+        h_cache = [None] * len(graph)
+        closed = bytearray(len(graph))
+        best_g[source] = 0
+        h_cache[source] = h_func(start, goal, cities_dict4)
+        open_heap = [(h_cache[source], 0, source)]
+
+        while open_heap:
+            e, g, current = heappop(open_heap)
+            if closed[current] or g > best_g[current]:
+                continue
+            closed[current] = 1
+            if current == goal_index:
+                return build_path(graph, best_g, parent, current)
+
+            start_edge, end_edge = offsets[current], offsets[current + 1]
+            for neighbor, road_distance, flagged in zip(
+                targets[start_edge:end_edge],
+                weights[start_edge:end_edge],
+                allowed[start_edge:end_edge],
+            ):
+                if not flagged or closed[neighbor]:
+                    continue
+                g_neighbor = g + road_distance
+                if g_neighbor >= best_g[neighbor]:
+                    continue
+                best_g[neighbor] = g_neighbor
+                parent[neighbor] = current
+                h = h_cache[neighbor]
+                if h is None:
+                    h = h_func(city_ids[neighbor], goal, cities_dict4)
+                    h_cache[neighbor] = h
+                heappush(open_heap, (g_neighbor + h, g_neighbor, neighbor))
+
+        print(f"There is no path from {start} to {goal}.")
+
+    def save(self, path):
+        np.savez(
+            path,
+            format_version=np.array(ARC_FLAGS_FORMAT_VERSION),
+            fingerprint=np.array(self.fingerprint),
+            regions=self.regions,
+            flags=self.flags,
+        )
+
+    @classmethod
+    def load(cls, path, map):
+        graph = as_csr_graph(map)
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != ARC_FLAGS_FORMAT_VERSION:
+                raise ValueError(
+                    f"Arc flags '{path}' have format version {version}, "
+                    f"expected {ARC_FLAGS_FORMAT_VERSION}."
+                )
+            fingerprint = str(data["fingerprint"])
+            if fingerprint != graph_fingerprint(graph):
+                raise ValueError(f"Arc flags '{path}' were built for another graph.")
+            return cls(graph, data["regions"], data["flags"], fingerprint)
+
+
+def compare_with_dijkstra(flags, map, cities_dict, repetitions=100, seed=None):
+    # Returns the number of pairs where the arc-flags query and Dijkstra
+    # disagree
+    rng = random.Random(seed)
+    cities = list(cities_dict.keys())
+    mismatches = 0
+    for rep in range(repetitions):
+        city1 = rng.choice(cities)
+        city2 = rng.choice(cities)
+        path_flags = flags.query(city1, city2)
+        path_dijkstra = dijkstra(map, city1, city2, cities_dict)
+        distance_flags = path_flags[-1][-1] if path_flags else None
+        distance_dijkstra = path_dijkstra[-1][-1] if path_dijkstra else None
+        if distance_flags != distance_dijkstra:
+            mismatches += 1
+            print(
+                f"{city1} --> {city2} | Arc flags != Dijkstra |",
+                f"Distance arc flags: {distance_flags}",
+                f"Distance Dijkstra: {distance_dijkstra}",
+            )
+    print(
+        f"| Arc flags == Dijkstra | on {repetitions - mismatches}/{repetitions} pairs"
+    )
+    return mismatches
+
+
+def main(removed_countries=None, levels=0, index_path=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+
+    start_time = time.perf_counter()
+    flags = ArcFlags.build(road_graph, cities_deleted_c, levels)
+    print(
+        f"Arc flags for {len(flags)} regions ({flags.boundary_count()} boundary cities)",
+        f"in {time.perf_counter() - start_time:.2f} s,",
+        f"{flags.flag_share():.1%} of the region flags set",
+    )
+    if index_path:
+        flags.save(index_path)
+        flags = ArcFlags.load(index_path, road_graph)
+        print(f"Arc flags written to {index_path}")
+
+    compare_with_dijkstra(flags, road_graph, cities_deleted_c, repetitions=200)
+
+    geodesic = load_geodesic_heuristic(removed_countries)
+    cities = list(cities_deleted_c.keys())
+    pairs = [(random.choice(cities), random.choice(cities)) for _ in range(500)]
+    for name, run in (
+        ("Dijkstra", lambda a, b: dijkstra(road_graph, a, b, cities_deleted_c)),
+        ("Arc flags", flags.query),
+        ("Arc flags + A*", lambda a, b: flags.astar(a, b, geodesic)),
+    ):
+        start_time = time.perf_counter()
+        for city1, city2 in pairs:
+            run(city1, city2)
+        query_time = (time.perf_counter() - start_time) / len(pairs) * 1000
+        print(f"Average {name} query: {query_time:.4f} ms")
+    return flags
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+Runtime analysis:
+
+Preprocessing:
+One full Dijkstra search per boundary city, O(B (V+E) log V), plus an
+O(E) vectorised pass per search to mark the arcs. Memory is
+E * ceil(R / 8) bytes for R regions.
+
+Query:
+The same O((V+E) log V) bound as Dijkstra, but only the arcs flagged
+for the destination's region are relaxed, so the search stays close
+to the shortest paths into that region.
+"""
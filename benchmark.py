@@ -0,0 +1,470 @@
+"""
+This code block defines a headless benchmark suite for the
+point-to-point queries of the project (Dijkstra, A*, their
+bidirectional variants, A* with landmarks, arc flags and Contraction
+Hierarchies):
+
+"stratified_queries" draws a fixed, seeded query set. Every query is
+a reachable pair of cities, and the pairs are spread evenly over
+strata of path length (the number of roads on the shortest path,
+1-7, 8-15, 16-31, 32-63 and 64+ by default), so short and long
+routes weigh the same in the results. The distances and path lengths
+are read from the distance matrix of the scenario (distance_matrix.py).
+
+"run_benchmark" prepares each algorithm (preprocessing time is
+reported separately), runs a few warmup queries and then times every
+query with the garbage collector switched off. The latency of a
+query is the median of its repetitions. A second, untimed pass counts
+the settled nodes and heap pushes of every query and checks the
+distance against plain Dijkstra.
+
+The result is reported per algorithm and per stratum as p50, p95 and
+p99 latency in milliseconds plus the mean number of settled nodes and
+heap pushes, and written as JSON. "compare_with_baseline" compares a
+result with a stored one and lists every metric that got worse by
+more than the tolerance:
+
+    python benchmark.py -o bench.json --seed 1
+    python benchmark.py -o bench.json --seed 1 --baseline baseline.json
+
+With --baseline the exit status is 1 when a regression was found.
+"""
+
+import argparse
+from contextlib import contextmanager
+import gc
+import heapq
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import Astar_pathfinding
+import arc_flags
+import contraction_hierarchies
+import dijkstra_shortest_path
+from network_api import (
+    load_distance_matrix,
+    load_geodesic_heuristic,
+    load_road_graph,
+    load_scenario,
+)
+
+BENCHMARK_FORMAT_VERSION = 1
+
+# Lower bounds of the path length strata (roads on the shortest path)
+DEFAULT_STRATA = (1, 8, 16, 32, 64)
+
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+WORK_METRICS = ("settled", "heap_pushes")
+
+# Modules whose heap operations are counted in the instrumented pass
+_SEARCH_MODULES = (
+    dijkstra_shortest_path,
+    Astar_pathfinding,
+    arc_flags,
+    contraction_hierarchies,
+)
+
+
+def _prepare_dijkstra(graph, cities, removed_countries):
+    return lambda origin, destination: dijkstra_shortest_path.dijkstra(
+        graph, origin, destination, cities
+    )
+
+
+def _prepare_bidirectional_dijkstra(graph, cities, removed_countries):
+    return lambda origin, destination: dijkstra_shortest_path.bidirectional_dijkstra(
+        graph, origin, destination, cities
+    )
+
+
+def _prepare_astar(graph, cities, removed_countries):
+    geodesic = load_geodesic_heuristic(removed_countries)
+    return lambda origin, destination: Astar_pathfinding.astar(
+        origin, destination, geodesic, graph, cities
+    )
+
+
+def _prepare_bidirectional_astar(graph, cities, removed_countries):
+    geodesic = load_geodesic_heuristic(removed_countries)
+    return lambda origin, destination: Astar_pathfinding.bidirectional_astar(
+        origin, destination, geodesic, graph, cities
+    )
+
+
+def _prepare_alt(graph, cities, removed_countries):
+    from landmarks import LandmarkIndex
+
+    index = LandmarkIndex.build(graph, seed=0)
+    return lambda origin, destination: Astar_pathfinding.astar(
+        origin, destination, index, graph, cities
+    )
+
+
+def _prepare_arc_flags(graph, cities, removed_countries):
+    return arc_flags.ArcFlags.build(graph, cities).query
+
+
+def _prepare_ch(graph, cities, removed_countries):
+    ch = contraction_hierarchies.ContractionHierarchy.build(graph)
+    return ch.query
+
+
+# name -> function(graph, cities, removed_countries) returning query(origin, destination)
+ALGORITHMS = {
+    "dijkstra": _prepare_dijkstra,
+    "bidirectional-dijkstra": _prepare_bidirectional_dijkstra,
+    "astar": _prepare_astar,
+    "bidirectional-astar": _prepare_bidirectional_astar,
+    "alt": _prepare_alt,
+    "arc-flags": _prepare_arc_flags,
+    "ch": _prepare_ch,
+}
+
+
+def stratum_label(strata, index):
+    if index + 1 < len(strata):
+        return f"{strata[index]}-{strata[index + 1] - 1}"
+    return f"{strata[index]}+"
+
+
+def _stratum_of(strata, hops):
+    stratum = -1
+    for index, lower in enumerate(strata):
+        if hops >= lower:
+            stratum = index
+    return stratum
+
+
+def stratified_queries(
+    graph, per_stratum=20, strata=DEFAULT_STRATA, seed=None, matrix=None
+):
+    # Returns [(origin, destination, stratum label, hops, distance), ...].
+    # The reachable cities of a random origin are grouped by the number of
+    # roads on their shortest path and one random destination is drawn for
+    # every stratum that still needs queries. The rows come from matrix (a
+    # DistanceMatrix of the graph) when given, else from a full search.
+    rng = random.Random(seed)
+    n = len(graph)
+    city_ids = graph.city_ids
+    needed = [per_stratum] * len(strata)
+    queries = []
+    for rep in range(20 * per_stratum * len(strata)):
+        if not any(needed) or not n:
+            break
+        origin = rng.randrange(n)
+        if matrix is not None:
+            dist = matrix.distance_row(origin).tolist()
+            hops = matrix.hop_row(origin).tolist()
+        else:
+            dist, hops = dijkstra_shortest_path.dijkstra_search_hops(graph, origin)
+        by_stratum = [[] for _ in strata]
+        for v in range(n):
+            if dist[v] != float("inf"):
+                stratum = _stratum_of(strata, hops[v])
+                if stratum != -1:
+                    by_stratum[stratum].append(v)
+        for stratum, candidates in enumerate(by_stratum):
+            if needed[stratum] and candidates:
+                destination = rng.choice(candidates)
+                needed[stratum] -= 1
+                queries.append(
+                    (
+                        city_ids[origin],
+                        city_ids[destination],
+                        stratum_label(strata, stratum),
+                        hops[destination],
+                        dist[destination],
+                    )
+                )
+    return queries
+
+
+@contextmanager
+def count_heap_operations():
+    # Replaces heappush/heappop in the search modules by counting versions.
+    # A node counts as settled the first time it leaves a given heap; the
+    # later pops of the same node are outdated entries.
+    counts = {"heap_pushes": 0, "popped": set()}
+
+    def heappush(heap, item):
+        counts["heap_pushes"] += 1
+        heapq.heappush(heap, item)
+
+    def heappop(heap):
+        item = heapq.heappop(heap)
+        counts["popped"].add((id(heap), item[-1]))
+        return item
+
+    originals = [
+        (module, module.heappush, module.heappop) for module in _SEARCH_MODULES
+    ]
+    for module in _SEARCH_MODULES:
+        module.heappush = heappush
+        module.heappop = heappop
+    try:
+        yield counts
+    finally:
+        for module, push, pop in originals:
+            module.heappush = push
+            module.heappop = pop
+
+
+def _path_distance(path):
+    return path[-1][-1] if isinstance(path, list) and path else None
+
+
+def time_queries(query, queries, warmup=10, repeat=3):
+    # Latency of every query in milliseconds, the median of repeat runs
+    for origin, destination, *_ in queries[:warmup]:
+        query(origin, destination)
+
+    latencies = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for origin, destination, *_ in queries:
+            runs = []
+            for rep in range(repeat):
+                start_time = time.perf_counter()
+                query(origin, destination)
+                runs.append((time.perf_counter() - start_time) * 1000)
+            latencies.append(statistics.median(runs))
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return latencies
+
+
+def count_work(query, queries):
+    # (settled nodes, heap pushes, mismatches) of every query, untimed
+    settled, pushes, mismatches = [], [], 0
+    for origin, destination, label, hops, distance in queries:
+        with count_heap_operations() as counts:
+            path = query(origin, destination)
+        settled.append(len(counts["popped"]))
+        pushes.append(counts["heap_pushes"])
+        found = _path_distance(path)
+        if found is None or not math.isclose(found, distance, rel_tol=1e-9):
+            mismatches += 1
+    return settled, pushes, mismatches
+
+
+def summarize(latencies, settled, pushes):
+    if not latencies:
+        return {"queries": 0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+    return {
+        "queries": len(latencies),
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "settled": statistics.fmean(settled),
+        "heap_pushes": statistics.fmean(pushes),
+    }
+
+
+def run_benchmark(
+    removed_countries=(),
+    algorithms=None,
+    per_stratum=20,
+    strata=DEFAULT_STRATA,
+    warmup=10,
+    repeat=3,
+    seed=0,
+):
+    cities, _, _ = load_scenario(removed_countries)
+    graph = load_road_graph(removed_countries)
+    queries = stratified_queries(
+        graph, per_stratum, strata, seed, load_distance_matrix(removed_countries)
+    )
+    labels = [stratum_label(strata, index) for index in range(len(strata))]
+
+    results = {}
+    for name in algorithms or ALGORITHMS:
+        start_time = time.perf_counter()
+        query = ALGORITHMS[name](graph, cities, removed_countries)
+        preprocessing = time.perf_counter() - start_time
+
+        latencies = time_queries(query, queries, warmup, repeat)
+        settled, pushes, mismatches = count_work(query, queries)
+
+        by_stratum = {}
+        for label in labels:
+            rows = [i for i, q in enumerate(queries) if q[2] == label]
+            by_stratum[label] = summarize(
+                [latencies[i] for i in rows],
+                [settled[i] for i in rows],
+                [pushes[i] for i in rows],
+            )
+        results[name] = {
+            "preprocessing_s": preprocessing,
+            "mismatches": mismatches,
+            "overall": summarize(latencies, settled, pushes),
+            "strata": by_stratum,
+        }
+
+    return {
+        "format_version": BENCHMARK_FORMAT_VERSION,
+        "config": {
+            "removed_countries": sorted(removed_countries or ()),
+            "per_stratum": per_stratum,
+            "strata": list(strata),
+            "warmup": warmup,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "environment": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+        },
+        "graph": {"cities": len(graph), "arcs": graph.edge_count},
+        "queries": len(queries),
+        "results": results,
+    }
+
+
+def compare_with_baseline(result, baseline, tolerance=0.2):
+    # Returns a list of messages, one per metric that is more than
+    # tolerance (relative) worse than in the baseline
+    if baseline.get("format_version") != BENCHMARK_FORMAT_VERSION:
+        raise ValueError(
+            f"Baseline has format version {baseline.get('format_version')}, "
+            f"expected {BENCHMARK_FORMAT_VERSION}."
+        )
+    fields = ("removed_countries", "per_stratum", "strata", "seed")
+    if any(result["config"][f] != baseline["config"][f] for f in fields):
+        raise ValueError(
+            "Baseline was measured on a different query set "
+            f"({', '.join(fields)} must match)."
+        )
+
+    regressions = []
+    for name, current in result["results"].items():
+        if name not in baseline["results"]:
+            continue
+        if current["mismatches"]:
+            regressions.append(
+                f"{name}: {current['mismatches']} queries differ from Dijkstra"
+            )
+        scopes = [("overall", current["overall"], baseline["results"][name]["overall"])]
+        scopes += [
+            (
+                f"stratum {label}",
+                summary,
+                baseline["results"][name]["strata"].get(label),
+            )
+            for label, summary in current["strata"].items()
+        ]
+        for scope, new, old in scopes:
+            if not old or not old.get("queries") or not new.get("queries"):
+                continue
+            for metric in LATENCY_METRICS + WORK_METRICS:
+                if new[metric] > old[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{name} {scope}: {metric} {old[metric]:.4g} -> "
+                        f"{new[metric]:.4g} (+{new[metric] / old[metric] - 1:.0%})"
+                        if old[metric]
+                        else f"{name} {scope}: {metric} 0 -> {new[metric]:.4g}"
+                    )
+    return regressions
+
+
+def print_report(result):
+    print(
+        f"{result['queries']} queries on {result['graph']['cities']} cities,",
+        f"seed {result['config']['seed']}",
+    )
+    print(
+        f"{'algorithm':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'settled':>10}{'pushes':>10}{'prep s':>9}"
+    )
+    for name, entry in result["results"].items():
+        summary = entry["overall"]
+        if not summary["queries"]:
+            continue
+        print(
+            f"{name:<24}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}"
+            f"{summary['p99_ms']:>10.3f}{summary['settled']:>10.1f}"
+            f"{summary['heap_pushes']:>10.1f}{entry['preprocessing_s']:>9.2f}"
+        )
+        if entry["mismatches"]:
+            print(f"  {entry['mismatches']} queries differ from Dijkstra")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the shortest path queries.")
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier JSON output to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--algorithm",
+        action="append",
+        choices=list(ALGORITHMS),
+        help="algorithm to run (repeatable, default: all)",
+    )
+    parser.add_argument(
+        "--remove",
+        action="append",
+        default=[],
+        metavar="COUNTRY",
+        help="country to remove from the network (repeatable)",
+    )
+    parser.add_argument("--per-stratum", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(
+        tuple(args.remove),
+        args.algorithm,
+        args.per_stratum,
+        DEFAULT_STRATA,
+        args.warmup,
+        args.repeat,
+        args.seed,
+    )
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(result, output, indent=2)
+    print_report(result)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as data:
+            regressions = compare_with_baseline(result, json.load(data), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+"""
+Runtime analysis:
+
+stratified_queries:
+One row of the distance matrix per origin, O(V) (a full Dijkstra
+search, O((V+E) log V), the first time), and at most one query per
+stratum and origin, so about per_stratum origins are needed.
+
+run_benchmark:
+(warmup + repeat + 1) runs of every query per algorithm, plus the
+preprocessing of ALT (k Dijkstra searches) and CH. The instrumented
+pass is separate from the timed one, so the counters add no overhead
+to the measured latencies.
+"""
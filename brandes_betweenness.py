@@ -4,38 +4,82 @@ Brandes Betweenness Centrality
 This module contains a function to calculate betweenness centrality using Brandes' algorithm.
 
 Functions:
-- brandes_betweenness(map, cities_dict):
+- brandes_betweenness(map, cities_dict, workers=1, chunk_size=None):
     Calculate betweenness centrality for cities using Brandes' algorithm.
+    With workers > 1 the sources are processed on a process pool that shares
+    the graph through shared memory.
+- source_chunks(n, chunk_size=None):
+    Split the sources into fixed chunks whose partial scores are summed in order.
+- accumulate_sources(graph, sources):
+    Partial betweenness scores of one chunk of sources.
+- approximate_betweenness(map, cities_dict, epsilon, delta, time_budget=None, seed=None):
+    Estimate betweenness centrality by sampling shortest paths, with confidence intervals.
+- top_k_betweenness(map, cities_dict, k=10, ...):
+    Estimate the k cities with the highest betweenness, stopping once the ranking is stable.
 
 This approach efficiently computes betweenness centrality for cities in a road network, providing insights into their importance in transportation systems or social networks.
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from heapq import heappush, heappop
-from country_removal_simulation import cities_deleted_c, road_map
+import math
+import os
+import random
+import time
 
+from csr_graph import CSRGraph, as_csr_graph
+from network_api import load_road_graph, load_scenario
 
-def brandes_betweenness(map, cities_dict):
-    # Initialize betweenness centrality dictionary
-    betweenness_scores = {city: 0 for city in cities_dict.keys()}
-    # Iterate over each city as source
-    for origin in cities_dict.keys():
+# Graph attached by each worker process of the pool
+_worker_graph = None
+
+
+def source_chunks(n, chunk_size=None):
+    # Fixed partition of the sources. It only depends on n (and chunk_size),
+    # never on the number of workers, so the partial scores are always
+    # summed in the same order.
+    if chunk_size is None:
+        chunk_size = max(16, -(-n // 256))
+    return [
+        range(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)
+    ]
+
+
+def accumulate_sources(graph, sources):
+    # Brandes' dependency accumulation for the given sources.
+    # The per-source lists are allocated once and only the entries that
+    # were touched by the previous source are reset.
+    n = len(graph)
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    partial = [0.0] * n
+    predecessor_match = [[] for _ in range(n)]
+    n_shortest_paths = [0] * n
+    shortest_node_to_other = [float("inf")] * n
+    delta = [0.0] * n
+    order_of_encounter = []
+    for origin in sources:
+        for v in order_of_encounter:
+            predecessor_match[v] = []
+            n_shortest_paths[v] = 0
+            shortest_node_to_other[v] = float("inf")
+            delta[v] = 0.0
         # Single source shortest paths problem
         order_of_encounter = []
-        predecessor_match = {w: [] for w in cities_dict.keys()}
-        n_shortest_paths = dict.fromkeys(cities_dict.keys(), 0)
         n_shortest_paths[origin] = 1
-        shortest_node_to_other = dict.fromkeys(cities_dict.keys(), float("inf"))
         shortest_node_to_other[origin] = 0
-        priority_queue = []
-
-        heappush(priority_queue, (0, origin))
+        priority_queue = [(0, origin)]
+        settled = bytearray(n)
 
         while priority_queue:
             (d, v) = heappop(priority_queue)
+            if settled[v]:
+                continue
+            settled[v] = 1
             order_of_encounter.append(v)
-            for w in map.get(v, {}):
+            for arc in range(offsets[v], offsets[v + 1]):
+                w = targets[arc]
                 # Path discovery
-                current_shortest = shortest_node_to_other[v] + map[v][w]
+                current_shortest = d + weights[arc]
                 if shortest_node_to_other[w] > current_shortest:
                     shortest_node_to_other[w] = current_shortest
                     heappush(priority_queue, (current_shortest, w))
@@ -46,32 +90,315 @@ def brandes_betweenness(map, cities_dict):
                     predecessor_match[w].append(v)
 
         # Accumulation
-        delta = dict.fromkeys(cities_dict.keys(), 0)
-        while order_of_encounter:
-            w = order_of_encounter.pop()
+        for w in reversed(order_of_encounter):
             for v in predecessor_match[w]:
                 delta[v] += (n_shortest_paths[v] / n_shortest_paths[w]) * (1 + delta[w])
             if w != origin:
-                betweenness_scores[w] += delta[w]
+                partial[w] += delta[w]
+    return partial
+
+
+def _attach_graph(block_name, layout):
+    from multiprocessing import shared_memory
+
+    global _worker_graph
+    _worker_graph = CSRGraph.from_shared_memory(
+        shared_memory.SharedMemory(name=block_name), layout
+    )
+
+
+def _accumulate_chunk(sources):
+    return accumulate_sources(_worker_graph, sources)
+
+
+def brandes_betweenness(map, cities_dict, workers=1, chunk_size=None):
+    # map may be a road_map dict or a CSRGraph; nodes are dense indices.
+    # With workers > 1 the source chunks run on a process pool that reads
+    # the graph from shared memory. The partial score lists are reduced in
+    # chunk order in both modes, so the result is bit-for-bit identical
+    # for any number of workers.
+    graph = as_csr_graph(map)
+    n = len(graph)
+    chunks = source_chunks(n, chunk_size)
+    # Initialize betweenness centrality list
+    scores = [0.0] * n
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(chunks) <= 1:
+        partials = (accumulate_sources(graph, sources) for sources in chunks)
+        for partial in partials:
+            for index in range(n):
+                scores[index] += partial[index]
+    else:
+        block, layout = graph.to_shared_memory()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(chunks)),
+                initializer=_attach_graph,
+                initargs=(block.name, layout),
+            ) as pool:
+                # map() yields the partial scores in chunk order
+                for partial in pool.map(_accumulate_chunk, chunks):
+                    for index in range(n):
+                        scores[index] += partial[index]
+        finally:
+            block.close()
+            block.unlink()
 
     # Normalize the betweenness values (optional)
-    for node in betweenness_scores:
-        betweenness_scores[node] /= 2
+    betweenness_scores = {city: 0 for city in cities_dict.keys()}
+    for index, city in enumerate(graph.city_ids):
+        betweenness_scores[city] = scores[index] / 2
 
     return betweenness_scores
 
 
+class _PathSampler:
+    # Draws one shortest path uniformly at random between two cities.
+    # The search lists are allocated once and reset lazily between samples.
+    def __init__(self, graph):
+        n = len(graph)
+        self.graph = graph
+        self.predecessor_match = [[] for _ in range(n)]
+        self.n_shortest_paths = [0] * n
+        self.shortest_node_to_other = [float("inf")] * n
+        self.settled = bytearray(n)
+        self.touched = []
+
+    def sample(self, origin, destination, rng):
+        # Returns the interior cities of the sampled path, [] if unreachable
+        offsets = self.graph.offsets
+        targets, weights = self.graph.targets, self.graph.weights
+        predecessor_match = self.predecessor_match
+        n_shortest_paths = self.n_shortest_paths
+        shortest_node_to_other = self.shortest_node_to_other
+        settled = self.settled
+        for v in self.touched:
+            predecessor_match[v] = []
+            n_shortest_paths[v] = 0
+            shortest_node_to_other[v] = float("inf")
+            settled[v] = 0
+        touched = self.touched = [origin]
+        n_shortest_paths[origin] = 1
+        shortest_node_to_other[origin] = 0
+        priority_queue = [(0, origin)]
+
+        while priority_queue:
+            (d, v) = heappop(priority_queue)
+            if settled[v]:
+                continue
+            settled[v] = 1
+            if v == destination:
+                break
+            for arc in range(offsets[v], offsets[v + 1]):
+                w = targets[arc]
+                current_shortest = d + weights[arc]
+                if shortest_node_to_other[w] > current_shortest:
+                    if shortest_node_to_other[w] == float("inf"):
+                        touched.append(w)
+                    shortest_node_to_other[w] = current_shortest
+                    heappush(priority_queue, (current_shortest, w))
+                    n_shortest_paths[w] = n_shortest_paths[v]
+                    predecessor_match[w] = [v]
+                elif current_shortest == shortest_node_to_other[w]:
+                    n_shortest_paths[w] += n_shortest_paths[v]
+                    predecessor_match[w].append(v)
+        if not settled[destination]:
+            return []
+
+        # Walk back, choosing each predecessor v of w with
+        # probability n_shortest_paths[v] / n_shortest_paths[w]
+        interior = []
+        w = destination
+        while True:
+            pick = rng.random() * n_shortest_paths[w]
+            for v in predecessor_match[w]:
+                pick -= n_shortest_paths[v]
+                if pick < 0:
+                    break
+            if v == origin:
+                return interior
+            interior.append(v)
+            w = v
+
+
+def _largest_component_size(graph):
+    # Upper bound for the vertex diameter (cities on a shortest path)
+    seen = bytearray(len(graph))
+    largest = 0
+    for root in range(len(graph)):
+        if seen[root]:
+            continue
+        seen[root] = 1
+        stack = [root]
+        size = 0
+        while stack:
+            v = stack.pop()
+            size += 1
+            for w, _ in graph.neighbors(v):
+                if not seen[w]:
+                    seen[w] = 1
+                    stack.append(w)
+        largest = max(largest, size)
+    return largest
+
+
+def _vc_term(vertex_diameter, delta):
+    # floor(log2(VD - 2)) + 1 + ln(1 / delta) from Riondato and Kornaropoulos
+    return math.floor(math.log2(vertex_diameter - 2)) + 1 + math.log(1 / delta)
+
+
+def rk_sample_size(epsilon, delta, vertex_diameter, c=0.5):
+    # Number of sampled paths that gives every estimate within epsilon
+    # (betweenness normalised by n(n-1)) with probability 1 - delta
+    return math.ceil(c / epsilon**2 * _vc_term(vertex_diameter, delta))
+
+
+def _pair(n, rng):
+    origin = rng.randrange(n)
+    destination = rng.randrange(n - 1)
+    return origin, destination + (destination >= origin)
+
+
+def approximate_betweenness(
+    map, cities_dict, epsilon=0.02, delta=0.1, time_budget=None, seed=None
+):
+    # Path sampling (Riondato and Kornaropoulos): every sample is one
+    # shortest path between a random pair of cities, and each interior
+    # city gets a hit. The vertex diameter is bounded by the size of the
+    # largest component, which is safe for weighted roads.
+    # With a time budget (seconds) the sampling stops when the time is up
+    # or the (epsilon, delta) sample size is reached, and epsilon is
+    # recomputed from the samples actually drawn.
+    # Returns (betweenness_scores, confidence_intervals) on the same scale
+    # as brandes_betweenness; each interval holds with probability 1 - delta.
+    graph = as_csr_graph(map)
+    n = len(graph)
+    vertex_diameter = _largest_component_size(graph)
+    hits = [0] * n
+    samples = 0
+    if vertex_diameter >= 3:
+        rng = random.Random(seed)
+        sampler = _PathSampler(graph)
+        target_samples = rk_sample_size(epsilon, delta, vertex_diameter)
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        while samples < target_samples:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            for v in sampler.sample(*_pair(n, rng), rng):
+                hits[v] += 1
+            samples += 1
+        if samples:
+            epsilon = math.sqrt(0.5 * _vc_term(vertex_diameter, delta) / samples)
+    else:
+        # no shortest path has interior cities
+        epsilon = 0.0
+
+    scale = n * (n - 1) / 2
+    betweenness_scores = {city: 0 for city in cities_dict.keys()}
+    confidence_intervals = {city: (0, 0) for city in cities_dict.keys()}
+    for index, city in enumerate(graph.city_ids):
+        estimate = hits[index] / samples * scale if samples else 0.0
+        betweenness_scores[city] = estimate
+        confidence_intervals[city] = (
+            max(0.0, estimate - epsilon * scale),
+            estimate + epsilon * scale,
+        )
+    return betweenness_scores, confidence_intervals
+
+
+def top_k_betweenness(
+    map,
+    cities_dict,
+    k=10,
+    delta=0.1,
+    batch_size=500,
+    patience=3,
+    max_samples=None,
+    time_budget=None,
+    seed=None,
+):
+    # Adaptive path sampling for the k most central cities. Samples are
+    # drawn in batches and the sampling stops as soon as
+    # - the k-th and (k+1)-th estimates are separated by their Hoeffding
+    #   intervals (union bound over all cities), or
+    # - the ranked top k has not changed for `patience` batches, or
+    # - max_samples (default: the epsilon = 0.01 sample size) or the
+    #   time budget is used up.
+    # Returns [(city, betweenness, (low, high)), ...] in ranking order;
+    # without samples (max_samples < 1) every estimate is 0.
+    graph = as_csr_graph(map)
+    n = len(graph)
+    k = min(k, n)
+    scale = n * (n - 1) / 2
+    if n < 3 or (max_samples is not None and max_samples < 1):
+        return [(city, 0.0, (0.0, 0.0)) for city in graph.city_ids[:k]]
+    if max_samples is None:
+        max_samples = rk_sample_size(
+            0.01, delta, max(3, _largest_component_size(graph))
+        )
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    rng = random.Random(seed)
+    sampler = _PathSampler(graph)
+    hits = [0] * n
+    samples = 0
+    ranking = None
+    stable_batches = 0
+    while samples < max_samples:
+        for _ in range(min(batch_size, max_samples - samples)):
+            for v in sampler.sample(*_pair(n, rng), rng):
+                hits[v] += 1
+        samples += min(batch_size, max_samples - samples)
+
+        order = sorted(range(n), key=lambda v: (-hits[v], v))
+        half_width = math.sqrt(math.log(2 * n / delta) / (2 * samples))
+        if k < n and (hits[order[k - 1]] - hits[order[k]]) / samples > 2 * half_width:
+            break
+        stable_batches = stable_batches + 1 if order[:k] == ranking else 0
+        ranking = order[:k]
+        if stable_batches >= patience:
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+    top = []
+    for v in order[:k]:
+        estimate = hits[v] / samples * scale
+        top.append(
+            (
+                graph.city_ids[v],
+                estimate,
+                (
+                    max(0.0, estimate - half_width * scale),
+                    estimate + half_width * scale,
+                ),
+            )
+        )
+    return top
+
+
 # Example usage:
 # Assume road_map is your map and cities_dict is the dictionary of cities
-betweenness_values = brandes_betweenness(road_map, cities_deleted_c)
-print(betweenness_values)
-highest_city = cities_deleted_c[
-    max(betweenness_values, key=betweenness_values.get)
-].name
-print(
-    f"Highest betweenness: {highest_city}",
-    f"| {max(betweenness_values, key=betweenness_values.get)}",
-)
+def main(removed_countries=None, workers=1):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+
+    betweenness_values = brandes_betweenness(road_graph, cities_deleted_c, workers)
+    print(betweenness_values)
+    highest_city = cities_deleted_c[
+        max(betweenness_values, key=betweenness_values.get)
+    ].name
+    print(
+        f"Highest betweenness: {highest_city}",
+        f"| {max(betweenness_values, key=betweenness_values.get)}",
+    )
+    return betweenness_values
+
+
+if __name__ == "__main__":
+    main()
 
 """
 This algorithm has a lower time comlpexity (faster than the O(n^3)) 
@@ -80,4 +407,12 @@ shortest paths for each origin using algorithms like Dijkstra's for weighted gra
 (O(m log n) per source). By processing each origin and edge only once during the 
 accumulation phase, the overall complexity is reduced to O(nm log n) for weighted graphs. 
 This makes it significantly faster than O(n^3). 
+
+With w workers the sources are split into fixed chunks, so the wall time
+drops to about O(nm log n / w). Every chunk returns one list of n partial
+scores, and the reduction costs O(n) per chunk.
+
+approximate_betweenness draws r = (0.5 / epsilon^2)(floor(log2(VD - 2)) + 1 + ln(1/delta))
+shortest paths, each one a Dijkstra search that stops at the destination,
+so it runs in O(r m log n). r does not grow with the number of cities.
 """
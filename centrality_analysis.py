@@ -20,38 +20,53 @@ of the two centrality measures, revealing patterns and outliers in the data.
 
 import pandas as pd
 
-from closeness_betweenness_analysis import betweenness, closeness
+from closeness_betweenness_analysis import main as centrality_measures
 import matplotlib.pyplot as plt
 
 
-betweenness_series = pd.Series(betweenness, name="Betweenness")
-closeness_series = pd.Series(closeness, name="Closeness")
+def build_centrality_dataframe(betweenness, closeness):
+    betweenness_series = pd.Series(betweenness, name="Betweenness")
+    closeness_series = pd.Series(closeness, name="Closeness")
 
-# Combine series into a DataFrame
-centrality_df = pd.DataFrame(
-    {"Betweenness": betweenness_series, "Closeness": closeness_series}
-)
+    # Combine series into a DataFrame
+    centrality_df = pd.DataFrame(
+        {"Betweenness": betweenness_series, "Closeness": closeness_series}
+    )
 
-# Reset index to make sure cities are represented as a column
-centrality_df.reset_index(inplace=True)
-centrality_df.rename(columns={"index": "City"}, inplace=True)
+    # Reset index to make sure cities are represented as a column
+    centrality_df.reset_index(inplace=True)
+    centrality_df.rename(columns={"index": "City"}, inplace=True)
+    return centrality_df
 
-plt.figure(figsize=(14, 6))
 
-# Betweenness histogram
-plt.subplot(1, 2, 1)
-plt.hist(betweenness_series, bins=10, color="blue", alpha=0.7)
-plt.title("Betweenness Centrality Distribution")
-plt.xlabel("Betweenness Centrality")
-plt.ylabel("Frequency")
+def plot_centrality(centrality_df):
+    plt.figure(figsize=(14, 6))
 
-# Closeness histogram
-plt.subplot(1, 2, 2)
-plt.hist(closeness_series, bins=10, color="green", alpha=0.7)
-plt.title("Closeness Centrality Distribution")
-plt.xlabel("Closeness Centrality")
-plt.ylabel("Frequency")
+    # Betweenness histogram
+    plt.subplot(1, 2, 1)
+    plt.hist(centrality_df["Betweenness"], bins=10, color="blue", alpha=0.7)
+    plt.title("Betweenness Centrality Distribution")
+    plt.xlabel("Betweenness Centrality")
+    plt.ylabel("Frequency")
 
-# Show the plots
-plt.tight_layout()
-plt.show()
+    # Closeness histogram
+    plt.subplot(1, 2, 2)
+    plt.hist(centrality_df["Closeness"], bins=10, color="green", alpha=0.7)
+    plt.title("Closeness Centrality Distribution")
+    plt.xlabel("Closeness Centrality")
+    plt.ylabel("Frequency")
+
+    # Show the plots
+    plt.tight_layout()
+    plt.show()
+
+
+def main(removed_countries=None, closeness_samples=None):
+    betweenness, closeness = centrality_measures(removed_countries, closeness_samples)
+    centrality_df = build_centrality_dataframe(betweenness, closeness)
+    plot_centrality(centrality_df)
+    return centrality_df
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 """
-This code block defines and executes a 
-function that performs the following tasks:
+This code block defines a function that 
+performs the following tasks:
 
 1. Creates a list of country codes corresponding 
    to each city in cities_dict1.
@@ -16,58 +16,63 @@ function that performs the following tasks:
 
 5. This operation is useful for understanding the distribution
    of cities across countries within the provided datasets.
+
+The counting is done with numpy (bincount over the country codes
+of the cities), so it also works directly on the columns of the
+data set without City objects.
 """
 
-# Import data
-from initialization import cities_dict, countries_dict, roads_dict
+import numpy as np
+
+from csr_graph import dense_index
+
+# Import data (loaded lazily on first use)
+from initialization import load_columns
+
+
+def count_cities_per_country(country_ids, city_country):
+    # Number of cities of every country in country_ids, one bincount
+    # instead of one list.count() per country
+    return np.bincount(
+        dense_index(country_ids, city_country), minlength=len(country_ids)
+    )
+
+
+def order_countries(country_names, counts):
+    # Country names sorted by the number of cities in descending order
+    # (ties keep the order of the country codes)
+    return [country_names[k] for k in np.argsort(-counts, kind="stable").tolist()]
 
 
 def match_city_country(cities_dict1, countries_dict1):
-    # Create an empty list to store country codes
-    country_list = []
-    # Iterate over each city in cities_dict1
-    for city in cities_dict1:
-        try:
-            # Attempt to get the country code and add it to the country_list
-            country_code = cities_dict1[city].country_n
-            country_list.append(country_code)
-        except:
-            raise KeyError(f"City '{city}'", "does not have a country_n key.")
-
-    # Initialize a counter dictionary to count occurrences of country codes
-    counter = {}
-    for country_code in range(len(countries_dict1)):
-        count = country_list.count(country_code)
-        counter[country_code] = count
-
-    # Sort the counter dictionary by the count in descending order
-    sorted_items = sorted(counter.items(), key=lambda item: item[1], reverse=True)
-
-    # Convert the sorted items back into a dictionary
-    sorted_counter = dict(sorted_items)
-    # print(sorted_counter)
-
-    # Convert the sorted items back into a dictionary
-    ordered_country_list = []
-    for country_code in sorted_counter:
-        try:
-            # Add the country name to the ordered list
-            ordered_country_list.append(country_code)
-        except:
-            # Raise an error if the country name is not found
-            raise ValueError(
-                f"Country code '{country_code}'", "does not have a c_name key."
-            )
-
-    for country in ordered_country_list:
-        ordered_country_list[ordered_country_list.index(country)] = countries_dict1[
-            country
-        ].c_name
+    # Create an array of the country code of every city in cities_dict1
+    try:
+        country_list = np.fromiter(
+            (city.country_n for city in cities_dict1.values()),
+            dtype=np.int64,
+            count=len(cities_dict1),
+        )
+    except AttributeError:
+        raise KeyError("A city does not have a country_n key.")
+
+    counts = count_cities_per_country(list(countries_dict1), country_list)
+    country_names = [country.c_name for country in countries_dict1.values()]
 
     # print(f"Ordered list: \n{ordered_country_list}")
+    return order_countries(country_names, counts)
 
 
-output = match_city_country(cities_dict, countries_dict)
+def main():
+    # Read the columns directly, no City objects are needed
+    network = load_columns()
+    counts = count_cities_per_country(network.country_ids, network.city_country)
+    output = order_countries(network.country_names.tolist(), counts)
+    print(f"Ordered list: \n{output}")
+    return output
+
+
+if __name__ == "__main__":
+    main()
 
 
 """
@@ -121,6 +126,13 @@ there are more cities than countries.
 
 ------
 
+The columnar version (count_cities_per_country / order_countries):
+
+One bincount over the city country codes, O(m), plus sorting the n
+countries, O(nlogn). There is no Python-level loop over the cities.
+
+------
+
 In Summary:
 For n as the total number of countries, the relevant complexities 
 are O(n⋅m) for counting and O(nlogn) for sorting.
@@ -1,6 +1,6 @@
 """
-This code block defines and executes a function that calculates the closeness centrality for 
-each city in a road network. The closeness centrality is a measure of how central a node is 
+This code block defines a function that calculates the closeness centrality for
+each city in a road network. The closeness centrality is a measure of how central a node is
 within a network, based on the average length of the shortest path from the node to all other nodes.
 
 Here's what the function does:
@@ -11,68 +11,402 @@ For each origin, it computes the shortest path length to all other cities.
 
 Sums these path lengths to calculate the total distance.
 
-Determines the closeness centrality for the origin city by dividing the 
+Determines the closeness centrality for the origin city by dividing the
 total number of cities minus one by the total distance.
 
-If a city is unreachable from the origin, it continues to the next city 
+If a city is unreachable from the origin, it continues to the next city
 without adding to the total distance.
 
 Collects and returns the closeness centrality values for all cities in a dictionary.
 
-After computing the closeness centrality values, the code finds and 
-prints the city with the highest closeness centrality, indicating 
+All of this is done with one search per origin (shortest_path_sums)
+instead of one dijkstra() call per pair of cities. closeness_centrality
+and harmonic_centrality offer three ways to measure the distance:
+"path_hops" (roads on the path chosen by dijkstra(), the default and
+the value used so far), "hops" (fewest roads, BFS) and "distance"
+(km). wf_improved applies the Wasserman-Faust correction for
+disconnected networks, and workers > 1 spreads the origins over a
+process pool. Given a DistanceMatrix (distance_matrix.py) of the
+graph, they read the sums from its stored rows instead of searching.
+
+For large networks approximate_closeness and approximate_harmonic
+estimate the same values from searches out of a few random pivots
+(Eppstein and Wang) and report a confidence interval for every city.
+top_k_closeness uses these intervals to prune cities that cannot be
+among the k most central ones and computes the rest exactly.
+
+After computing the closeness centrality values, the code finds and
+prints the city with the highest closeness centrality, indicating
 it has the shortest average distance to all other cities.
 
-The afore created brandes_betweenness function is called at the end, 
+The afore created brandes_betweenness function is called at the end,
 which calculates betweenness centrality for each city.
 
 With this we create the database that will be processed and visualized in the next cell.
 """
 
-from country_removal_simulation import cities_deleted_c, road_map
-from dijkstra_shortest_path import dijkstra
-from brandes_betweenness import brandes_betweenness
-from city_country_distribution import roads_dict, cities_dict, countries_dict
-import copy
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import random
+
+from csr_graph import CSRGraph, as_csr_graph
+from dijkstra_shortest_path import dijkstra_search_hops
+from network_api import load_distance_matrix, load_road_graph, load_scenario
+from brandes_betweenness import brandes_betweenness, source_chunks
+
+# Distances that closeness and harmonic centrality can be based on
+METRICS = ("path_hops", "hops", "distance")
+
+# Graph attached by each worker process of the pool
+_worker_graph = None
+
+
+def shortest_path_values(graph, source, metric="path_hops"):
+    # One search from source. Returns the distance of every node from
+    # source (inf when unreachable) measured with one of METRICS:
+    # "path_hops": roads on the shortest path chosen by dijkstra()
+    # "hops":      roads on the path with the fewest roads (BFS)
+    # "distance":  length of the shortest path in km
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+    if metric == "hops":
+        hops = [float("inf")] * len(graph)
+        hops[source] = 0
+        frontier = [source]
+        for v in frontier:
+            for arc in range(offsets[v], offsets[v + 1]):
+                w = targets[arc]
+                if hops[w] == float("inf"):
+                    hops[w] = hops[v] + 1
+                    frontier.append(w)
+        return hops
+
+    if metric not in METRICS:
+        raise ValueError(f"Unknown closeness metric '{metric}'.")
+    dist, hops = dijkstra_search_hops(graph, source)
+    return hops if metric == "path_hops" else dist
+
+
+def shortest_path_sums(graph, source, metric="path_hops"):
+    # Returns (reached, total, harmonic): the number of cities reached from
+    # source (source included), the sum of their distances and the sum of
+    # the reciprocal distances
+    reached = 0
+    total = 0
+    harmonic = 0.0
+    for value in shortest_path_values(graph, source, metric):
+        if value != float("inf"):
+            reached += 1
+            total += value
+            if value:
+                harmonic += 1 / value
+    return reached, total, harmonic
+
+
+def _attach_graph(block_name, layout):
+    from multiprocessing import shared_memory
+
+    global _worker_graph
+    _worker_graph = CSRGraph.from_shared_memory(
+        shared_memory.SharedMemory(name=block_name), layout
+    )
+
+
+def _sums_chunk(sources, metric):
+    return [shortest_path_sums(_worker_graph, source, metric) for source in sources]
+
+
+def all_shortest_path_sums(graph, metric="path_hops", workers=1, matrix=None):
+    # shortest_path_sums for every node, optionally on a process pool that
+    # reads the graph from shared memory (see brandes_betweenness). With a
+    # DistanceMatrix of the graph the sums are read from its rows instead.
+    if matrix is not None and metric != "hops":
+        return matrix.path_sums(metric)
+    chunks = source_chunks(len(graph))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(chunks) <= 1:
+        return [
+            shortest_path_sums(graph, source, metric) for source in range(len(graph))
+        ]
+
+    sums = []
+    block, layout = graph.to_shared_memory()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            initializer=_attach_graph,
+            initargs=(block.name, layout),
+        ) as pool:
+            for chunk in pool.map(_sums_chunk, chunks, [metric] * len(chunks)):
+                sums.extend(chunk)
+    finally:
+        block.close()
+        block.unlink()
+    return sums
+
+
+def closeness_from_sums(reached, total, n, wf_improved=False):
+    if not total:
+        return 0
+    if wf_improved:
+        # Wasserman-Faust: scale by the share of the network that is reachable
+        return (reached - 1) / (n - 1) * (reached - 1) / total
+    return (n - 1) / total
+
 
+def closeness_centrality(
+    map, cities_dict, metric="path_hops", wf_improved=False, workers=1, matrix=None
+):
+    # Closeness of every city in cities_dict from one search per city.
+    # Without wf_improved the value is (n - 1) / (sum of distances to the
+    # reachable cities), n = len(cities_dict), as calculate_closeness_centrality
+    # has always computed it. With wf_improved the Wasserman-Faust formula
+    # keeps cities in small components from looking central.
+    graph = as_csr_graph(map)
+    n = len(cities_dict)
+    sums = all_shortest_path_sums(graph, metric, workers, matrix)
+    closeness = {city: 0 for city in cities_dict.keys()}
+    for index, city in enumerate(graph.city_ids):
+        if city in closeness:
+            reached, total, _ = sums[index]
+            closeness[city] = closeness_from_sums(reached, total, n, wf_improved)
+    return closeness
 
-def calculate_closeness_centrality(map, cities_dict4d):
 
-    # create copy
-    cities_copy4d = copy.deepcopy(cities_dict4d)
+def harmonic_centrality(map, cities_dict, metric="path_hops", workers=1, matrix=None):
+    # Sum of 1 / distance to every other city; unreachable cities add 0,
+    # so no special handling of disconnected components is needed
+    graph = as_csr_graph(map)
+    sums = all_shortest_path_sums(graph, metric, workers, matrix)
+    harmonic = {city: 0 for city in cities_dict.keys()}
+    for index, city in enumerate(graph.city_ids):
+        if city in harmonic:
+            harmonic[city] = sums[index][2]
+    return harmonic
 
-    closeness_centrality = {}
 
-    for origin in cities_dict.keys():
-        total_distance = 0
-        for destination in cities_dict.keys():
-            if origin != destination:
-                shortest_path_lenght = len(
-                    dijkstra(map, origin, destination, cities_copy4d)
-                )
-                if shortest_path_lenght:
-                    total_distance += shortest_path_lenght - 1  # exclude origin
-                else:
-                    continue
+def calculate_closeness_centrality(map, cities_dict4d, matrix=None):
+    # Hops along the shortest path chosen by dijkstra(), as before, but from
+    # one search per origin instead of one dijkstra() call per pair
+    return closeness_centrality(map, cities_dict4d, metric="path_hops", matrix=matrix)
 
-        if total_distance:
-            closeness_centrality[origin] = (len(cities_dict) - 1) / total_distance
+
+def pivot_sample_size(n, epsilon=0.1, delta=0.1):
+    # Eppstein-Wang: with this many pivots every average distance is within
+    # epsilon * diameter of the true value with probability 1 - delta
+    # (Hoeffding bound with a union bound over the n cities)
+    return min(n, math.ceil(math.log(2 * n / delta) / (2 * epsilon**2)))
+
+
+def _pivot_estimates(graph, samples, delta, metric, seed):
+    # Sums over the pivots of d(pivot, v), 1 / d(pivot, v) and of the
+    # pivots reaching v, scaled by n / samples to estimate the sums over
+    # all cities, plus the half-widths of their confidence intervals.
+    # Pivots are drawn without replacement, so samples = n is exact.
+    n = len(graph)
+    samples = max(1, min(samples, n))
+    pivots = random.Random(seed).sample(range(n), samples)
+    total = [0.0] * n
+    harmonic = [0.0] * n
+    reached = [0.0] * n
+    # eccentricity(v) <= d(v, pivot) + eccentricity(pivot) by the triangle
+    # inequality (only an estimate for "path_hops")
+    eccentricity = [float("inf")] * n
+    # every positive value is at least one road (or one hop), which bounds
+    # the harmonic terms for all cities, not only those of the pivots
+    if metric == "distance":
+        shortest = min((w for w in graph.weights if w > 0), default=float("inf"))
+    else:
+        shortest = 1
+    for pivot in pivots:
+        values = shortest_path_values(graph, pivot, metric)
+        pivot_eccentricity = max(value for value in values if value != float("inf"))
+        for v, value in enumerate(values):
+            if value != float("inf"):
+                reached[v] += 1
+                total[v] += value
+                eccentricity[v] = min(eccentricity[v], value + pivot_eccentricity)
+                if value:
+                    harmonic[v] += 1 / value
+
+    scale = n / samples
+    # Hoeffding-Serfling bound for sampling without replacement, with a
+    # union bound over the n cities; the terms of city v lie in
+    # [0, eccentricity(v)] and [0, 1 / shortest]
+    spread = n * math.sqrt(
+        (1 - (samples - 1) / n) * math.log(2 * n / delta) / (2 * samples)
+    )
+    if samples == n:
+        spread = 0.0
+    total_error = [spread * bound for bound in eccentricity]
+    harmonic_error = spread / shortest if shortest != float("inf") else 0.0
+    return (
+        [value * scale for value in reached],
+        [value * scale for value in total],
+        [value * scale for value in harmonic],
+        total_error,
+        harmonic_error,
+    )
+
+
+def approximate_closeness(
+    map,
+    cities_dict,
+    samples=None,
+    epsilon=0.1,
+    delta=0.1,
+    metric="path_hops",
+    wf_improved=False,
+    seed=None,
+):
+    # Closeness estimated from searches out of `samples` random pivots
+    # instead of every city (default: pivot_sample_size(n, epsilon, delta)).
+    # Returns (closeness, confidence_intervals); closeness has the format of
+    # calculate_closeness_centrality, and each interval holds with
+    # probability 1 - delta.
+    graph = as_csr_graph(map)
+    n = len(cities_dict)
+    if samples is None:
+        samples = pivot_sample_size(len(graph), epsilon, delta)
+    reached, total, _, total_error, _ = _pivot_estimates(
+        graph, samples, delta, metric, seed
+    )
+
+    closeness = {city: 0 for city in cities_dict.keys()}
+    confidence_intervals = {city: (0, 0) for city in cities_dict.keys()}
+    for index, city in enumerate(graph.city_ids):
+        if city not in closeness:
+            continue
+        closeness[city] = closeness_from_sums(
+            reached[index], total[index], n, wf_improved
+        )
+        error = total_error[index]
+        if total[index] - error > 0:
+            low = closeness_from_sums(
+                reached[index], total[index] + error, n, wf_improved
+            )
+            high = closeness_from_sums(
+                reached[index], total[index] - error, n, wf_improved
+            )
         else:
-            closeness_centrality[origin] = 0
+            # the true sum may be 0, which gives a closeness of 0
+            low, high = 0, float("inf")
+        confidence_intervals[city] = (low, high)
+    return closeness, confidence_intervals
+
+
+def approximate_harmonic(
+    map,
+    cities_dict,
+    samples=None,
+    epsilon=0.1,
+    delta=0.1,
+    metric="path_hops",
+    seed=None,
+):
+    # Harmonic centrality from random pivots, see approximate_closeness.
+    # Returns (harmonic, confidence_intervals).
+    graph = as_csr_graph(map)
+    if samples is None:
+        samples = pivot_sample_size(len(graph), epsilon, delta)
+    _, _, harmonic_sums, _, harmonic_error = _pivot_estimates(
+        graph, samples, delta, metric, seed
+    )
+
+    harmonic = {city: 0 for city in cities_dict.keys()}
+    confidence_intervals = {city: (0, 0) for city in cities_dict.keys()}
+    for index, city in enumerate(graph.city_ids):
+        if city in harmonic:
+            harmonic[city] = harmonic_sums[index]
+            confidence_intervals[city] = (
+                max(0.0, harmonic_sums[index] - harmonic_error),
+                harmonic_sums[index] + harmonic_error,
+            )
+    return harmonic, confidence_intervals
+
 
-    return closeness_centrality
+def top_k_closeness(
+    map,
+    cities_dict,
+    k=10,
+    samples=None,
+    epsilon=0.1,
+    delta=0.1,
+    metric="path_hops",
+    wf_improved=False,
+    seed=None,
+):
+    # The k cities with the highest closeness (Okamoto, Chen and Li).
+    # The pivot estimates prune every city whose upper bound is below the
+    # k-th best lower bound; only the remaining candidates get an exact
+    # search. The result is exact with probability 1 - delta.
+    # Returns ([(city, closeness), ...] best first, number of exact searches).
+    graph = as_csr_graph(map)
+    _, intervals = approximate_closeness(
+        graph, cities_dict, samples, epsilon, delta, metric, wf_improved, seed
+    )
+    cities = [city for city in graph.city_ids if city in cities_dict]
+    k = min(k, len(cities))
+    if not k:
+        return [], 0
+    threshold = sorted((intervals[city][0] for city in cities), reverse=True)[k - 1]
+    candidates = [city for city in cities if intervals[city][1] >= threshold]
 
+    n = len(cities_dict)
+    exact = []
+    for city in candidates:
+        reached, total, _ = shortest_path_sums(graph, graph.index_of[city], metric)
+        exact.append((city, closeness_from_sums(reached, total, n, wf_improved)))
+    exact.sort(key=lambda item: item[1], reverse=True)
+    return exact[:k], len(candidates)
 
-closeness = calculate_closeness_centrality(road_map, cities_deleted_c)
-print(closeness)
-max_city = max(closeness, key=closeness.get)
-print(
-    f"The city with the highest closeness centrality is: {cities_deleted_c[max_city].name} ({max_city})"
-)
 
-betweenness = brandes_betweenness(road_map, cities_deleted_c)
-print(betweenness)
-max_city2 = max(betweenness, key=betweenness.get)
-print(
-    f"The city with the highest betweenness centrality is: {cities_deleted_c[max_city2].name} ({max_city2})"
-)
+def main(removed_countries=None, closeness_samples=None):
+    # closeness_samples: estimate closeness from that many pivots
+    # (approximate_closeness) instead of computing it exactly
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+
+    if closeness_samples:
+        closeness, _ = approximate_closeness(
+            road_graph, cities_deleted_c, samples=closeness_samples
+        )
+    else:
+        # rows of the on-disk distance matrix, computed on the first run only
+        closeness = calculate_closeness_centrality(
+            road_graph, cities_deleted_c, load_distance_matrix(removed_countries)
+        )
+    print(closeness)
+    max_city = max(closeness, key=closeness.get)
+    print(
+        f"The city with the highest closeness centrality is: {cities_deleted_c[max_city].name} ({max_city})"
+    )
+
+    betweenness = brandes_betweenness(road_graph, cities_deleted_c)
+    print(betweenness)
+    max_city2 = max(betweenness, key=betweenness.get)
+    print(
+        f"The city with the highest betweenness centrality is: {cities_deleted_c[max_city2].name} ({max_city2})"
+    )
+
+    return betweenness, closeness
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+Runtime analysis:
+
+calculate_closeness_centrality used to run n^2 Dijkstra searches,
+O(n^2 m log n). One search per origin gives O(n m log n) for the
+distance based metrics and O(n (n + m)) for "hops".
+
+approximate_closeness / approximate_harmonic need one search per pivot,
+O(k m log n) for k pivots; k = O(log n / epsilon^2) does not grow with
+the size of the network beyond the logarithm. top_k_closeness adds one
+search per candidate that survives the pruning.
+"""
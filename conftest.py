@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from country_removal_simulation import build_road_map
+from csr_graph import CSRGraph
+from dijkstra_shortest_path import dijkstra
+from initialization import City, Country, Road
+
+
+@pytest.fixture
+def network():
+    # Three countries of eight cities on a 6 x 4 grid, joined by a path
+    # through all cities plus random shortcuts. The short integer lengths
+    # give many shortest paths of equal length. City 99 has no roads.
+    rng = random.Random(7)
+    countries = {1: Country("Atlantis"), 2: Country("Utopia"), 3: Country("Lemuria")}
+    cities = {
+        code: City(f"City {code}", 1 + (code - 1) // 8, divmod(code - 1, 4))
+        for code in range(1, 25)
+    }
+    cities[99] = City("Thule", 3, (9.0, 9.0))
+    roads = [Road(code, code + 1, rng.randint(1, 9)) for code in range(1, 24)]
+    connected = {frozenset((road.point_a, road.point_b)) for road in roads}
+    while len(roads) < 40:
+        a, b = rng.sample(range(1, 25), 2)
+        if frozenset((a, b)) not in connected:
+            connected.add(frozenset((a, b)))
+            roads.append(Road(a, b, rng.randint(1, 9)))
+    return countries, cities, roads
+
+
+@pytest.fixture
+def cities(network):
+    return network[1]
+
+
+@pytest.fixture
+def road_map(network):
+    _, cities, roads = network
+    return build_road_map(cities, roads)
+
+
+@pytest.fixture
+def graph(road_map):
+    return CSRGraph.from_road_map(road_map)
+
+
+@pytest.fixture
+def shortest(graph, cities):
+    # dijkstra() distance of every pair, inf without a path
+    distances = {}
+    for origin in cities:
+        for destination in cities:
+            path = dijkstra(graph, origin, destination, cities)
+            distances[origin, destination] = path[-1][1] if path else float("inf")
+    return distances
+
+
+@pytest.fixture
+def check_route(road_map):
+    # Assert that path is a route from origin to destination over the roads
+    # of road_map, with the cumulative distances of dijkstra()
+    def check(path, origin, destination, distance):
+        assert path[0] == (origin, 0)
+        assert path[-1][0] == destination
+        for (a, at_a), (b, at_b) in zip(path, path[1:]):
+            assert at_b == at_a + road_map[a][b]
+        assert path[-1][1] == distance
+
+    return check
@@ -1,5 +1,5 @@
 """
-This code block defines and executes a function that:
+This code block defines a function that:
 
 Analyzes the road map to identify connected components
 
@@ -20,38 +20,180 @@ The function is useful for understanding the structure and
 clustering of the road network after certain countries and 
 their roads have been removed, which can have implications 
 for regional planning and infrastructure development.
+
+------
+
+The depth-first search uses an explicit stack instead of recursion,
+so long road chains cannot hit Python's recursion limit.
+component_labels (iterative) and union_find_components (UnionFind)
+label the components of the dense CSR graph without printing.
+
+removal_sweep follows the components while countries or single roads
+are removed one after the other. It works offline in reverse: the
+network after the last step is built once with union-find, and the
+removed cities and roads are added back step by step, so every step
+costs only the size of what it removed.
 """
 
-from country_removal_simulation import cities_deleted_c, roads_deleted_c, road_map
+from csr_graph import as_csr_graph
+from network_api import load_road_graph, load_scenario
+
+
+def component_labels(graph):
+    # Iterative labelling of the dense graph: labels[v] is the number of
+    # the component of node v (in order of the first node), no recursion
+    labels = [-1] * len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    count = 0
+    for root in range(len(graph)):
+        if labels[root] != -1:
+            continue
+        labels[root] = count
+        stack = [root]
+        while stack:
+            v = stack.pop()
+            for arc in range(offsets[v], offsets[v + 1]):
+                w = targets[arc]
+                if labels[w] == -1:
+                    labels[w] = count
+                    stack.append(w)
+        count += 1
+    return labels, count
+
+
+class UnionFind:
+    # Disjoint sets over dense node indices, union by size and path halving
+    def __init__(self, n, active=True):
+        self.parent = list(range(n))
+        self.size = [1] * n
+        self.active = [active] * n
+        self.components = n if active else 0
+        self.largest = 1 if active and n else 0
+
+    def find(self, v):
+        parent = self.parent
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    def activate(self, v):
+        # Add a node that was not part of the graph yet (as a singleton)
+        if not self.active[v]:
+            self.active[v] = True
+            self.components += 1
+            self.largest = max(self.largest, 1)
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        self.components -= 1
+        self.largest = max(self.largest, self.size[root_a])
+        return True
+
+
+def union_find_components(graph):
+    # Component labels from union-find instead of a traversal
+    union_find = UnionFind(len(graph))
+    offsets, targets = graph.offsets, graph.targets
+    for v in range(len(graph)):
+        for arc in range(offsets[v], offsets[v + 1]):
+            union_find.union(v, targets[arc])
+    return [union_find.find(v) for v in range(len(graph))], union_find.components
+
+
+def removal_sweep(index, steps):
+    # Components after every step of a removal sequence, without a full
+    # traversal per step. steps holds country names and (city_a, city_b)
+    # road closures, applied one after the other on the base network of a
+    # RemovalIndex (country_removal_simulation.py).
+    # Offline reverse union: start from the network after the last step
+    # and add the removed cities and roads back, latest step first; adding
+    # is what union-find handles well.
+    # Returns [(components, largest component), ...] for the full network
+    # and then after each step.
+    never = len(steps) + 1
+    city_removed_at = [never] * len(index.city_codes)
+    road_removed_at = [never] * len(index.roads)
+    for step, item in enumerate(steps, start=1):
+        if isinstance(item, str):
+            cities = index.country_cities.get(index.code_of(item), [])
+            roads = index.roads_of(cities).tolist()
+        else:
+            pair = frozenset(item)
+            if pair not in index.roads_between:
+                raise KeyError(f"There is no road between {item[0]} and {item[1]}.")
+            cities = []
+            roads = index.roads_between[pair]
+        for city in list(cities):
+            city_removed_at[city] = min(city_removed_at[city], step)
+        for road in roads:
+            road_removed_at[road] = min(road_removed_at[road], step)
+
+    cities_at = [[] for _ in range(never + 1)]
+    roads_at = [[] for _ in range(never + 1)]
+    for city, step in enumerate(city_removed_at):
+        cities_at[step].append(city)
+    for road, step in enumerate(road_removed_at):
+        roads_at[step].append(road)
+
+    union_find = UnionFind(len(index.city_codes), active=False)
+    road_a, road_b = index.road_a.tolist(), index.road_b.tolist()
+    history = []
+    for step in range(never, 0, -1):
+        # everything removed at this step (or never) is still there before it
+        for city in cities_at[step]:
+            union_find.activate(city)
+        for road in roads_at[step]:
+            union_find.union(road_a[road], road_b[road])
+        history.append((union_find.components, union_find.largest))
+    return history[::-1]
 
 
 def detect_components(road_map, cities_dict):
 
-    visited = set()
+    # road_map may be a dict of dicts or a CSRGraph; nodes are dense indices
+    graph = as_csr_graph(road_map)
+    city_ids = graph.city_ids
+    visited = bytearray(len(graph))
     components = []
     country_components = []
     city_count_per_component = []
 
     def depth_first(city, current_component, countries_in_component):
-        if city in visited:
-            return False
-        visited.add(city)
-        country = cities_dict[city].country_n
-        countries_in_component.add(country)
-        current_component.add(city)
-        for adjacent_city in road_map.get(city, []):
-            depth_first(adjacent_city, current_component, countries_in_component)
-        return True
+        # Same visiting order as a recursive depth-first search, but with an
+        # explicit stack of neighbour iterators, so long road chains cannot
+        # hit the recursion limit
+        visited[city] = 1
+        stack = [(city, graph.neighbors(city))]
+        countries_in_component.add(cities_dict[city_ids[city]].country_n)
+        current_component.add(city_ids[city])
+        while stack:
+            for adjacent_city, _ in stack[-1][1]:
+                if not visited[adjacent_city]:
+                    visited[adjacent_city] = 1
+                    country = cities_dict[city_ids[adjacent_city]].country_n
+                    countries_in_component.add(country)
+                    current_component.add(city_ids[adjacent_city])
+                    stack.append((adjacent_city, graph.neighbors(adjacent_city)))
+                    break
+            else:
+                stack.pop()
 
     # Main loop that goes through all cities
-    for city in road_map:
-        if city not in visited:
+    for city in range(len(graph)):
+        if not visited[city]:
             current_component = set()
             countries_in_component = set()
-            if depth_first(city, current_component, countries_in_component):
-                components.append(current_component)
-                country_components.append(countries_in_component)
-                city_count_per_component.append(len(current_component))
+            depth_first(city, current_component, countries_in_component)
+            components.append(current_component)
+            country_components.append(countries_in_component)
+            city_count_per_component.append(len(current_component))
 
     # Now, print the results
     print(f" \nComponents found: {len(components)}")
@@ -64,7 +206,13 @@ def detect_components(road_map, cities_dict):
 
 
 # You would call this function like so, after you've removed the countries:
-detect_components(road_map, cities_deleted_c)
+def main(removed_countries=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    detect_components(load_road_graph(removed_countries), cities_deleted_c)
+
+
+if __name__ == "__main__":
+    main()
 
 """
 In the detect_components function, there are a few key parts to consider:
@@ -81,4 +229,10 @@ Combining these two, the overall runtime complexity of the function is O(n + m),
 because we go through each city once, and for each city, we explore its adjacent 
 cities via DFS. The m in the complexity accounts for the total number of road 
 connections because, in the worst case, every city could be connected to every other city.
+
+-----
+
+removal_sweep: one union-find pass over the final network plus the
+removed cities and roads of every step, O((n + r) alpha(n)) for the
+whole sequence instead of O(n + m) per step.
 """
@@ -0,0 +1,401 @@
+"""
+This code block defines a Contraction Hierarchies (CH) index for
+answering many point-to-point queries on a static road map:
+
+Preprocessing (ContractionHierarchy.build) contracts the cities one
+by one in order of importance. The next city is the one with the
+smallest priority (edge difference plus the number of already
+contracted neighbours), recomputed lazily before it is contracted.
+When a city v is removed, a shortcut u - w is added for each pair
+of its neighbours unless a local witness search finds a path from u
+to w that avoids v and is not longer than u - v - w.
+
+Every city keeps only its "upward" roads and shortcuts, i.e. those
+leading to cities contracted later. These are stored in flat CSR
+arrays (up_offsets, up_targets, up_weights, up_middle), where
+up_middle holds the contracted middle city of a shortcut (-1 for an
+original road). The index can be saved to and loaded from an .npz
+file. An index built from a graph refuses queries once the roads of
+that graph change in place (CSRGraph.set_distance).
+
+A query runs a bidirectional Dijkstra that only walks upward from
+both ends. Each side stops once its queue head reaches the best
+connection found. Shortcuts on the result are unpacked recursively
+into the original roads, so query() returns the same
+[(city, cumulative_distance), ...] path as dijkstra().
+
+compare_with_dijkstra cross-checks random pairs against dijkstra(),
+the same way pathfinding_comparison.py compares A* and Dijkstra.
+"""
+
+from array import array
+from heapq import heappush, heappop
+import random
+import time
+
+import numpy as np
+
+from csr_graph import as_csr_graph, check_graph_version
+from dijkstra_shortest_path import dijkstra
+from network_api import load_road_graph, load_scenario
+
+CH_FORMAT_VERSION = 1
+
+
+class ContractionHierarchy:
+    def __init__(
+        self, city_ids, rank, up_offsets, up_targets, up_weights, up_middle, graph=None
+    ):
+        # graph: the CSRGraph the index was built from, if known; queries
+        # are refused once its roads change
+        self.graph = graph
+        self.graph_version = graph.version if graph is not None else None
+        self.city_ids = city_ids
+        self.rank = rank
+        self.up_offsets = up_offsets
+        self.up_targets = up_targets
+        self.up_weights = up_weights
+        self.up_middle = up_middle
+        self.index_of = {city: index for index, city in enumerate(city_ids)}
+
+    @classmethod
+    def build(cls, map, settled_limit=200):
+        graph = as_csr_graph(map)
+        n = len(graph)
+
+        # Mutable adjacency: adjacency[v][w] = (distance, middle city or -1)
+        adjacency = [{} for _ in range(n)]
+        for v in range(n):
+            for w, road_distance in graph.neighbors(v):
+                if w != v and road_distance < adjacency[v].get(w, (float("inf"),))[0]:
+                    adjacency[v][w] = (road_distance, -1)
+                    adjacency[w][v] = (road_distance, -1)
+
+        deleted_neighbors = [0] * n
+        rank = array("i", [0] * n)
+        upward = [None] * n
+
+        def priority(v):
+            shortcuts = _shortcuts(adjacency, v, settled_limit)
+            return len(shortcuts) - len(adjacency[v]) + deleted_neighbors[v]
+
+        queue = [(priority(v), v) for v in range(n)]
+        queue.sort()
+        level = 0
+        while queue:
+            _, v = heappop(queue)
+            # Lazy update: contract v only if it is still the cheapest
+            current = priority(v)
+            if queue and current > queue[0][0]:
+                heappush(queue, (current, v))
+                continue
+
+            for u, w, distance in _shortcuts(adjacency, v, settled_limit):
+                if distance < adjacency[u].get(w, (float("inf"),))[0]:
+                    adjacency[u][w] = (distance, v)
+                    adjacency[w][u] = (distance, v)
+
+            # The remaining neighbours are contracted later, so the roads
+            # to them become the upward roads of v
+            upward[v] = list(adjacency[v].items())
+            for u in adjacency[v]:
+                del adjacency[u][v]
+                deleted_neighbors[u] += 1
+            adjacency[v] = {}
+            rank[v] = level
+            level += 1
+
+        up_offsets = array("q", [0])
+        up_targets = array("i")
+        up_weights = array("d")
+        up_middle = array("i")
+        for v in range(n):
+            for w, (distance, middle) in upward[v]:
+                up_targets.append(w)
+                up_weights.append(distance)
+                up_middle.append(middle)
+            up_offsets.append(len(up_targets))
+
+        return cls(
+            array("q", graph.city_ids),
+            rank,
+            up_offsets,
+            up_targets,
+            up_weights,
+            up_middle,
+            graph,
+        )
+
+    def __len__(self):
+        return len(self.city_ids)
+
+    @property
+    def shortcut_count(self):
+        return sum(1 for middle in self.up_middle if middle != -1)
+
+    def save(self, path):
+        np.savez(
+            path,
+            format_version=np.array(CH_FORMAT_VERSION),
+            city_ids=np.frombuffer(self.city_ids, dtype=np.int64),
+            rank=np.frombuffer(self.rank, dtype=np.int32),
+            up_offsets=np.frombuffer(self.up_offsets, dtype=np.int64),
+            up_targets=np.frombuffer(self.up_targets, dtype=np.int32),
+            up_weights=np.frombuffer(self.up_weights, dtype=np.float64),
+            up_middle=np.frombuffer(self.up_middle, dtype=np.int32),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != CH_FORMAT_VERSION:
+                raise ValueError(
+                    f"CH index '{path}' has format version {version}, "
+                    f"expected {CH_FORMAT_VERSION}."
+                )
+            buffers = [
+                _to_array(typecode, data[name])
+                for typecode, name in (
+                    ("q", "city_ids"),
+                    ("i", "rank"),
+                    ("q", "up_offsets"),
+                    ("i", "up_targets"),
+                    ("d", "up_weights"),
+                    ("i", "up_middle"),
+                )
+            ]
+        return cls(*buffers)
+
+    def _upward_search(self, source, target):
+        # Bidirectional upward Dijkstra; the road map is undirected, so
+        # both directions use the same upward graph
+        check_graph_version(self.graph, self.graph_version, "CH index")
+        offsets, targets, weights = self.up_offsets, self.up_targets, self.up_weights
+        dist = ({source: 0}, {target: 0})
+        pred = ({source: -1}, {target: -1})
+        queues = ([(0, source)], [(0, target)])
+        mu, meet = float("inf"), -1
+
+        while queues[0] or queues[1]:
+            if not queues[1] or (queues[0] and queues[0][0][0] <= queues[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            d, v = heappop(queues[side])
+            if d >= mu:
+                # nothing on this side can improve the connection any more
+                queues[side].clear()
+                continue
+            if d > dist[side][v]:
+                continue
+            other = dist[1 - side].get(v)
+            if other is not None and d + other < mu:
+                mu, meet = d + other, v
+            start, end = offsets[v], offsets[v + 1]
+            for w, road_distance in zip(targets[start:end], weights[start:end]):
+                distance = d + road_distance
+                if distance < dist[side].get(w, float("inf")):
+                    dist[side][w] = distance
+                    pred[side][w] = v
+                    heappush(queues[side], (distance, w))
+
+        return mu, meet, pred
+
+    def upward_distances(self, source):
+        # Complete upward search from dense index source: the distance to
+        # every city reachable over upward arcs (its CH search space). Two
+        # such searches meet at the highest city of every shortest path.
+        check_graph_version(self.graph, self.graph_version, "CH index")
+        offsets, targets, weights = self.up_offsets, self.up_targets, self.up_weights
+        dist = {source: 0}
+        queue = [(0, source)]
+        while queue:
+            d, v = heappop(queue)
+            if d > dist[v]:
+                continue
+            start, end = offsets[v], offsets[v + 1]
+            for w, road_distance in zip(targets[start:end], weights[start:end]):
+                distance = d + road_distance
+                if distance < dist.get(w, float("inf")):
+                    dist[w] = distance
+                    heappush(queue, (distance, w))
+        return dist
+
+    def _arc(self, a, b):
+        # The arc between a and b is stored at the lower ranked city
+        if self.rank[a] > self.rank[b]:
+            a, b = b, a
+        for i in range(self.up_offsets[a], self.up_offsets[a + 1]):
+            if self.up_targets[i] == b:
+                return self.up_weights[i], self.up_middle[i]
+        raise KeyError(f"No arc between {self.city_ids[a]} and {self.city_ids[b]}.")
+
+    def _unpack(self, a, b):
+        # Replace the arc a - b by original roads; returns the cities after a
+        nodes = []
+        stack = [(a, b)]
+        while stack:
+            u, w = stack.pop()
+            middle = self._arc(u, w)[1]
+            if middle == -1:
+                nodes.append(w)
+            else:
+                stack.append((middle, w))
+                stack.append((u, middle))
+        return nodes
+
+    def distance(self, origin, destination):
+        if origin not in self.index_of or destination not in self.index_of:
+            return float("inf")
+        return self._upward_search(self.index_of[origin], self.index_of[destination])[0]
+
+    def query(self, origin, destination):
+        if origin not in self.index_of or destination not in self.index_of:
+            print(f"No path from {origin} to {destination}")
+            return []
+        mu, meet, pred = self._upward_search(
+            self.index_of[origin], self.index_of[destination]
+        )
+        if meet == -1:
+            print(f"No path from {origin} to {destination}")
+            return []
+
+        # Upward chains origin -> meet and destination -> meet
+        chain = [meet]
+        while pred[0][chain[-1]] != -1:
+            chain.append(pred[0][chain[-1]])
+        chain.reverse()
+        node = meet
+        while pred[1][node] != -1:
+            node = pred[1][node]
+            chain.append(node)
+
+        nodes = [chain[0]]
+        for a, b in zip(chain, chain[1:]):
+            nodes.extend(self._unpack(a, b))
+
+        distance = 0
+        path = [(self.city_ids[nodes[0]], distance)]
+        for a, b in zip(nodes, nodes[1:]):
+            distance += self._arc(a, b)[0]
+            path.append((self.city_ids[b], distance))
+        return path
+
+
+def _shortcuts(adjacency, v, settled_limit):
+    # Shortcuts (u, w, distance) needed when v is contracted
+    neighbors = list(adjacency[v].items())
+    shortcuts = []
+    for i, (u, (distance_u, _)) in enumerate(neighbors[:-1]):
+        remaining = neighbors[i + 1 :]
+        limit = distance_u + max(distance_w for _, (distance_w, _) in remaining)
+        witness = _witness_search(adjacency, u, v, limit, settled_limit)
+        for w, (distance_w, _) in remaining:
+            if witness.get(w, float("inf")) > distance_u + distance_w:
+                shortcuts.append((u, w, distance_u + distance_w))
+    return shortcuts
+
+
+def _witness_search(adjacency, source, excluded, limit, settled_limit):
+    # Local Dijkstra from source that avoids the city being contracted.
+    # It is cut off at limit and after settled_limit cities; a missed
+    # witness only adds an unnecessary shortcut, never a wrong distance.
+    dist = {source: 0}
+    priority_queue = [(0, source)]
+    settled = 0
+    while priority_queue:
+        d, x = heappop(priority_queue)
+        if d > dist[x]:
+            continue
+        if d > limit or settled >= settled_limit:
+            break
+        settled += 1
+        for y, (road_distance, _) in adjacency[x].items():
+            if y == excluded:
+                continue
+            distance = d + road_distance
+            if distance < dist.get(y, float("inf")):
+                dist[y] = distance
+                heappush(priority_queue, (distance, y))
+    return dist
+
+
+def _to_array(typecode, values):
+    buffer = array(typecode)
+    buffer.frombytes(np.ascontiguousarray(values).tobytes())
+    return buffer
+
+
+def compare_with_dijkstra(ch, map, cities_dict, repetitions=100, seed=None):
+    # Returns the number of pairs where the CH distance differs from Dijkstra
+    rng = random.Random(seed)
+    cities = list(cities_dict.keys())
+    mismatches = 0
+    for rep in range(repetitions):
+        city1 = rng.choice(cities)
+        city2 = rng.choice(cities)
+        path_ch = ch.query(city1, city2)
+        path_dijkstra = dijkstra(map, city1, city2, cities_dict)
+        distance_ch = path_ch[-1][-1] if path_ch else None
+        distance_dijkstra = path_dijkstra[-1][-1] if path_dijkstra else None
+        if distance_ch != distance_dijkstra:
+            mismatches += 1
+            print(
+                f"{city1} --> {city2} | CH != Dijkstra |",
+                f"Distance CH: {distance_ch}",
+                f"Distance Dijkstra: {distance_dijkstra}",
+            )
+    print(f"| CH == Dijkstra | on {repetitions - mismatches}/{repetitions} pairs")
+    return mismatches
+
+
+def main(removed_countries=None, index_path=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+
+    start_time = time.perf_counter()
+    ch = ContractionHierarchy.build(road_graph)
+    build_time = time.perf_counter() - start_time
+    print(
+        f"Contracted {len(ch)} cities in {build_time:.2f} s,",
+        f"{ch.shortcut_count} shortcuts added.",
+    )
+    if index_path:
+        ch.save(index_path)
+        ch = ContractionHierarchy.load(index_path)
+        print(f"CH index written to {index_path}")
+
+    compare_with_dijkstra(ch, road_graph, cities_deleted_c, repetitions=200)
+
+    cities = list(cities_deleted_c.keys())
+    pairs = [(random.choice(cities), random.choice(cities)) for _ in range(1000)]
+    start_time = time.perf_counter()
+    for city1, city2 in pairs:
+        ch.distance(city1, city2)
+    query_time = (time.perf_counter() - start_time) / len(pairs) * 1000
+    print(f"Average CH query: {query_time:.4f} ms")
+    return ch
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+Runtime analysis:
+
+Preprocessing:
+Each contraction runs one witness search per neighbour, and each
+search is capped at settled_limit cities. With bounded degrees this
+is close to O(n log n) in practice, plus the lazy priority updates.
+The worst case (dense graphs, no witnesses) is O(n^3).
+
+Query:
+Both upward searches only visit cities of higher rank, usually a few
+dozen to a few hundred cities even on continental road networks,
+instead of the O((V+E)logV) of a full Dijkstra search.
+
+Path unpacking:
+Linear in the number of original roads on the path.
+"""
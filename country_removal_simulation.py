@@ -1,17 +1,18 @@
 """
-This code block defines and executes a function that interactively 
-allows the user to remove a country from a dataset. 
+This code block defines a function that removes countries from a dataset,
+either interactively or from a given list of country names. 
 
 The function performs the following actions:
 
-Takes input: the name of the country they wish to remove.
+Takes input: the name of the country they wish to remove
+(or the next name of countries_to_remove, when a list is given).
 
 Identifies and deletes the selected country from countries_dict3, 
 its corresponding cities from cities_dict3, and any roads connected 
 to those cities from roads_list3.
 
 Continuously prompts the user to remove additional countries 
-until they choose to stop.
+until they choose to stop (or until the given list is exhausted).
 
 ------
 
@@ -31,114 +32,292 @@ Returns the updated lists of cities and roads, and the new road map.
 This function is useful for simulating the effects of removing specific countries 
 from a transportation network and assessing the impact on connectivity.
 
-"""
-
-import copy
-from city_country_distribution import roads_dict, cities_dict, countries_dict
-
-
-def remove_country(roads_list3, cities_dict3, countries_dict3):
-
-    # print(len(roads_list3))
+------
 
-    # Create deep copies of the input dictionaries to avoid modifying originals
-    countries_copy = copy.deepcopy(countries_dict3)
-    cities_copy = copy.deepcopy(cities_dict3)
-    roads_copy = copy.deepcopy(roads_list3)
+The removal itself is done by "RemovalIndex", which is built once for
+the base network. It precomputes a country -> cities index and a
+city -> incident roads index, so removing a country only touches its
+own cities and roads instead of scanning every road for every city.
+
+The index keeps the roads as columns (the dense indices of both ends
+and the distance, read straight from initialization.load_tables when
+it is given the columnar tables). The base graph, the road lookups and
+the road maps of the scenarios are built from these columns, without
+going through a Road object per road.
+
+RemovalIndex.remove(countries, closed_roads) returns a
+"RemovalScenario": a node mask over the cities and a road mask over
+the roads of the base network. Nothing is copied; the remaining
+cities, roads, road map or CSR graph are only built when they are
+asked for, and the CSR graph is a masked view of the base graph.
+Closing individual roads (given as pairs of city codes) works the
+same way.
+"""
 
-    while True:
-        choice_input = input("which country would you like to remove?: ")
-        cities_to_delete = []
-        roads_to_delete = []
+import numpy as np
 
-        # Find the country code for the selected country
-        for country in countries_copy:
-            if countries_copy[country].c_name == choice_input:
-                delete_code = country
+from csr_graph import CSRGraph, dense_index
 
-                # Find cities within the selected country
-                for city in cities_copy:
-                    if cities_copy[city].country_n == delete_code:
-                        cities_to_delete.append(city)
 
-                        # Find roads connected to these cities
-                        for road in roads_copy:
-                            index = roads_copy.index(road)
-                            if (road.point_a == city or road.point_b == city) and (
-                                index not in roads_to_delete
-                            ):
-                                roads_to_delete.append(roads_copy.index(road))
+def build_road_map(cities, roads):
+    # Initialize the road map with empty dictionaries for each city
+    road_map_generator = map(lambda city_code: (city_code, {}), cities.keys())
+    road_map = dict(road_map_generator)
 
-                print(f"{choice_input} deleted.")
-                break
+    # Populate the road map with the roads and distances using a for-loop
+    for road in roads:
+        city1 = road.point_a
+        city2 = road.point_b
+        distance = road.distance  # assuming each road has a 'distance' attribute
 
-        # print(cities_to_delete)
-        # print(roads_to_delete)
+        road_map[city1][city2] = distance
+        road_map[city2][city1] = distance
+    return road_map
 
-        del countries_copy[delete_code]
-        country_deleted_c = copy.deepcopy(countries_copy)
 
-        # print(len(cities_deleted_c))
+class RemovalIndex:
+    def __init__(self, roads_list3, cities_dict3, countries_dict3):
+        self.roads = roads_list3
+        self.cities = cities_dict3
+        self.countries = countries_dict3
+        self.city_codes = list(cities_dict3)
+        self.city_index = {city: index for index, city in enumerate(self.city_codes)}
 
-        for city_code in cities_to_delete:
-            del cities_copy[city_code]
+        # country name -> country code (the first match, like the old scan)
+        self.country_code = {}
+        for code, country in countries_dict3.items():
+            self.country_code.setdefault(country.c_name, code)
 
-        cities_deleted_c = copy.deepcopy(cities_copy)
+        # Columnar tables (initialization.load_tables) are read directly
+        cities_columns = getattr(cities_dict3, "columns", None)
+        roads_columns = getattr(roads_list3, "columns", None)
 
-        # print(len(cities_deleted_c))
+        # country code -> dense indices of its cities
+        if cities_columns is not None:
+            city_country = cities_columns.city_country.tolist()
+        else:
+            city_country = [city.country_n for city in cities_dict3.values()]
+        country_cities = {code: [] for code in countries_dict3}
+        for index, country in enumerate(city_country):
+            country_cities.setdefault(country, []).append(index)
+        self.country_cities = {
+            code: np.array(cities, dtype=np.int64)
+            for code, cities in country_cities.items()
+        }
+
+        # Road columns: dense city index of both ends and the distance. All
+        # the structures below are built from them, without Road objects.
+        if roads_columns is not None:
+            codes = np.array(self.city_codes, dtype=np.int64)
+            self.road_a = dense_index(codes, roads_columns.road_a)
+            self.road_b = dense_index(codes, roads_columns.road_b)
+            self.road_distance = np.asarray(
+                roads_columns.road_distance, dtype=np.float64
+            )
+        else:
+            self.road_a = np.array(
+                [self.city_index[road.point_a] for road in roads_list3],
+                dtype=np.int64,
+            )
+            self.road_b = np.array(
+                [self.city_index[road.point_b] for road in roads_list3],
+                dtype=np.int64,
+            )
+            self.road_distance = np.array(
+                [road.distance for road in roads_list3], dtype=np.float64
+            )
+
+        # city -> incident roads, as CSR arrays over the dense city indices
+        ends = np.concatenate([self.road_a, self.road_b])
+        road_ids = np.tile(np.arange(len(roads_list3)), 2)
+        self.incident_offsets = np.zeros(len(self.city_codes) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(ends, minlength=len(self.city_codes)),
+            out=self.incident_offsets[1:],
+        )
+        self.incident_roads = road_ids[np.argsort(ends, kind="stable")]
+
+        # pair of cities -> indices of the roads between them
+        codes = np.array(self.city_codes, dtype=np.int64)
+        codes_a = codes[self.road_a]
+        codes_b = codes[self.road_b]
+        self.roads_between = {}
+        for index, pair in enumerate(zip(codes_a.tolist(), codes_b.tolist())):
+            self.roads_between.setdefault(frozenset(pair), []).append(index)
+
+        # Base graph and the two arcs (a -> b, b -> a) of every road in it.
+        # from_edges keeps the arcs of a city in road order with a -> b before
+        # b -> a, so a stable sort of the arc sources gives their positions.
+        self.graph = CSRGraph.from_edges(codes, codes_a, codes_b, self.road_distance)
+        sources = np.column_stack([self.road_a, self.road_b]).ravel()
+        arc_of = np.empty(len(sources), dtype=np.int64)
+        arc_of[np.argsort(sources, kind="stable")] = np.arange(len(sources))
+        self.road_arcs = arc_of.reshape(len(self.road_a), 2)
+
+    def code_of(self, country_name):
+        if country_name not in self.country_code:
+            raise KeyError(f"Country '{country_name}' is not in the dataset.")
+        return self.country_code[country_name]
+
+    def roads_of(self, city_indices):
+        # Indices of the roads touching any of the given cities
+        offsets = self.incident_offsets
+        return np.concatenate(
+            [self.incident_roads[offsets[v] : offsets[v + 1]] for v in city_indices]
+            + [np.zeros(0, dtype=np.int64)]
+        )
+
+    def remove(self, countries_to_remove=(), closed_roads=()):
+        node_mask = np.ones(len(self.city_codes), dtype=bool)
+        road_mask = np.ones(len(self.roads), dtype=bool)
+        removed = []
+        for name in countries_to_remove:
+            code = self.code_of(name)
+            if code in removed:
+                raise ValueError(f"Country '{name}' is listed more than once.")
+            removed.append(code)
+            cities = self.country_cities.get(code, [])
+            node_mask[cities] = False
+            road_mask[self.roads_of(cities)] = False
+        for city_a, city_b in closed_roads:
+            pair = frozenset((city_a, city_b))
+            if pair not in self.roads_between:
+                raise KeyError(f"There is no road between {city_a} and {city_b}.")
+            road_mask[self.roads_between[pair]] = False
+        return RemovalScenario(self, removed, node_mask, road_mask)
+
+
+class RemovalScenario:
+    def __init__(self, index, removed_codes, node_mask, road_mask):
+        self.index = index
+        self.removed_codes = tuple(removed_codes)
+        self.node_mask = node_mask
+        self.road_mask = road_mask
+
+    @property
+    def city_count(self):
+        return int(self.node_mask.sum())
+
+    @property
+    def road_count(self):
+        return int(self.road_mask.sum())
+
+    def cities(self):
+        # The remaining cities; the City objects are shared with the base
+        # network, not copied
+        index = self.index
+        return {
+            city: index.cities[city]
+            for city, keep in zip(index.city_codes, self.node_mask.tolist())
+            if keep
+        }
+
+    def countries(self):
+        return {
+            code: country
+            for code, country in self.index.countries.items()
+            if code not in self.removed_codes
+        }
+
+    def roads(self):
+        return [
+            road
+            for road, keep in zip(self.index.roads, self.road_mask.tolist())
+            if keep
+        ]
+
+    def road_map(self):
+        # build_road_map over the remaining cities and roads, read from the
+        # road columns of the index instead of the Road objects
+        index = self.index
+        codes = index.city_codes
+        road_map = {codes[city]: {} for city in np.flatnonzero(self.node_mask).tolist()}
+        for a, b, distance in zip(
+            index.road_a[self.road_mask].tolist(),
+            index.road_b[self.road_mask].tolist(),
+            index.road_distance[self.road_mask].tolist(),
+        ):
+            road_map[codes[a]][codes[b]] = distance
+            road_map[codes[b]][codes[a]] = distance
+        return road_map
+
+    def arc_mask(self):
+        # Arcs of the base graph that belong to a remaining road
+        mask = np.zeros(self.index.graph.edge_count, dtype=bool)
+        mask[self.index.road_arcs[self.road_mask].ravel()] = True
+        return mask
+
+    def to_csr_graph(self):
+        return self.index.graph.subgraph(self.node_mask, self.arc_mask())
+
+    def not_connected(self):
+        # Remaining cities without any remaining road
+        degree = np.bincount(
+            np.concatenate(
+                [self.index.road_a[self.road_mask], self.index.road_b[self.road_mask]]
+            ),
+            minlength=len(self.node_mask),
+        )
+        isolated = np.flatnonzero(self.node_mask & (degree == 0))
+        return [self.index.city_codes[city] for city in isolated.tolist()]
+
+
+def ask_countries(index):
+    # The interactive dialogue of remove_country
+    names = []
+    while True:
+        choice_input = input("which country would you like to remove?: ")
+        index.code_of(choice_input)
+        if choice_input in names:
+            raise ValueError(f"Country '{choice_input}' is listed more than once.")
+        names.append(choice_input)
+        choice2 = int(input("Delete another country? Yes [1] No [0]: "))
+        if choice2 != 1:
+            return names
 
-        roads_to_delete.sort(reverse=True)
 
-        # print(roads_to_delete)
+def remove_countries(index, countries_to_remove=None):
+    # Without a list of countries the user is asked interactively
+    if countries_to_remove is None:
+        countries_to_remove = ask_countries(index)
+    scenario = index.remove(countries_to_remove)
+    for name in countries_to_remove:
+        print(f"{name} deleted.")
+    for city in scenario.not_connected():
+        print(f"{city} ({index.cities[city].name}) is not connected.")
+    return scenario
 
-        # Delete the road at the specified index
-        for road_index in roads_to_delete:
-            # print(f"Deleting road at index {road_index}.")
-            del roads_copy[road_index]
 
-        roads_deleted_c = copy.deepcopy(roads_copy)
+def remove_country(
+    roads_list3, cities_dict3, countries_dict3, countries_to_remove=None
+):
+    # Returns (cities, roads, road_map) of the network without the countries
+    index = RemovalIndex(roads_list3, cities_dict3, countries_dict3)
+    scenario = remove_countries(index, countries_to_remove)
+    return scenario.cities(), scenario.roads(), scenario.road_map()
 
-        # print(len(roads_deleted_c))
 
-        choice2 = int(input("Delete another country? Yes [1] No [0]: "))
-        if choice2 == 1:
-            continue
-        else:
-            break
-
-    # print(len(roads_deleted_c))
-
-    # Rebuild the road map excluding the deleted countries and their roads
-    not_connected = []
-    for city in cities_deleted_c:
-        connected = False
-        for road in roads_deleted_c:
-            if road.point_a == city or road.point_b == city:
-                connected = True
-                break
-        if not connected:
-            print(f"{city} ({cities_deleted_c[city].name}) is not connected.")
-            not_connected.append(city)
+def main(countries_to_remove=None):
+    from network_api import load_scenario
 
-    # Initialize the road map with empty dictionaries for each city
-    road_map_generator = map(lambda city_code: (city_code, {}), cities_deleted_c.keys())
-    road_map = dict(road_map_generator)
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(countries_to_remove)
+    print(f"Remaining: {len(cities_deleted_c)} cities, {len(roads_deleted_c)} roads")
+    return cities_deleted_c, roads_deleted_c, road_map
 
-    # Populate the road map with the roads and distances using a for-loop
-    for road in roads_deleted_c:
-        city1 = road.point_a
-        city2 = road.point_b
-        distance = road.distance  # assuming each road has a 'distance' attribute
 
-        road_map[city1][city2] = distance
-        road_map[city2][city1] = distance
+if __name__ == "__main__":
+    main()
 
-    # print(road_map)
-    # print(cities_deleted_c)
 
-    return cities_deleted_c, roads_deleted_c, road_map
+"""
+Runtime analysis:
 
+The old version scanned every road for every city of a removed country
+and called roads.index(road) inside that scan, O(c * r^2) for c removed
+cities and r roads, followed by deep copies of all data after every
+country.
 
-cities_deleted_c, roads_deleted_c, road_map = remove_country(
-    roads_dict, cities_dict, countries_dict
-)
+RemovalIndex is built once in O(n + r). Removing countries then costs
+O(n + r) for the two masks (plus the size of the removed countries),
+and to_csr_graph is a vectorised O(n + m) filter of the base graph.
+"""
@@ -1,8 +1,14 @@
 """
 This code block defines:
 
-A DijkstraElement class to encapsulate a city node, its distance 
-from the origin, and the prior node in the path.
+A dijkstra_search function, the array-based core of Dijkstra's
+algorithm. Tentative distances and predecessors are kept in lists
+indexed by the dense node index of the CSR graph. The priority queue
+holds plain (distance, index) tuples, a node is only pushed when its
+distance improves, and outdated queue entries are skipped when
+popped (lazy deletion instead of decrease-key). The search stops as
+soon as the target is settled. dijkstra_search_hops runs the same
+search over the whole graph and also counts the roads on each path.
 
 A dijkstra function that implements Dijkstra's algorithm to find 
 the shortest path between two cities in a road network.
@@ -14,99 +20,209 @@ the destination is reached or no path exists.
 
 Upon completion, the dijkstra function returns the shortest path 
 from the origin to the destination city, including the cumulative 
-distance at each step. The function also handles cases where a 
+distance at each step. The path is rebuilt from the predecessor 
+list only once, at the end. The function also handles cases where a 
 city is not in the road network or no path is possible.
 
-The provided code then uses this function to find and print the 
+A bidirectional_dijkstra function with the same arguments and 
+return format. It grows one search from the origin and one from 
+the destination and stops as soon as the sum of both queue heads 
+reaches the best connection found, which settles far fewer cities 
+than a single search for long routes.
+
+Running the module (main) then uses this function to find and print the 
 shortest paths between two pairs of cities in the updated road map 
 after certain countries have been removed. This is valuable for 
 route planning and navigation within the modified road network.
 """
 
-from country_removal_simulation import cities_deleted_c, roads_deleted_c, road_map
-
-
-class DijkstraElement:
-    def __init__(self, city, distance, prior=None):
-        self._city = city
-        self._distance = distance
-        self._prior = prior
-
-    @property
-    def city(self):
-        return self._city
+from heapq import heappush, heappop
 
-    @property
-    def distance(self):
-        return self._distance
-
-    @property
-    def prior(self):
-        return self._prior
-
-    def __lt__(self, other):
-        if isinstance(other, DijkstraElement):
-            return self.distance < other.distance
-        raise TypeError(f"Cannot compare {self.__class__} to {type(other)}")
+from csr_graph import as_csr_graph
+from network_api import load_road_graph, load_scenario
 
 
 # Dijkstra's shortest path implementation
-
-import heapq
-
-
-def dijkstra(map, origin, destination, cities_dict5):
-
-    visited = {}
-    priority_queue = []
-    current = DijkstraElement(city=origin, distance=0)
-    # loop is O(n), total O(n^2 log n)
-    while True:
-        if not current.city in visited:
-            visited[current.city] = current
-            if current.city == destination:
-                break
-            # loop is O(n), total O(n log n)
-            if current.city not in cities_dict5:
-                print(f"This city ({current.city})", "is not in the road network.")
-            else:
-                for neighbor in map[current.city]:
-                    distance = current.distance + map[current.city][neighbor]
-                    # heappush is O(log n)
-                    heapq.heappush(
-                        priority_queue,
-                        DijkstraElement(
-                            city=neighbor, distance=distance, prior=current
-                        ),
-                    )
-        if len(priority_queue) == 0:
-            print(f"No path from {origin} to {destination}")
-            return []
-        # heappop is O(log n)
-        current = heapq.heappop(priority_queue)
-
-    waypoint = current
-    path = [(waypoint.city, waypoint.distance)]
-    # loop is O(n)
-    while waypoint.prior is not None:
-        waypoint = waypoint.prior
-        path.append((waypoint.city, waypoint.distance))
-
+def dijkstra_search(graph, source, target=-1):
+    # graph is a CSRGraph, source and target are dense node indices.
+    # Without a target the whole shortest path tree of source is built.
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    dist = [float("inf")] * len(graph)
+    pred = [-1] * len(graph)
+    dist[source] = 0
+    priority_queue = [(0, source)]
+
+    # every node is pushed at most once per improvement, O(m log n) in total
+    while priority_queue:
+        d, v = heappop(priority_queue)
+        if d > dist[v]:
+            # outdated entry, v was already settled with a shorter distance
+            continue
+        if v == target:
+            break
+        start, end = offsets[v], offsets[v + 1]
+        for w, road_distance in zip(targets[start:end], weights[start:end]):
+            distance = d + road_distance
+            if distance < dist[w]:
+                dist[w] = distance
+                pred[w] = v
+                heappush(priority_queue, (distance, w))
+
+    return dist, pred
+
+
+def dijkstra_search_hops(graph, source):
+    # Full search from source, returns (dist, hops): the shortest distances
+    # and the number of roads on the path dijkstra_search chooses (the same
+    # relaxation order, so the same predecessor tree); inf when unreachable
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    dist = [float("inf")] * len(graph)
+    hops = [float("inf")] * len(graph)
+    dist[source] = 0
+    hops[source] = 0
+    priority_queue = [(0, source)]
+
+    while priority_queue:
+        d, v = heappop(priority_queue)
+        if d > dist[v]:
+            continue
+        start, end = offsets[v], offsets[v + 1]
+        for w, road_distance in zip(targets[start:end], weights[start:end]):
+            distance = d + road_distance
+            if distance < dist[w]:
+                dist[w] = distance
+                hops[w] = hops[v] + 1
+                heappush(priority_queue, (distance, w))
+
+    return dist, hops
+
+
+def build_path(graph, dist, pred, target):
+    # Walk the predecessor list back from target, O(length of the path)
+    city_ids = graph.city_ids
+    path = []
+    while target != -1:
+        path.append((city_ids[target], dist[target]))
+        target = pred[target]
     return path[::-1]
 
 
-# successful example
-path_dijkstra = dijkstra(road_map, 742, 659, cities_deleted_c)
-
-# failed example
-path_dijkstra2 = dijkstra(road_map, 2, 68, cities_deleted_c)
-
-if path_dijkstra:
-    print(f"Path 1: {path_dijkstra}")
-else:
-    print("No path for these cities")
+def dijkstra(map, origin, destination, cities_dict5):
 
-if path_dijkstra:
-    print(f"Path 2: {path_dijkstra2}")
-else:
-    print("No path for these cities")
+    # map may be a road_map dict or a CSRGraph; the search runs on dense indices
+    graph = as_csr_graph(map)
+    if origin not in graph:
+        print(f"This city ({origin})", "is not in the road network.")
+        print(f"No path from {origin} to {destination}")
+        return []
+    target = graph.index_of.get(destination, -1)
+
+    dist, pred = dijkstra_search(graph, graph.index_of[origin], target)
+    if target == -1 or dist[target] == float("inf"):
+        print(f"No path from {origin} to {destination}")
+        return []
+
+    return build_path(graph, dist, pred, target)
+
+
+def join_paths(graph, dist_f, pred_f, pred_b, meet):
+    # Forward half from build_path, then follow the backward predecessors
+    # from the meeting node to the target, adding the real road lengths
+    path = build_path(graph, dist_f, pred_f, meet)
+    city_ids = graph.city_ids
+    distance = dist_f[meet]
+    node = meet
+    while pred_b[node] != -1:
+        following = pred_b[node]
+        distance += min(
+            road_distance
+            for neighbor, road_distance in graph.neighbors(node)
+            if neighbor == following
+        )
+        path.append((city_ids[following], distance))
+        node = following
+    return path
+
+
+def bidirectional_search(graph, source, target):
+    # Two Dijkstra searches, forward from source and backward from target.
+    # Road maps are undirected, so the backward search uses the same graph.
+    # The side with the smaller queue head is expanded, and the search stops
+    # once top_f + top_b >= mu, the best source-target distance found so far.
+    # Returns (mu, dist_f, pred_f, pred_b, meet); meet is -1 without a path.
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    inf = float("inf")
+    dist = ([inf] * len(graph), [inf] * len(graph))
+    pred = ([-1] * len(graph), [-1] * len(graph))
+    queues = ([(0, source)], [(0, target)])
+    dist[0][source] = 0
+    dist[1][target] = 0
+    mu, meet = (0, source) if source == target else (inf, -1)
+
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= mu:
+            break
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        dist_side, dist_other, pred_side = dist[side], dist[1 - side], pred[side]
+
+        d, v = heappop(queues[side])
+        if d > dist_side[v]:
+            continue
+        start, end = offsets[v], offsets[v + 1]
+        for w, road_distance in zip(targets[start:end], weights[start:end]):
+            distance = d + road_distance
+            if distance < dist_side[w]:
+                dist_side[w] = distance
+                pred_side[w] = v
+                heappush(queues[side], (distance, w))
+            if dist_side[w] + dist_other[w] < mu:
+                mu = dist_side[w] + dist_other[w]
+                meet = w
+
+    return mu, dist[0], pred[0], pred[1], meet
+
+
+def bidirectional_dijkstra(map, origin, destination, cities_dict5):
+    # Same arguments and return format as dijkstra()
+    graph = as_csr_graph(map)
+    if origin not in graph:
+        print(f"This city ({origin})", "is not in the road network.")
+        print(f"No path from {origin} to {destination}")
+        return []
+    if destination not in graph:
+        print(f"No path from {origin} to {destination}")
+        return []
+
+    mu, dist_f, pred_f, pred_b, meet = bidirectional_search(
+        graph, graph.index_of[origin], graph.index_of[destination]
+    )
+    if meet == -1:
+        print(f"No path from {origin} to {destination}")
+        return []
+
+    return join_paths(graph, dist_f, pred_f, pred_b, meet)
+
+
+def main(removed_countries=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+
+    # successful example
+    path_dijkstra = dijkstra(road_graph, 742, 659, cities_deleted_c)
+
+    # failed example
+    path_dijkstra2 = dijkstra(road_graph, 2, 68, cities_deleted_c)
+
+    if path_dijkstra:
+        print(f"Path 1: {path_dijkstra}")
+    else:
+        print("No path for these cities")
+
+    if path_dijkstra:
+        print(f"Path 2: {path_dijkstra2}")
+    else:
+        print("No path for these cities")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+This code block defines a persistent store for the all-pairs shortest
+path distances and hop counts of a road graph:
+
+"graph_fingerprint" hashes the CSR arrays of the graph (city codes,
+offsets, targets and road lengths). The same road map or removal
+scenario therefore always gets the same key, and any change to a
+city or road gives a new one.
+
+"DistanceMatrix.open" opens the store of a graph in
+<cache_dir>/<fingerprint>/ and creates it on first use:
+
+    distances.npy   float32, n x n, length of the shortest path in km
+                    (inf when unreachable)
+    hops.npy        uint16, n x n, roads on the shortest path chosen by
+                    dijkstra() (UNREACHABLE_HOPS when unreachable)
+    rows.npy        bool, n, the rows that are filled in
+
+The files are memory-mapped, so opening a store costs nothing and
+only the rows that are read are loaded from disk. A store is only
+read through the graph version it was opened for; after a road
+changes in place (CSRGraph.set_distance) open it again, which picks
+the store of the new fingerprint. A row that is not
+filled in yet is computed with one Dijkstra search the first time it
+is asked for and written back (lazy materialisation); later runs read
+it from disk. Road lengths are whole kilometres, so float32 holds
+every sum exactly.
+
+closeness_centrality and harmonic_centrality
+(closeness_betweenness_analysis.py) and the query sets of
+benchmark.py read their rows from the store. network_api caches one
+store per removal scenario (load_distance_matrix). Running the module
+fills every row of a scenario in advance:
+
+    python distance_matrix.py --remove Germany
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from csr_graph import as_csr_graph, check_graph_version
+from dijkstra_shortest_path import dijkstra_search_hops
+
+DISTANCE_MATRIX_VERSION = 1
+# Next to the modules, not in whatever directory the process runs from
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "distance_cache"
+)
+
+# Hop count stored for pairs without a path
+UNREACHABLE_HOPS = np.iinfo(np.uint16).max
+
+# Rows summed at once by path_sums, bounds the temporary arrays
+_BLOCK_ROWS = 256
+
+
+def graph_fingerprint(graph):
+    graph = as_csr_graph(graph)
+    digest = hashlib.sha256(f"distance-matrix-{DISTANCE_MATRIX_VERSION}".encode())
+    for buffer in (graph.city_ids, graph.offsets, graph.targets, graph.weights):
+        digest.update(memoryview(buffer).cast("B"))
+    return digest.hexdigest()
+
+
+def _create_store(path, n):
+    # Files are written to a temporary directory and renamed, so other
+    # processes never see a half-created store
+    temporary = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(temporary)
+    try:
+        for name, dtype, shape in (
+            ("distances.npy", np.float32, (n, n)),
+            ("hops.npy", np.uint16, (n, n)),
+            ("rows.npy", np.bool_, (n,)),
+        ):
+            array = open_memmap(
+                os.path.join(temporary, name), mode="w+", dtype=dtype, shape=shape
+            )
+            array.flush()
+            del array
+        os.rename(temporary, path)
+    except OSError:
+        shutil.rmtree(temporary, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+
+
+class DistanceMatrix:
+    def __init__(self, graph, path):
+        self.graph = graph
+        self.graph_version = graph.version
+        self.path = path
+        self.distances = open_memmap(os.path.join(path, "distances.npy"), mode="r+")
+        self.hops = open_memmap(os.path.join(path, "hops.npy"), mode="r+")
+        self.filled = open_memmap(os.path.join(path, "rows.npy"), mode="r+")
+        if self.distances.shape != (len(graph), len(graph)):
+            raise ValueError(
+                f"Distance matrix '{path}' has shape {self.distances.shape}, "
+                f"expected {(len(graph), len(graph))}."
+            )
+
+    @classmethod
+    def open(cls, map, cache_dir=DEFAULT_CACHE_DIR):
+        graph = as_csr_graph(map)
+        path = os.path.join(cache_dir, graph_fingerprint(graph))
+        if not os.path.isdir(path):
+            os.makedirs(cache_dir, exist_ok=True)
+            _create_store(path, len(graph))
+        return cls(graph, path)
+
+    def __len__(self):
+        return len(self.graph)
+
+    @property
+    def missing_rows(self):
+        return len(self) - int(np.count_nonzero(self.filled))
+
+    def _fill(self, source):
+        dist, hops = dijkstra_search_hops(self.graph, source)
+        hops = np.array(hops)
+        unreachable = np.isinf(hops)
+        if hops[~unreachable].max(initial=0) >= UNREACHABLE_HOPS:
+            raise ValueError(
+                f"A path from node {source} has too many roads for uint16."
+            )
+        hops[unreachable] = UNREACHABLE_HOPS
+        self.distances[source] = dist
+        self.hops[source] = hops
+
+    def ensure_rows(self, sources=None):
+        # Fills the missing rows among sources (default: all) and writes them
+        # to disk. The row flags are written after the data, so an interrupted
+        # run only leaves rows that are computed again. Returns the number of
+        # searches run.
+        check_graph_version(self.graph, self.graph_version, "distance matrix")
+        if sources is None:
+            sources = range(len(self))
+        missing = [source for source in sources if not self.filled[source]]
+        for source in missing:
+            self._fill(source)
+        if missing:
+            self.distances.flush()
+            self.hops.flush()
+            self.filled[missing] = True
+            self.filled.flush()
+        return len(missing)
+
+    def distance_row(self, source):
+        # Distances from dense node index source to every node
+        self.ensure_rows((source,))
+        return self.distances[source]
+
+    def hop_row(self, source):
+        self.ensure_rows((source,))
+        return self.hops[source]
+
+    def distance(self, origin, destination):
+        # Shortest distance between two city codes, inf without a path
+        index_of = self.graph.index_of
+        return float(self.distance_row(index_of[origin])[index_of[destination]])
+
+    def path_sums(self, metric="path_hops"):
+        # (reached, total, harmonic) for every node, as shortest_path_sums in
+        # closeness_betweenness_analysis.py computes them, read from the rows
+        if metric not in ("path_hops", "distance"):
+            raise ValueError(f"The distance matrix has no '{metric}' values.")
+        self.ensure_rows()
+        sums = []
+        for start in range(0, len(self), _BLOCK_ROWS):
+            if metric == "path_hops":
+                block = self.hops[start : start + _BLOCK_ROWS]
+                reachable = block != UNREACHABLE_HOPS
+                values = np.where(reachable, block, 0).astype(np.int64)
+            else:
+                block = self.distances[start : start + _BLOCK_ROWS]
+                reachable = np.isfinite(block)
+                values = np.where(reachable, block, 0).astype(np.float64)
+            with np.errstate(divide="ignore"):
+                reciprocal = np.where(values > 0, 1 / values, 0.0)
+            sums.extend(
+                zip(
+                    reachable.sum(axis=1).tolist(),
+                    values.sum(axis=1).tolist(),
+                    reciprocal.sum(axis=1).tolist(),
+                )
+            )
+        return sums
+
+    def __repr__(self):
+        return (
+            f"DistanceMatrix(nodes={len(self)}, missing_rows={self.missing_rows}, "
+            f"path='{self.path}')"
+        )
+
+
+def main(argv=None):
+    from network_api import load_distance_matrix
+
+    parser = argparse.ArgumentParser(
+        description="Fill the all-pairs distance matrix of a removal scenario."
+    )
+    parser.add_argument(
+        "--remove",
+        action="append",
+        default=[],
+        metavar="COUNTRY",
+        help="country to remove from the network (repeatable)",
+    )
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    matrix = load_distance_matrix(tuple(args.remove), args.cache_dir)
+    computed = matrix.ensure_rows()
+    print(
+        f"{computed} rows computed in {time.perf_counter() - start_time:.2f} s,",
+        f"{len(matrix) - computed} read from {matrix.path}",
+    )
+    return matrix
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+Runtime analysis:
+
+Filling the store:
+One Dijkstra search per row, O(V (V+E) log V) for all rows, paid once
+per graph. The files take 6 V^2 bytes (4 for the distance, 2 for the
+hops), so the store suits networks of up to some ten thousand cities.
+
+Reading:
+Opening is O(1); a row is V contiguous values read from the page
+cache or disk. path_sums is O(V^2) inside numpy instead of V Python
+searches.
+"""
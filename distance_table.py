@@ -0,0 +1,258 @@
+"""
+This code block defines distance tables (e.g. depots x customers)
+without one dijkstra() call per pair of cities:
+
+"distance_table" returns a numpy matrix with the shortest distance
+from every origin (rows) to every destination (columns), inf where
+there is no path or a city is not in the road network. Two methods
+are available:
+
+"dijkstra" runs one search per origin. A single search already
+settles every destination, and it stops as soon as the last
+destination is settled instead of exploring the whole network.
+
+"buckets" is the many-to-many algorithm of Knopp et al. on top of a
+Contraction Hierarchy (contraction_hierarchies.py). Each destination
+runs one upward search and leaves its distance in a bucket at every
+city of its search space. Each origin then runs one upward search and
+scans the buckets of the cities it reaches. Upward search spaces are
+small, so this pays off for large tables; the CH is built first
+unless one is passed in.
+
+With workers > 1 the origins are spread over a process pool. The
+"dijkstra" method reads the graph from shared memory (see
+brandes_betweenness), the "buckets" method ships the CH and the
+buckets once per worker.
+
+"one_to_many" returns the row of a single origin.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heappop
+import os
+import random
+import time
+
+import numpy as np
+
+from csr_graph import CSRGraph, as_csr_graph
+from brandes_betweenness import source_chunks
+from dijkstra_shortest_path import dijkstra
+from network_api import load_road_graph, load_scenario
+
+TABLE_METHODS = ("dijkstra", "buckets")
+
+# State attached by each worker process of the pool
+_worker_graph = None
+_worker_ch = None
+_worker_buckets = None
+
+
+def distances_to_targets(graph, source, target_nodes):
+    # One Dijkstra search from source that stops once every node in
+    # target_nodes is settled. The distances of the targets are final (inf
+    # when unreachable); other nodes may keep tentative distances.
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    dist = [float("inf")] * len(graph)
+    dist[source] = 0
+    remaining = set(target_nodes)
+    priority_queue = [(0, source)]
+
+    while priority_queue and remaining:
+        d, v = heappop(priority_queue)
+        if d > dist[v]:
+            continue
+        remaining.discard(v)
+        if not remaining:
+            break
+        start, end = offsets[v], offsets[v + 1]
+        for w, road_distance in zip(targets[start:end], weights[start:end]):
+            distance = d + road_distance
+            if distance < dist[w]:
+                dist[w] = distance
+                heappush(priority_queue, (distance, w))
+
+    return dist
+
+
+def _dijkstra_rows(graph, sources, columns):
+    # sources and columns are dense indices, -1 for cities not in the graph
+    reachable = [column for column in columns if column != -1]
+    rows = []
+    for source in sources:
+        if source == -1:
+            rows.append([float("inf")] * len(columns))
+            continue
+        dist = distances_to_targets(graph, source, reachable)
+        rows.append(
+            [dist[column] if column != -1 else float("inf") for column in columns]
+        )
+    return rows
+
+
+def _bucket_rows(ch, sources, buckets, width):
+    rows = []
+    for source in sources:
+        row = [float("inf")] * width
+        if source != -1:
+            for v, d in ch.upward_distances(source).items():
+                for column, to_target in buckets.get(v, ()):
+                    if d + to_target < row[column]:
+                        row[column] = d + to_target
+        rows.append(row)
+    return rows
+
+
+def _build_buckets(ch, columns):
+    # bucket[v] = [(column, distance from v up to the destination), ...]
+    buckets = {}
+    for column, target in enumerate(columns):
+        if target != -1:
+            for v, d in ch.upward_distances(target).items():
+                buckets.setdefault(v, []).append((column, d))
+    return buckets
+
+
+def _attach_graph(block_name, layout):
+    from multiprocessing import shared_memory
+
+    global _worker_graph
+    _worker_graph = CSRGraph.from_shared_memory(
+        shared_memory.SharedMemory(name=block_name), layout
+    )
+
+
+def _attach_buckets(ch, buckets):
+    global _worker_ch, _worker_buckets
+    _worker_ch = ch
+    _worker_buckets = buckets
+
+
+def _dijkstra_chunk(sources, columns):
+    return _dijkstra_rows(_worker_graph, sources, columns)
+
+
+def _bucket_chunk(sources, width):
+    return _bucket_rows(_worker_ch, sources, _worker_buckets, width)
+
+
+def distance_table(map, origins, destinations, method="dijkstra", workers=1, ch=None):
+    # Matrix of shortest distances, shape (len(origins), len(destinations))
+    graph = as_csr_graph(map)
+    if method not in TABLE_METHODS:
+        raise ValueError(f"Unknown distance table method '{method}'.")
+    if method == "buckets" and ch is None:
+        from contraction_hierarchies import ContractionHierarchy
+
+        ch = ContractionHierarchy.build(graph)
+    index_of = graph.index_of if method == "dijkstra" else ch.index_of
+    sources = [index_of.get(city, -1) for city in origins]
+    columns = [index_of.get(city, -1) for city in destinations]
+
+    chunks = [
+        [sources[i] for i in positions] for positions in source_chunks(len(sources))
+    ]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    parallel = workers > 1 and len(chunks) > 1
+
+    if method == "dijkstra" and not parallel:
+        rows = _dijkstra_rows(graph, sources, columns)
+    elif method == "dijkstra":
+        rows = []
+        block, layout = graph.to_shared_memory()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(chunks)),
+                initializer=_attach_graph,
+                initargs=(block.name, layout),
+            ) as pool:
+                for chunk in pool.map(_dijkstra_chunk, chunks, [columns] * len(chunks)):
+                    rows.extend(chunk)
+        finally:
+            block.close()
+            block.unlink()
+    else:
+        buckets = _build_buckets(ch, columns)
+        if not parallel:
+            rows = _bucket_rows(ch, sources, buckets, len(columns))
+        else:
+            rows = []
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(chunks)),
+                initializer=_attach_buckets,
+                initargs=(ch, buckets),
+            ) as pool:
+                for chunk in pool.map(
+                    _bucket_chunk, chunks, [len(columns)] * len(chunks)
+                ):
+                    rows.extend(chunk)
+
+    return np.array(rows, dtype=np.float64).reshape(len(origins), len(destinations))
+
+
+def one_to_many(map, origin, destinations):
+    # Distances from origin to every destination, one early-stopping search
+    return distance_table(map, [origin], destinations)[0]
+
+
+def main(removed_countries=None, depots=5, customers=200, seed=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+    rng = random.Random(seed)
+    cities = list(cities_deleted_c.keys())
+    origins = rng.sample(cities, min(depots, len(cities)))
+    destinations = rng.sample(cities, min(customers, len(cities)))
+
+    start_time = time.perf_counter()
+    table = distance_table(road_graph, origins, destinations)
+    print(
+        f"{len(origins)} x {len(destinations)} table with one search per origin:",
+        f"{(time.perf_counter() - start_time) * 1000:.1f} ms",
+    )
+
+    start_time = time.perf_counter()
+    buckets = distance_table(road_graph, origins, destinations, method="buckets")
+    print(
+        "Same table with CH buckets (including the CH build):",
+        f"{(time.perf_counter() - start_time) * 1000:.1f} ms",
+    )
+
+    # One dijkstra() call per pair, what the table replaces
+    start_time = time.perf_counter()
+    mismatches = 0
+    for row, origin in enumerate(origins):
+        for column, destination in enumerate(destinations):
+            path = dijkstra(road_graph, origin, destination, cities_deleted_c)
+            expected = path[-1][-1] if path else float("inf")
+            if table[row, column] != expected or buckets[row, column] != expected:
+                mismatches += 1
+    print(
+        "Pairwise dijkstra():",
+        f"{(time.perf_counter() - start_time) * 1000:.1f} ms,",
+        f"{mismatches} mismatches",
+    )
+    return table
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+Runtime analysis:
+
+"dijkstra":
+One search per origin, O(|origins| (V+E) log V) in the worst case,
+usually less because every search stops at the farthest destination.
+The pairwise approach needs |origins| * |destinations| searches.
+
+"buckets":
+|destinations| + |origins| upward searches, each only visiting the
+small CH search space S, plus the bucket scans, about
+O((|origins| + |destinations|) S log S + |origins| S b) for b bucket
+entries per city. The CH build is paid once and can be reused.
+
+Memory: the table itself, |origins| * |destinations| floats, plus
+|destinations| * S bucket entries in the "buckets" method.
+"""
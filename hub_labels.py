@@ -0,0 +1,309 @@
+"""
+This code block defines a hub labeling index for distance-only
+queries:
+
+Every city v gets a label, a list of (hub, d(v, hub)) pairs, such that
+for any two cities s and t the shortest path between them passes
+through a hub that is in both labels. The distance is then
+
+    d(s, t) = min over common hubs h of d(s, h) + d(h, t),
+
+found by merging the two labels, which are sorted by hub. No graph
+search is needed at query time.
+
+HubLabels.build orders the cities by their Contraction Hierarchy rank
+(the most important city first) and computes the labels with pruned
+landmark labeling (Akiba, Iwata and Yoshida): a Dijkstra search from
+each city in that order, which skips every city whose distance is
+already answered correctly by the labels built so far. The labels
+are minimal for the ordering; with the CH order they stay small.
+
+The labels are stored in flat buffers, in the CSR layout used by
+csr_graph.py: the hubs of city i are hubs[offsets[i]:offsets[i + 1]]
+and their distances are distances[offsets[i]:offsets[i + 1]]. On disk
+an index is a directory of .npy files plus a small header.json (format
+version, graph fingerprint), and HubLabels.load memory-maps the
+buffers, so opening an index costs nothing and only the labels that
+are queried are read. Labels built or loaded for a graph refuse
+queries once its roads change in place (CSRGraph.set_distance).
+
+Build an index (and check it against dijkstra() on random pairs) with
+
+    python hub_labels.py --remove Germany -o hub_labels_no_germany
+
+Without -o the index is written to "hub_labels_index" next to this
+module. The pipeline step "hub-labels" runs build_and_check, which
+only builds and checks the labels in memory.
+"""
+
+import argparse
+from heapq import heappush, heappop
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from csr_graph import as_csr_graph, check_graph_version
+from dijkstra_shortest_path import dijkstra
+from distance_matrix import graph_fingerprint
+from network_api import load_road_graph, load_scenario
+
+HUB_LABELS_FORMAT_VERSION = 1
+# Next to the modules, not in whatever directory the process runs from
+DEFAULT_INDEX_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "hub_labels_index"
+)
+
+_BUFFERS = ("city_ids", "order", "offsets", "hubs", "distances")
+
+
+class HubLabels:
+    def __init__(
+        self, city_ids, order, offsets, hubs, distances, fingerprint=None, graph=None
+    ):
+        # hubs hold positions in order (0 = most important city), so every
+        # label is sorted by hub. graph: the CSRGraph the labels belong to,
+        # if known; queries are refused once its roads change
+        self.graph = graph
+        self.graph_version = graph.version if graph is not None else None
+        self.city_ids = city_ids
+        self.order = order
+        self.offsets = offsets
+        self.hubs = hubs
+        self.distances = distances
+        self.fingerprint = fingerprint
+        self.index_of = {city: index for index, city in enumerate(city_ids.tolist())}
+
+    @classmethod
+    def build(cls, map, ch=None):
+        # ch: a ContractionHierarchy of the same graph for the ordering
+        graph = as_csr_graph(map)
+        if ch is None:
+            from contraction_hierarchies import ContractionHierarchy
+
+            ch = ContractionHierarchy.build(graph)
+        n = len(graph)
+        order = sorted(range(n), key=lambda v: ch.rank[v], reverse=True)
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+        label_hubs = [[] for _ in range(n)]
+        label_distances = [[] for _ in range(n)]
+        # distances from the current root to its hubs, indexed by hub
+        root_label = [float("inf")] * n
+        for position, root in enumerate(order):
+            for hub, d in zip(label_hubs[root], label_distances[root]):
+                root_label[hub] = d
+
+            dist = {root: 0}
+            priority_queue = [(0, root)]
+            while priority_queue:
+                d, v = heappop(priority_queue)
+                if d > dist[v]:
+                    continue
+                # prune: the labels built so far already give d(root, v)
+                if any(
+                    root_label[hub] + to_hub <= d
+                    for hub, to_hub in zip(label_hubs[v], label_distances[v])
+                ):
+                    continue
+                label_hubs[v].append(position)
+                label_distances[v].append(d)
+                start, end = offsets[v], offsets[v + 1]
+                for w, road_distance in zip(targets[start:end], weights[start:end]):
+                    distance = d + road_distance
+                    if distance < dist.get(w, float("inf")):
+                        dist[w] = distance
+                        heappush(priority_queue, (distance, w))
+
+            for hub in label_hubs[root]:
+                root_label[hub] = float("inf")
+
+        label_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(label) for label in label_hubs], out=label_offsets[1:])
+        return cls(
+            np.frombuffer(graph.city_ids, dtype=np.int64).copy(),
+            np.array(order, dtype=np.int32),
+            label_offsets,
+            np.array([hub for label in label_hubs for hub in label], dtype=np.int32),
+            np.array([d for label in label_distances for d in label], dtype=np.float64),
+            graph_fingerprint(graph),
+            graph,
+        )
+
+    def __len__(self):
+        return len(self.city_ids)
+
+    @property
+    def entry_count(self):
+        return len(self.hubs)
+
+    def label(self, city):
+        # [(hub city, distance), ...] of a city, sorted by hub importance
+        index = self.index_of[city]
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return [
+            (int(self.city_ids[self.order[hub]]), float(d))
+            for hub, d in zip(self.hubs[start:end], self.distances[start:end])
+        ]
+
+    def _distance(self, s, t):
+        # Merge the two sorted labels of dense indices s and t
+        offsets = self.offsets
+        start_s, end_s = int(offsets[s]), int(offsets[s + 1])
+        start_t, end_t = int(offsets[t]), int(offsets[t + 1])
+        hubs_s = self.hubs[start_s:end_s].tolist()
+        hubs_t = self.hubs[start_t:end_t].tolist()
+        dist_s = self.distances[start_s:end_s].tolist()
+        dist_t = self.distances[start_t:end_t].tolist()
+
+        best = float("inf")
+        i = j = 0
+        while i < len(hubs_s) and j < len(hubs_t):
+            if hubs_s[i] == hubs_t[j]:
+                if dist_s[i] + dist_t[j] < best:
+                    best = dist_s[i] + dist_t[j]
+                i += 1
+                j += 1
+            elif hubs_s[i] < hubs_t[j]:
+                i += 1
+            else:
+                j += 1
+        return best
+
+    def distance(self, origin, destination):
+        # Shortest distance between two city codes, inf without a path
+        check_graph_version(self.graph, self.graph_version, "hub labels")
+        if origin not in self.index_of or destination not in self.index_of:
+            return float("inf")
+        return self._distance(self.index_of[origin], self.index_of[destination])
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in _BUFFERS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "header.json"), "w", encoding="utf-8") as header:
+            json.dump(
+                {
+                    "format_version": HUB_LABELS_FORMAT_VERSION,
+                    "fingerprint": self.fingerprint,
+                    "cities": len(self),
+                    "entries": self.entry_count,
+                },
+                header,
+                indent=2,
+            )
+
+    @classmethod
+    def load(cls, path, map=None):
+        # The buffers are memory-mapped; with a map the graph fingerprint
+        # is checked
+        with open(os.path.join(path, "header.json"), "r", encoding="utf-8") as data:
+            header = json.load(data)
+        version = header.get("format_version")
+        if version != HUB_LABELS_FORMAT_VERSION:
+            raise ValueError(
+                f"Hub labels '{path}' have format version {version}, "
+                f"expected {HUB_LABELS_FORMAT_VERSION}."
+            )
+        graph = as_csr_graph(map) if map is not None else None
+        if graph is not None and header["fingerprint"] != graph_fingerprint(graph):
+            raise ValueError(f"Hub labels '{path}' were built for another graph.")
+        buffers = [
+            np.load(
+                os.path.join(path, f"{name}.npy"), mmap_mode="r", allow_pickle=False
+            )
+            for name in _BUFFERS
+        ]
+        return cls(*buffers, fingerprint=header["fingerprint"], graph=graph)
+
+
+def compare_with_dijkstra(labels, map, cities_dict, repetitions=100, seed=None):
+    # Returns the number of pairs where the hub label distance differs
+    # from Dijkstra
+    rng = random.Random(seed)
+    cities = list(cities_dict.keys())
+    mismatches = 0
+    for rep in range(repetitions):
+        city1 = rng.choice(cities)
+        city2 = rng.choice(cities)
+        distance_labels = labels.distance(city1, city2)
+        path_dijkstra = dijkstra(map, city1, city2, cities_dict)
+        distance_dijkstra = path_dijkstra[-1][-1] if path_dijkstra else float("inf")
+        if distance_labels != distance_dijkstra:
+            mismatches += 1
+            print(
+                f"{city1} --> {city2} | Hub labels != Dijkstra |",
+                f"Distance hub labels: {distance_labels}",
+                f"Distance Dijkstra: {distance_dijkstra}",
+            )
+    print(
+        f"| Hub labels == Dijkstra | on {repetitions - mismatches}/{repetitions} pairs"
+    )
+    return mismatches
+
+
+def build_and_check(removed_countries=None, index_path=None, repetitions=200):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+
+    start_time = time.perf_counter()
+    labels = HubLabels.build(road_graph)
+    print(
+        f"Hub labels for {len(labels)} cities in",
+        f"{time.perf_counter() - start_time:.2f} s,",
+        f"{labels.entry_count / max(len(labels), 1):.1f} hubs per city on average",
+    )
+    if index_path:
+        labels.save(index_path)
+        labels = HubLabels.load(index_path, road_graph)
+        print(f"Hub labels written to {index_path}")
+
+    compare_with_dijkstra(labels, road_graph, cities_deleted_c, repetitions)
+
+    cities = list(cities_deleted_c.keys())
+    pairs = [(random.choice(cities), random.choice(cities)) for _ in range(1000)]
+    start_time = time.perf_counter()
+    for city1, city2 in pairs:
+        labels.distance(city1, city2)
+    query_time = (time.perf_counter() - start_time) / len(pairs) * 1000
+    print(f"Average hub label query: {query_time:.4f} ms")
+    return labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build a hub labeling index and check it against dijkstra()."
+    )
+    parser.add_argument(
+        "--remove",
+        action="append",
+        default=[],
+        metavar="COUNTRY",
+        help="country to remove from the network (repeatable)",
+    )
+    parser.add_argument("-o", "--output", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--pairs", type=int, default=200)
+    args = parser.parse_args(argv)
+    return build_and_check(tuple(args.remove), args.output, args.pairs)
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+Runtime analysis:
+
+Preprocessing:
+One pruned Dijkstra search per city. Without pruning that would be
+O(V (V+E) log V); with the CH order each search stops after the few
+cities it is a hub for, so the total work is close to
+O(L (log V + deg)) for L label entries. Memory is 12 bytes per label
+entry plus 8 bytes per city for the offsets.
+
+Query:
+O(|L(s)| + |L(t)|) for the merge, independent of the size of the
+road network and without touching the graph.
+"""
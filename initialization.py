@@ -14,19 +14,25 @@ encapsulating the starting point, ending point,
 and the distance between them, with functionality 
 to retrieve and update these properties, ensuring 
 that the distance is always a non-negative value
+
+The classes use __slots__, so an object stores its fields without a
+per-instance dictionary.
 """
 
 
 class Country:
+    # __slots__: no per-instance __dict__, which matters for large data sets
+    __slots__ = ("c_name",)
+
     def __init__(self, name):
         self.c_name = name
 
     @property
     def C_name(self):
-        return self.name
+        return self.c_name
 
     @C_name.setter
-    def Country_n(self, value):
+    def C_name(self, value):
         self.c_name = value
 
     def __str__(self):
@@ -37,6 +43,8 @@ class Country:
 
 
 class City:
+    __slots__ = ("name", "country_n", "coordinate_x_y")
+
     def __init__(self, name, country_n, coordinate_x_y):
         self.name = name
         self.country_n = country_n
@@ -66,8 +74,13 @@ class City:
     def Coordinate_x_y(self, value):
         self.coordinate_x_y = value
 
+    def __repr__(self):
+        return f'City("{self.name}", {self.country_n}, {self.coordinate_x_y})'
+
 
 class Road:
+    __slots__ = ("point_a", "point_b", "distance")
+
     def __init__(self, point_a, point_b, distance):
         self.point_a = point_a
         self.point_b = point_b
@@ -86,7 +99,7 @@ class Road:
         return self.point_b
 
     @Point_b.setter
-    def set_point_b(self, value):
+    def Point_b(self, value):
         self.point_b = value
 
     @property
@@ -94,40 +107,191 @@ class Road:
         return self.distance
 
     @Distance.setter
-    def set_distance(self, value):
+    def Distance(self, value):
         if value >= 0:
             self.distance = value
         else:
             raise ValueError
 
+    def __repr__(self):
+        return f"Road({self.point_a}, {self.point_b}, {self.distance})"
+
 
 """
-This code block reads data from three separate files. 
-Each contain Python data structures in text form. 
-It then evaluates them into Python dictionaries:
+This code block loads the data sets without evaluating any code.
+Nothing is read at import time: the data is loaded on first use
+by load_datasets() and cached for the rest of the process.
+
+If the binary snapshot "europe_network.npz" exists next to the modules
+(create it once with "python network_snapshot.py"), the columns are
+read from it directly, whatever the working directory is.
 
-"cities_gps2.py" is read and its contents are 
-evaluated to form a dictionary containing city 
-names and their GPS coordinates.
+Otherwise the original literal files "cities_gps.py", "countries.py"
+and "roads_europe.py" are parsed safely with the ast module, which only
+accepts City(...), Country(...) and Road(...) entries with literal values.
 
-"countries.py" is read and its contents are evaluated 
-to form a dictionary containing country names.
+The columns are then turned into the dictionaries used by the
+rest of the project:
 
-"roads_europe.py" is read and its contents are 
-evaluated to form a dictionary containing information
-about roads connecting cities in Europe.
+"cities_dict" maps each city code to its City object.
 
-This code block is intended for "data initialization" 
+"countries_dict" maps each country code to its Country object.
+
+"roads_dict" is the list of Road objects connecting cities in Europe.
+
+For very large networks "load_tables" returns the same three
+structures as read-only columnar views (CityTable, CountryTable and
+RoadTable). They keep only the numpy columns and build a City,
+Country or Road object when an entry is accessed; their "columns"
+attribute gives code direct access to the arrays.
+
+This code block is intended for "data initialization"
 to be used in further operations.
 """
 
-with open("cities_gps.py", "r", encoding="utf-8") as cities_data:
-    cities_dict = eval(cities_data.read())
-    # print(cities_dict)
-with open(f"countries.py", "r", encoding="utf-8") as countries_data:
-    countries_dict = eval(countries_data.read())
-    # print(countries_dict)
-
-with open("roads_europe.py", "r", encoding="utf-8") as roads_data:
-    roads_dict = eval(roads_data.read())
-    # print(roads_dict)
+from collections.abc import Mapping, Sequence
+import functools
+import os
+
+from network_snapshot import (
+    DEFAULT_SNAPSHOT,
+    load_network_snapshot,
+    read_literal_network,
+)
+
+
+def load_snapshot(snapshot_path=DEFAULT_SNAPSHOT):
+    if os.path.exists(snapshot_path):
+        return load_network_snapshot(snapshot_path)
+    return read_literal_network()
+
+
+def build_datasets(snapshot):
+    cities = {
+        city: City(name, country, (latitude, longitude))
+        for city, name, country, latitude, longitude in zip(
+            snapshot.city_ids.tolist(),
+            snapshot.city_names.tolist(),
+            snapshot.city_country.tolist(),
+            snapshot.latitude.tolist(),
+            snapshot.longitude.tolist(),
+        )
+    }
+    countries = {
+        country: Country(name)
+        for country, name in zip(
+            snapshot.country_ids.tolist(), snapshot.country_names.tolist()
+        )
+    }
+    roads = [
+        Road(point_a, point_b, distance)
+        for point_a, point_b, distance in zip(
+            snapshot.road_a.tolist(),
+            snapshot.road_b.tolist(),
+            snapshot.road_distance.tolist(),
+        )
+    ]
+    return cities, countries, roads
+
+
+class CityTable(Mapping):
+    # Read-only columnar view: city code -> City, built on access from the
+    # columns of a NetworkSnapshot. Only the columns are kept in memory.
+    def __init__(self, columns):
+        self.columns = columns
+        self._ids = columns.city_ids.tolist()
+        self._index = {city: index for index, city in enumerate(self._ids)}
+
+    def __getitem__(self, city):
+        index = self._index[city]
+        columns = self.columns
+        return City(
+            str(columns.city_names[index]),
+            int(columns.city_country[index]),
+            (float(columns.latitude[index]), float(columns.longitude[index])),
+        )
+
+    def __contains__(self, city):
+        return city in self._index
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class CountryTable(Mapping):
+    # Read-only columnar view: country code -> Country
+    def __init__(self, columns):
+        self.columns = columns
+        self._ids = columns.country_ids.tolist()
+        self._index = {country: index for index, country in enumerate(self._ids)}
+
+    def __getitem__(self, country):
+        return Country(str(self.columns.country_names[self._index[country]]))
+
+    def __contains__(self, country):
+        return country in self._index
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class RoadTable(Sequence):
+    # Read-only columnar view: the list of roads, one Road built per access
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        columns = self.columns
+        return Road(
+            int(columns.road_a[index]),
+            int(columns.road_b[index]),
+            float(columns.road_distance[index]),
+        )
+
+    def __iter__(self):
+        columns = self.columns
+        for point_a, point_b, distance in zip(
+            columns.road_a.tolist(),
+            columns.road_b.tolist(),
+            columns.road_distance.tolist(),
+        ):
+            yield Road(point_a, point_b, distance)
+
+    def __len__(self):
+        return len(self.columns.road_a)
+
+
+@functools.lru_cache(maxsize=None)
+def load_columns(snapshot_path=DEFAULT_SNAPSHOT):
+    # The data set as a NetworkSnapshot of flat numpy columns
+    return load_snapshot(snapshot_path)
+
+
+@functools.lru_cache(maxsize=None)
+def load_datasets(snapshot_path=DEFAULT_SNAPSHOT):
+    return build_datasets(load_columns(snapshot_path))
+
+
+@functools.lru_cache(maxsize=None)
+def load_tables(snapshot_path=DEFAULT_SNAPSHOT):
+    # Same shape as load_datasets, (cities, countries, roads), but as
+    # columnar views that hold no per-city or per-road objects
+    columns = load_columns(snapshot_path)
+    return CityTable(columns), CountryTable(columns), RoadTable(columns)
+
+
+def __getattr__(name):
+    # "from initialization import cities_dict" keeps working,
+    # but the data is only loaded when one of the names is requested
+    datasets = ("cities_dict", "countries_dict", "roads_dict")
+    if name in datasets:
+        return load_datasets()[datasets.index(name)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,285 @@
+"""
+This code block defines an ALT (A*, Landmarks, Triangle inequality)
+index for the A* search:
+
+LandmarkIndex.build picks k landmark cities and runs one full
+Dijkstra search from each of them. Two selection strategies exist:
+
+"farthest" repeatedly adds the city that is farthest from all
+landmarks chosen so far (cities in another component come first,
+so every component gets a landmark).
+
+"avoid" grows a shortest path tree from a random root and walks
+down to the leaf of the subtree where the current landmarks give
+the worst lower bounds (Goldberg and Werneck).
+
+For every landmark L the distances d(L, v) (forward) and d(v, L)
+(backward) are kept in flat arrays. The road map is undirected, so
+both directions are the same numbers and share one array.
+
+By the triangle inequality
+    d(v, t) >= max over L of |d(L, t) - d(L, v)|,
+which is an admissible and consistent lower bound that does not
+depend on coordinates. The index is callable with the h_func
+signature, so astar(start, goal, index, road_map, cities) and
+bidirectional_astar use it directly.
+
+The index can be saved to and loaded from an .npz file. After
+countries are removed it can be rebuilt for the new road map
+(rebuild) or, much cheaper, restricted to the remaining cities
+(restrict). Distances can only grow when roads disappear, so the
+old bounds stay admissible, just weaker. A road that gets shorter in
+place (CSRGraph.set_distance) can break them, so an index built for
+a graph refuses queries after such a change.
+"""
+
+from array import array
+import random
+import time
+
+import numpy as np
+
+from csr_graph import as_csr_graph, check_graph_version
+from dijkstra_shortest_path import dijkstra, dijkstra_search
+from Astar_pathfinding import astar
+from network_api import load_road_graph, load_scenario
+
+LANDMARK_FORMAT_VERSION = 1
+
+
+class LandmarkIndex:
+    def __init__(self, city_ids, landmarks, distances, strategy="farthest", graph=None):
+        # graph: the CSRGraph the distances belong to, if known; queries are
+        # refused once its roads change
+        self.graph = graph
+        self.graph_version = graph.version if graph is not None else None
+        self.city_ids = array("q", city_ids)
+        self.landmarks = list(landmarks)
+        self.strategy = strategy
+        # distances[i, v] = d(landmarks[i], v); inf when unreachable
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.forward = self.distances
+        self.backward = self.distances  # undirected roads: d(v, L) = d(L, v)
+        self.index_of = {city: index for index, city in enumerate(self.city_ids)}
+        # node-major copy for the scalar lookups done by astar()
+        self._by_node = array("d", self.distances.T.tobytes())
+
+    @classmethod
+    def build(cls, map, k=8, strategy="farthest", seed=None):
+        graph = as_csr_graph(map)
+        n = len(graph)
+        rng = random.Random(seed)
+        k = min(k, n)
+        rows = []
+        landmarks = []
+        while len(landmarks) < k:
+            if strategy == "farthest":
+                landmark = _farthest(rows, n, rng)
+            elif strategy == "avoid":
+                landmark = _avoid(graph, rows, n, rng)
+            else:
+                raise ValueError(f"Unknown landmark strategy '{strategy}'.")
+            if landmark in landmarks:
+                break
+            landmarks.append(landmark)
+            rows.append(dijkstra_search(graph, landmark)[0])
+
+        distances = np.array(rows, dtype=np.float64).reshape(len(rows), n)
+        return cls(
+            graph.city_ids,
+            [graph.city_ids[landmark] for landmark in landmarks],
+            distances,
+            strategy,
+            graph,
+        )
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    def lower_bound(self, city, goal):
+        if self.graph is not None and self.graph.version != self.graph_version:
+            check_graph_version(self.graph, self.graph_version, "landmark index")
+        k = len(self.landmarks)
+        u = self.index_of[city] * k
+        t = self.index_of[goal] * k
+        by_node = self._by_node
+        bound = 0.0
+        for i in range(k):
+            difference = by_node[t + i] - by_node[u + i]
+            if difference < 0:
+                difference = -difference
+            # inf - inf (both unreachable from this landmark) gives no bound
+            if difference > bound and difference == difference:
+                bound = difference
+        return bound
+
+    def __call__(self, city, goal, cities_dict=None):
+        return self.lower_bound(city, goal)
+
+    def potentials(self, goal):
+        # Vectorised lower bounds from every city to goal
+        check_graph_version(self.graph, self.graph_version, "landmark index")
+        column = self.distances[:, self.index_of[goal]][:, None]
+        with np.errstate(invalid="ignore"):
+            bounds = np.abs(column - self.distances)
+        return _best_bound(bounds)
+
+    def rebuild(self, map, seed=None):
+        # Fresh landmarks for a changed road map
+        return LandmarkIndex.build(map, len(self.landmarks), self.strategy, seed)
+
+    def restrict(self, map):
+        # Keep the landmark distances for the cities still in the road map;
+        # they remain admissible after removals, no search is needed
+        graph = as_csr_graph(map)
+        columns = [self.index_of[city] for city in graph.city_ids]
+        return LandmarkIndex(
+            graph.city_ids,
+            self.landmarks,
+            self.distances[:, columns],
+            self.strategy,
+            graph,
+        )
+
+    def save(self, path):
+        np.savez(
+            path,
+            format_version=np.array(LANDMARK_FORMAT_VERSION),
+            city_ids=np.frombuffer(self.city_ids, dtype=np.int64),
+            landmarks=np.array(self.landmarks, dtype=np.int64),
+            distances=self.distances,
+            strategy=np.array(self.strategy),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != LANDMARK_FORMAT_VERSION:
+                raise ValueError(
+                    f"Landmark index '{path}' has format version {version}, "
+                    f"expected {LANDMARK_FORMAT_VERSION}."
+                )
+            return cls(
+                data["city_ids"].tolist(),
+                data["landmarks"].tolist(),
+                data["distances"],
+                str(data["strategy"]),
+            )
+
+
+def _best_bound(bounds):
+    # inf - inf (both unreachable from a landmark) gives nan, i.e. no bound
+    return np.where(np.isnan(bounds), 0.0, bounds).max(axis=0, initial=0.0)
+
+
+def _farthest(rows, n, rng):
+    if not rows:
+        return rng.randrange(n)
+    closest = np.min(np.array(rows), axis=0)
+    unreachable = np.flatnonzero(np.isinf(closest))
+    if len(unreachable):
+        # a component without a landmark yet
+        return int(unreachable[0])
+    return int(np.argmax(closest))
+
+
+def _avoid(graph, rows, n, rng):
+    if not rows:
+        return rng.randrange(n)
+    root = rng.randrange(n)
+    dist, pred = dijkstra_search(graph, root)
+    reached = [v for v in range(n) if dist[v] != float("inf")]
+
+    # how much the current landmarks underestimate d(root, v)
+    table = np.array(rows)
+    with np.errstate(invalid="ignore"):
+        bounds = _best_bound(np.abs(table[:, [root]] - table))
+
+    # subtree sizes in the shortest path tree; subtrees holding a landmark
+    # are ignored
+    reached.sort(key=lambda v: dist[v], reverse=True)
+    size = [0.0] * n
+    has_landmark = [False] * n
+    for row in rows:
+        has_landmark[int(np.argmin(row))] = True
+    children = [[] for _ in range(n)]
+    for v in reached:
+        size[v] += dist[v] - bounds[v]
+        if pred[v] != -1:
+            children[pred[v]].append(v)
+            size[pred[v]] += size[v]
+            has_landmark[pred[v]] = has_landmark[pred[v]] or has_landmark[v]
+    for v in reached:
+        if has_landmark[v]:
+            size[v] = 0.0
+
+    # walk down to the leaf of the heaviest subtree
+    node = root
+    while children[node]:
+        heaviest = max(children[node], key=lambda child: size[child])
+        if size[heaviest] <= 0:
+            break
+        node = heaviest
+    return node
+
+
+def compare_with_dijkstra(index, map, cities_dict, repetitions=100, seed=None):
+    # Returns the number of pairs where A* with ALT and Dijkstra disagree
+    rng = random.Random(seed)
+    cities = list(cities_dict.keys())
+    mismatches = 0
+    for rep in range(repetitions):
+        city1 = rng.choice(cities)
+        city2 = rng.choice(cities)
+        path_alt = astar(city1, city2, index, map, cities_dict)
+        path_dijkstra = dijkstra(map, city1, city2, cities_dict)
+        distance_alt = path_alt[-1][-1] if isinstance(path_alt, list) else None
+        distance_dijkstra = path_dijkstra[-1][-1] if path_dijkstra else None
+        if distance_alt != distance_dijkstra:
+            mismatches += 1
+            print(
+                f"{city1} --> {city2} | ALT != Dijkstra |",
+                f"Distance ALT: {distance_alt}",
+                f"Distance Dijkstra: {distance_dijkstra}",
+            )
+    print(f"| ALT == Dijkstra | on {repetitions - mismatches}/{repetitions} pairs")
+    return mismatches
+
+
+def main(removed_countries=None, k=8, strategy="farthest", index_path=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+
+    start_time = time.perf_counter()
+    index = LandmarkIndex.build(road_graph, k, strategy)
+    print(
+        f"Selected {len(index)} landmarks ({strategy})",
+        f"in {time.perf_counter() - start_time:.2f} s: {index.landmarks}",
+    )
+    if index_path:
+        index.save(index_path)
+        index = LandmarkIndex.load(index_path)
+        print(f"Landmark index written to {index_path}")
+
+    compare_with_dijkstra(index, road_graph, cities_deleted_c, repetitions=200)
+    return index
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+Runtime analysis:
+
+Preprocessing:
+k full Dijkstra searches, O(k (V+E) log V), plus O(k V) work per
+landmark for the selection. Memory is k * V floats.
+
+Lower bound:
+O(k) per city, independent of the size of the graph.
+
+restrict:
+O(k V) array slicing, no shortest path search.
+"""
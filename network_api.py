@@ -0,0 +1,186 @@
+"""
+This code block defines the library entry point of the project.
+
+Importing this module does no work at all. The data set, the
+road map after removing countries and its CSR graph are built on
+first use and cached, so a service can import the routing
+functions with near-zero startup cost:
+
+    from network_api import dijkstra, load_road_graph
+    graph = load_road_graph(["Germany"])
+    dijkstra(graph, 742, 659, load_scenario(["Germany"])[0])
+
+"load_network" returns (cities_dict, countries_dict, roads_dict).
+
+"load_scenario" returns (cities, roads, road_map) after removing the
+given countries. Passing None asks for the countries interactively,
+like running country_removal_simulation.py does.
+
+"load_removal_scenario" returns the RemovalScenario behind it, the
+node and road masks over the base network (see RemovalIndex in
+country_removal_simulation.py; "load_removal_index" returns the index).
+
+"load_road_graph" returns the CSRGraph of the same scenario, a masked
+view of the base graph.
+
+"load_distance_matrix" returns the DistanceMatrix of the same
+scenario, the on-disk store of its all-pairs distances and hop counts
+(see distance_matrix.py).
+
+"load_geodesic_heuristic" returns the calibrated GeodesicHeuristic
+for A* on the same scenario.
+
+Both depend on the road lengths of the graph and are cached by its
+version. When a road of a graph changes in place
+(CSRGraph.set_distance), only the heuristics and distance matrices
+of the old version are dropped; they are built again for the changed
+graph on the next call, and those of other scenarios stay cached.
+
+"cached_dijkstra" and "cached_astar" answer repeated queries from the
+shared LRU "route_cache" (see route_cache.py).
+
+The algorithms (dijkstra, astar, h_func, brandes_betweenness,
+detect_components, ...) are re-exported lazily: their module is only
+imported the first time the name is looked up.
+"""
+
+import functools
+import importlib
+
+from csr_graph import on_graph_change
+
+# Heuristics and distance matrices by (graph version, kind, arguments),
+# so that a change of the roads of one graph drops only its own entries
+_derived_cache = {}
+
+_LAZY_EXPORTS = {
+    "dijkstra": "dijkstra_shortest_path",
+    "astar": "Astar_pathfinding",
+    "cached_dijkstra": "route_cache",
+    "cached_astar": "route_cache",
+    "route_cache": "route_cache",
+    "h_func": "Astar_pathfinding",
+    "GeodesicHeuristic": "Astar_pathfinding",
+    "brandes_betweenness": "brandes_betweenness",
+    "approximate_betweenness": "brandes_betweenness",
+    "top_k_betweenness": "brandes_betweenness",
+    "calculate_betweenness": "dijkstra_betweenness",
+    "calculate_closeness_centrality": "closeness_betweenness_analysis",
+    "approximate_closeness": "closeness_betweenness_analysis",
+    "top_k_closeness": "closeness_betweenness_analysis",
+    "detect_components": "connected_components_analysis",
+    "removal_sweep": "connected_components_analysis",
+    "remove_country": "country_removal_simulation",
+    "RemovalIndex": "country_removal_simulation",
+    "CSRGraph": "csr_graph",
+    "DistanceMatrix": "distance_matrix",
+    "distance_table": "distance_table",
+    "one_to_many": "distance_table",
+    "ContractionHierarchy": "contraction_hierarchies",
+    "LandmarkIndex": "landmarks",
+    "ArcFlags": "arc_flags",
+    "HubLabels": "hub_labels",
+}
+
+
+def load_network():
+    from initialization import load_datasets
+
+    return load_datasets()
+
+
+def _scenario_key(removed_countries):
+    # None means "ask interactively"; any other iterable is a fixed scenario
+    if removed_countries is None:
+        return None
+    if isinstance(removed_countries, str):
+        return (removed_countries,)
+    return tuple(removed_countries)
+
+
+@functools.lru_cache(maxsize=None)
+def load_removal_index():
+    from country_removal_simulation import RemovalIndex
+
+    cities_dict, countries_dict, roads_dict = load_network()
+    return RemovalIndex(roads_dict, cities_dict, countries_dict)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_removal_scenario(removed_countries):
+    from country_removal_simulation import remove_countries
+
+    return remove_countries(load_removal_index(), removed_countries)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_scenario(removed_countries):
+    scenario = _load_removal_scenario(removed_countries)
+    return scenario.cities(), scenario.roads(), scenario.road_map()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_road_graph(removed_countries):
+    return _load_removal_scenario(removed_countries).to_csr_graph()
+
+
+def _load_geodesic_heuristic(removed_countries):
+    from Astar_pathfinding import GeodesicHeuristic
+
+    graph = _load_road_graph(removed_countries)
+    key = (graph.version, "geodesic_heuristic", removed_countries)
+    if key not in _derived_cache:
+        cities, _, _ = _load_scenario(removed_countries)
+        _derived_cache[key] = GeodesicHeuristic.from_cities(graph, cities)
+    return _derived_cache[key]
+
+
+def _load_distance_matrix(removed_countries, cache_dir):
+    from distance_matrix import DEFAULT_CACHE_DIR, DistanceMatrix
+
+    graph = _load_road_graph(removed_countries)
+    key = (graph.version, "distance_matrix", removed_countries, cache_dir)
+    if key not in _derived_cache:
+        _derived_cache[key] = DistanceMatrix.open(graph, cache_dir or DEFAULT_CACHE_DIR)
+    return _derived_cache[key]
+
+
+@on_graph_change
+def _drop_derived_caches(version):
+    # The heuristics and distance matrices of the stale version were
+    # calibrated or computed for the old road lengths; None drops all
+    stale = [key for key in _derived_cache if version is None or key[0] == version]
+    for key in stale:
+        del _derived_cache[key]
+
+
+def load_removal_scenario(removed_countries=()):
+    return _load_removal_scenario(_scenario_key(removed_countries))
+
+
+def load_scenario(removed_countries=()):
+    return _load_scenario(_scenario_key(removed_countries))
+
+
+def load_road_graph(removed_countries=()):
+    return _load_road_graph(_scenario_key(removed_countries))
+
+
+def load_geodesic_heuristic(removed_countries=()):
+    return _load_geodesic_heuristic(_scenario_key(removed_countries))
+
+
+def load_distance_matrix(removed_countries=(), cache_dir=None):
+    return _load_distance_matrix(_scenario_key(removed_countries), cache_dir)
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_EXPORTS))
@@ -0,0 +1,220 @@
+"""
+This code block defines a fast and safe way to load the road network:
+
+"NetworkSnapshot" holds the whole data set as flat columns
+(city ids, names, country codes, latitude/longitude, country names,
+road endpoints and distances) instead of thousands of City, Road
+and Country objects.
+
+"save_network_snapshot" and "load_network_snapshot" write and read a
+versioned, uncompressed .npz file. Loading never unpickles or
+evaluates anything (allow_pickle=False). All columns are read when
+the snapshot is loaded, but each one is a single binary copy with no
+parsing, so loading costs about as much as reading the file (a few
+milliseconds for this network).
+
+"read_literal_network" parses the original Python-literal files
+(cities_gps.py, countries.py, roads_europe.py) with the ast module.
+Only City(...), Country(...) and Road(...) calls with literal
+arguments are accepted, so a malicious file cannot execute code.
+
+"convert_literal_files" is the one-shot converter from the literal
+files to a snapshot. Run this module as a script to use it:
+
+    python network_snapshot.py
+"""
+
+import argparse
+import ast
+import os
+
+import numpy as np
+
+from csr_graph import dense_index
+
+SNAPSHOT_VERSION = 1
+
+# The data files live next to the modules, wherever the process runs from
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SNAPSHOT = os.path.join(DATA_DIR, "europe_network.npz")
+DEFAULT_CITIES = os.path.join(DATA_DIR, "cities_gps.py")
+DEFAULT_COUNTRIES = os.path.join(DATA_DIR, "countries.py")
+DEFAULT_ROADS = os.path.join(DATA_DIR, "roads_europe.py")
+
+_COLUMNS = (
+    "city_ids",
+    "city_names",
+    "city_country",
+    "latitude",
+    "longitude",
+    "country_ids",
+    "country_names",
+    "road_a",
+    "road_b",
+    "road_distance",
+)
+
+
+class NetworkSnapshot:
+    def __init__(
+        self,
+        city_ids,
+        city_names,
+        city_country,
+        latitude,
+        longitude,
+        country_ids,
+        country_names,
+        road_a,
+        road_b,
+        road_distance,
+    ):
+        self.city_ids = np.asarray(city_ids, dtype=np.int64)
+        self.city_names = np.asarray(city_names, dtype=np.str_)
+        self.city_country = np.asarray(city_country, dtype=np.int32)
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.country_ids = np.asarray(country_ids, dtype=np.int32)
+        self.country_names = np.asarray(country_names, dtype=np.str_)
+        self.road_a = np.asarray(road_a, dtype=np.int64)
+        self.road_b = np.asarray(road_b, dtype=np.int64)
+        self.road_distance = np.asarray(road_distance, dtype=np.float64)
+
+    @property
+    def city_count(self):
+        return len(self.city_ids)
+
+    @property
+    def road_count(self):
+        return len(self.road_a)
+
+    def road_countries(self):
+        # Country codes of both ends of every road, as two arrays
+        index_a = dense_index(self.city_ids, self.road_a)
+        index_b = dense_index(self.city_ids, self.road_b)
+        return self.city_country[index_a], self.city_country[index_b]
+
+    def to_csr_graph(self):
+        from csr_graph import CSRGraph
+
+        return CSRGraph.from_edges(
+            self.city_ids, self.road_a, self.road_b, self.road_distance
+        )
+
+    def __repr__(self):
+        return (
+            f"NetworkSnapshot(cities={self.city_count}, "
+            f"countries={len(self.country_ids)}, roads={self.road_count})"
+        )
+
+
+def save_network_snapshot(snapshot, path=DEFAULT_SNAPSHOT):
+    # Uncompressed on purpose: np.load then copies each column without
+    # decompressing it
+    np.savez(
+        path,
+        format_version=np.array(SNAPSHOT_VERSION),
+        **{column: getattr(snapshot, column) for column in _COLUMNS},
+    )
+
+
+def load_network_snapshot(path=DEFAULT_SNAPSHOT):
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data["format_version"])
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Snapshot '{path}' has format version {version}, "
+                f"expected {SNAPSHOT_VERSION}."
+            )
+        return NetworkSnapshot(**{column: data[column] for column in _COLUMNS})
+
+
+def _literal_call(node, expected):
+    # Accept only Name(...) calls whose arguments are plain literals
+    if (
+        not isinstance(node, ast.Call)
+        or not isinstance(node.func, ast.Name)
+        or node.func.id != expected
+        or node.keywords
+    ):
+        raise ValueError(f"Expected a {expected}(...) entry, got: {ast.dump(node)}")
+    return tuple(ast.literal_eval(argument) for argument in node.args)
+
+
+def _read_literal_file(path, expected):
+    with open(path, "r", encoding="utf-8") as data:
+        tree = ast.parse(data.read(), filename=path, mode="eval").body
+    if isinstance(tree, ast.Dict):
+        return {
+            ast.literal_eval(key): _literal_call(value, expected)
+            for key, value in zip(tree.keys, tree.values)
+        }
+    if isinstance(tree, ast.List):
+        return [_literal_call(element, expected) for element in tree.elts]
+    raise ValueError(f"'{path}' must contain a dict or a list literal.")
+
+
+def read_literal_network(
+    cities_path=DEFAULT_CITIES,
+    countries_path=DEFAULT_COUNTRIES,
+    roads_path=DEFAULT_ROADS,
+):
+    cities = _read_literal_file(cities_path, "City")
+    countries = _read_literal_file(countries_path, "Country")
+    roads = _read_literal_file(roads_path, "Road")
+
+    return NetworkSnapshot(
+        city_ids=list(cities),
+        city_names=[name for name, _, _ in cities.values()],
+        city_country=[country for _, country, _ in cities.values()],
+        latitude=[coordinates[0] for _, _, coordinates in cities.values()],
+        longitude=[coordinates[1] for _, _, coordinates in cities.values()],
+        country_ids=list(countries),
+        country_names=[name for (name,) in countries.values()],
+        road_a=[point_a for point_a, _, _ in roads],
+        road_b=[point_b for _, point_b, _ in roads],
+        road_distance=[distance for _, _, distance in roads],
+    )
+
+
+def convert_literal_files(
+    cities_path=DEFAULT_CITIES,
+    countries_path=DEFAULT_COUNTRIES,
+    roads_path=DEFAULT_ROADS,
+    snapshot_path=DEFAULT_SNAPSHOT,
+):
+    snapshot = read_literal_network(cities_path, countries_path, roads_path)
+    save_network_snapshot(snapshot, snapshot_path)
+    return snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the Python-literal data files into a binary snapshot."
+    )
+    parser.add_argument("--cities", default=DEFAULT_CITIES)
+    parser.add_argument("--countries", default=DEFAULT_COUNTRIES)
+    parser.add_argument("--roads", default=DEFAULT_ROADS)
+    parser.add_argument("-o", "--output", default=DEFAULT_SNAPSHOT)
+    args = parser.parse_args()
+
+    snapshot = convert_literal_files(
+        args.cities, args.countries, args.roads, args.output
+    )
+    print(f"Wrote {snapshot} to {args.output}")
+
+
+"""
+Runtime analysis:
+
+read_literal_network / convert_literal_files:
+Parsing is linear in the size of the text, O(n + r) for n cities
+and r roads. This is only paid once, when the snapshot is created.
+
+load_network_snapshot:
+Reading each column is a single contiguous copy from disk,
+O(n + r) bytes with no per-object Python work.
+
+to_csr_graph:
+O(r log r) inside numpy (see CSRGraph.from_edges).
+"""
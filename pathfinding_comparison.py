@@ -1,5 +1,5 @@
 """
-This code block defines and executes a function that:
+This code block defines and (when run) executes a function that:
 
 Compares the results of the A* algorithm (path_astar) and 
 Dijkstra's algorithm (path_dijkstra) to check if they yield equivalent 
@@ -19,8 +19,8 @@ designed to find the shortest path, albeit with different approaches
 
 import random
 
-from country_removal_simulation import cities_deleted_c, roads_deleted_c, road_map
-from Astar_pathfinding import astar, h_func
+from network_api import load_geodesic_heuristic, load_road_graph, load_scenario
+from Astar_pathfinding import astar
 from dijkstra_shortest_path import dijkstra
 
 
@@ -38,18 +38,27 @@ def check_path_eq(path_astar, path_dijkstra):
         pass
 
 
-for rep in range(5):
-    city1 = random.choice(list(cities_deleted_c.keys()))
-    city2 = random.choice(list(cities_deleted_c.keys()))
-    print(f"{city1} --> {city2}")
-    check_path_eq(
-        astar(city1, city2, h_func, road_map, cities_deleted_c),
-        dijkstra(road_map, city1, city2, cities_deleted_c),
-    )
+def main(removed_countries=None):
+    cities_deleted_c, roads_deleted_c, road_map = load_scenario(removed_countries)
+    road_graph = load_road_graph(removed_countries)
+    geodesic = load_geodesic_heuristic(removed_countries)
+    print(f"Calibrated heuristic: {geodesic}")
 
+    for rep in range(5):
+        city1 = random.choice(list(cities_deleted_c.keys()))
+        city2 = random.choice(list(cities_deleted_c.keys()))
+        print(f"{city1} --> {city2}")
+        check_path_eq(
+            astar(city1, city2, geodesic, road_graph, cities_deleted_c),
+            dijkstra(road_graph, city1, city2, cities_deleted_c),
+        )
 
-# astar(516, 326, h_func, road_map, cities_deleted_c)
-# dijkstra(road_map, 516, 326, cities_deleted_c)
+    # astar(516, 326, geodesic, road_graph, cities_deleted_c)
+    # dijkstra(road_graph, 516, 326, cities_deleted_c)
+
+
+if __name__ == "__main__":
+    main()
 
 
 """
@@ -0,0 +1,94 @@
+"""
+This code block defines the command line entry point for the
+analysis pipeline described in the README.
+
+Each step runs the main() function of the matching module, or the
+function named after a colon ("module:function") for modules whose
+main() parses its own command line.
+The countries to remove are given with --remove (repeatable) instead
+of being typed in for every module. --interactive asks for them once,
+like running country_removal_simulation.py does:
+
+    python pipeline.py dijkstra --remove Germany --remove France
+    python pipeline.py brandes --interactive
+    python pipeline.py all --remove Germany
+
+All steps of one run share the same cached road map and CSR graph
+(see network_api), so "all" removes the countries only once.
+"""
+
+import argparse
+import importlib
+
+# Pipeline steps in README order: (name, module, uses a removal scenario)
+STEPS = (
+    ("distribution", "city_country_distribution", False),
+    ("connectivity", "road_connectivity_analysis", False),
+    ("removal", "country_removal_simulation", True),
+    ("components", "connected_components_analysis", True),
+    ("astar", "Astar_pathfinding", True),
+    ("dijkstra", "dijkstra_shortest_path", True),
+    ("comparison", "pathfinding_comparison", True),
+    ("runtime", "algorithm_performance_analysis", True),
+    ("dijkstra-betweenness", "dijkstra_betweenness", True),
+    ("brandes", "brandes_betweenness", True),
+    ("closeness", "closeness_betweenness_analysis", True),
+    ("centrality", "centrality_analysis", True),
+    # Speed-up indexes built on top of the pipeline
+    ("contraction-hierarchies", "contraction_hierarchies", True),
+    ("landmarks", "landmarks", True),
+    ("arc-flags", "arc_flags", True),
+    ("hub-labels", "hub_labels:build_and_check", True),
+    ("distance-table", "distance_table", True),
+)
+
+
+def run_step(name, removed_countries=()):
+    for step, entry_point, uses_scenario in STEPS:
+        if step == name:
+            module_name, _, function_name = entry_point.partition(":")
+            module = importlib.import_module(module_name)
+            function = getattr(module, function_name or "main")
+            if uses_scenario:
+                return function(removed_countries)
+            return function()
+    raise KeyError(f"Unknown pipeline step '{name}'.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Road network analysis pipeline.")
+    parser.add_argument(
+        "step",
+        choices=[step for step, _, _ in STEPS] + ["all"],
+        help="pipeline step to run ('all' runs every step in order)",
+    )
+    scenario = parser.add_mutually_exclusive_group()
+    scenario.add_argument(
+        "--remove",
+        action="append",
+        default=[],
+        metavar="COUNTRY",
+        help="country to remove from the network (repeatable)",
+    )
+    scenario.add_argument(
+        "--interactive",
+        action="store_true",
+        help="ask for the countries to remove",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    removed_countries = None if args.interactive else tuple(args.remove)
+
+    if args.step == "all":
+        for step, _, _ in STEPS:
+            print(f"\n=== {step} ===")
+            run_step(step, removed_countries)
+    else:
+        run_step(args.step, removed_countries)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 """
-This code block defines and executes a function that:
+This code block defines a function that:
 
 Categorizes roads from roads_dict2 as either "cross-country" 
 (connecting cities in different countries) or "within-country" 
@@ -15,70 +15,72 @@ within-country roads and cross-country roads associated with it.
 
 The function is valuable for analyzing the connectivity of regions
 within and across countries based on the road network data provided.
+
+The counting itself (road_type_counts) works on numpy columns of the
+endpoint country codes, so running the module reads the columns of
+the data set directly instead of building Road objects.
 """
 
-from city_country_distribution import roads_dict, cities_dict, countries_dict
+import numpy as np
+
+from csr_graph import dense_index
+from initialization import load_columns
 
 
 # Check cities of the roads -> check country code of cities -> if != cross country else country country -> attach value to dictionary| Country code is the country code of the city itself, which is the point a or b
-import copy
+def road_type_counts(country_ids, country_a, country_b):
+    # Columnar version: country_a / country_b hold the country codes of the
+    # two ends of every road. Returns (within, cross), the number of
+    # within-country and cross-country roads of every country in
+    # country_ids, counted with bincount instead of a loop over the roads.
+    position_a = dense_index(country_ids, country_a)
+    position_b = dense_index(country_ids, country_b)
+    same = position_a == position_b
+    within = np.bincount(position_a[same], minlength=len(country_ids))
+    # A cross-country road counts for both of its countries
+    cross = np.bincount(position_a[~same], minlength=len(country_ids))
+    cross += np.bincount(position_b[~same], minlength=len(country_ids))
+    return within, cross
+
+
+def print_road_types(country_names, within, cross):
+    # Countries by the number of within-country roads (stable for ties)
+    for k in np.argsort(-within, kind="stable").tolist():
+        print(
+            f"{country_names[k]}",
+            f"| Within: {within[k]} | Cross {cross[k]}",
+        )
+    print(f"Total Within: {within.sum()}")
+    print(f"Total Cross: {cross.sum() // 2}")
 
 
 def detemine_road_type(roads_dict2, cities_dict2, countries_dict2):
-
-    # Initialize counters for cross-country and within-country roads
-    cross = 0
-    within = 0
-
-    # Create copies of the countries_dict2 to track the counts
-    cross_country = copy.deepcopy(countries_dict2)
-    country_country = copy.deepcopy(countries_dict2)
-
-    # Initialize counters for each country to 0
-    for i in range(len(cross_country)):
-        cross_country[i] = 0
-        country_country[i] = 0
-
-    # Iterate through each road in the roads dictionary
-    for road in roads_dict2:
-        # Iterate through each road in the roads dictionary
-        country_code_a = cities_dict2[road.point_a].country_n
-        country_code_b = cities_dict2[road.point_b].country_n
-
-        # Check if the road is within the same country
-        if country_code_a == country_code_b:
-            country_country[country_code_a] += 1
-            within += 1
-
-        # If the road crosses into another country
-        elif country_code_a != country_code_b:
-            cross_country[country_code_a] += 1
-            cross_country[country_code_b] += 1
-            cross += 1
-
-    # Sort the country-country and cross-country counters
-    sorted_items_country = sorted(
-        country_country.items(), key=lambda item: item[1], reverse=True
+    # Object API: collect the endpoint countries once, then count in numpy
+    country_a = np.fromiter(
+        (cities_dict2[road.point_a].country_n for road in roads_dict2),
+        dtype=np.int64,
+        count=len(roads_dict2),
     )
-    sorted_items_cross = sorted(
-        cross_country.items(), key=lambda item: item[1], reverse=True
+    country_b = np.fromiter(
+        (cities_dict2[road.point_b].country_n for road in roads_dict2),
+        dtype=np.int64,
+        count=len(roads_dict2),
     )
+    within, cross = road_type_counts(list(countries_dict2), country_a, country_b)
+    country_names = [country.c_name for country in countries_dict2.values()]
+    print_road_types(country_names, within, cross)
+    return within, cross
 
-    # Convert the sorted lists back into dictionaries
-    cross_dict = dict(sorted_items_cross)
-    country_dict = dict(sorted_items_country)
 
-    # Print the road types for each country
-    for k in country_dict:
-        print(
-            f"{countries_dict2[k].c_name}",
-            f"| Within: {country_dict[k]} | Cross {cross_dict[k]}",
-        )
-    print(f"Total Within: {within}")
-    print(f"Total Cross: {cross}")
+def main():
+    # Read the columns directly, no City or Road objects are needed
+    network = load_columns()
+    within, cross = road_type_counts(network.country_ids, *network.road_countries())
+    print_road_types(network.country_names.tolist(), within, cross)
 
 
-detemine_road_type(roads_dict, cities_dict, countries_dict)
+if __name__ == "__main__":
+    main()
 
 
 """
@@ -89,8 +91,9 @@ O(1) since it involves setting up a fixed number of
 variables and does not depend on the size of the input.
 
 Iterating through Roads: 
-O(r) where r is the total number of roads, 
-as the function checks each road once.
+O(r) where r is the total number of roads. road_type_counts does
+this inside numpy (one lookup per road end and two bincounts),
+so millions of roads need no Python-level loop.
 
 Sorting: 
 O(nlogn), where n is the total number of countries, 
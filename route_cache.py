@@ -0,0 +1,244 @@
+"""
+This code block defines a bounded, thread-safe cache in front of
+dijkstra() and astar():
+
+"RouteCache" stores the paths found for (origin, destination) pairs
+under the version of the CSRGraph they were computed on, so a route
+is never served for a graph whose roads have changed since.
+
+When an origin keeps coming back with new destinations, the cache
+runs one full Dijkstra search from it and keeps the shortest path
+tree. Further routes from that origin are then read from the tree in
+O(length of the path), with exactly the paths dijkstra() returns.
+
+Paths and trees share one LRU order. The least recently used entry
+is evicted once there are more than max_entries entries or their
+estimated size exceeds max_bytes. No tree is built for a graph whose
+tree alone would exceed max_bytes; those misses run the ordinary
+point-to-point search.
+
+The cache registers with csr_graph.on_graph_change: the entries of a
+graph are dropped when its roads change (CSRGraph.set_distance).
+Removing countries builds a new graph with a new version, so the
+entries of other scenarios stay valid and are left in place. stats()
+returns the hit rate and the hit, miss, tree hit, eviction and
+invalidation counters.
+
+"cached_dijkstra" and "cached_astar" have the signatures of dijkstra()
+and astar() and use one shared cache ("route_cache"). Only CSRGraph
+inputs are cached; a road_map dict is converted on every call anyway
+and is passed through unchanged. Failed queries are not cached, so
+their messages are printed as before.
+"""
+
+from collections import OrderedDict
+import sys
+import threading
+
+from csr_graph import CSRGraph, on_graph_change
+from dijkstra_shortest_path import build_path, dijkstra, dijkstra_search
+from Astar_pathfinding import astar
+
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+
+def _path_bytes(path):
+    # list, one tuple per step, the city code and the distance
+    return sys.getsizeof(path) + len(path) * 120
+
+
+def _tree_bytes(n):
+    # two lists of n entries, the distances as float objects
+    return 2 * (56 + 8 * n) + 24 * n
+
+
+class RouteCache:
+    def __init__(
+        self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, tree_after=2
+    ):
+        # tree_after: misses from one origin before its full tree is kept
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tree_after = tree_after
+        self._lock = threading.RLock()
+        # key -> (value, size); keys are (kind, algorithm, version, ...), kind
+        # "route" for a path and "tree" for a shortest path tree
+        self._entries = OrderedDict()
+        self._origin_misses = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.tree_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+        on_graph_change(self.invalidate)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self.bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def dijkstra(self, map, origin, destination, cities_dict5):
+        if not isinstance(map, CSRGraph):
+            return dijkstra(map, origin, destination, cities_dict5)
+        graph = map
+        version = graph.version
+        key = ("route", "dijkstra", version, origin, destination)
+        path = self._get(key)
+        if path is not None:
+            self._count(True)
+            return list(path)
+
+        # A route read from a cached tree counts as a hit as well
+        path, from_cache = self._from_tree(graph, version, origin, destination)
+        self._count(from_cache)
+        if path is None:
+            path = dijkstra(graph, origin, destination, cities_dict5)
+        if path and graph.version == version:
+            self._put(key, tuple(path), _path_bytes(path))
+        return path
+
+    def _from_tree(self, graph, version, origin, destination):
+        # (path, whether a cached tree gave it) from the shortest path tree of
+        # origin, building the tree once the origin has missed tree_after
+        # times; the path is None if the tree cannot give it
+        if origin not in graph or destination not in graph:
+            return None, False
+        if _tree_bytes(len(graph)) > self.max_bytes:
+            # the tree could never be kept, so every miss would pay for a
+            # whole-graph search; dijkstra() stops at the destination instead
+            return None, False
+        tree_key = ("tree", "dijkstra", version, origin)
+        tree = self._get(tree_key)
+        from_cache = tree is not None
+        if tree is None:
+            with self._lock:
+                if len(self._origin_misses) > self.max_entries:
+                    self._origin_misses.clear()
+                misses = self._origin_misses.get((version, origin), 0) + 1
+                self._origin_misses[(version, origin)] = misses
+            if misses < self.tree_after:
+                return None, False
+            tree = dijkstra_search(graph, graph.index_of[origin])
+            if graph.version == version:
+                self._put(tree_key, tree, _tree_bytes(len(graph)))
+
+        dist, pred = tree
+        target = graph.index_of[destination]
+        if dist[target] == float("inf"):
+            # dijkstra() runs again to report the missing path
+            return None, False
+        if from_cache:
+            with self._lock:
+                self.tree_hits += 1
+        return build_path(graph, dist, pred, target), from_cache
+
+    def astar(self, start, goal, h_func, road_map, cities_dict4):
+        # The heuristic is part of the key: an inadmissible one (manhattan)
+        # may return a longer path than another heuristic
+        if not isinstance(road_map, CSRGraph):
+            return astar(start, goal, h_func, road_map, cities_dict4)
+        version = road_map.version
+        key = ("route", "astar", version, h_func, start, goal)
+        path = self._get(key)
+        self._count(path is not None)
+        if path is not None:
+            return list(path)
+
+        path = astar(start, goal, h_func, road_map, cities_dict4)
+        # astar returns a message or None when there is no path
+        if isinstance(path, list) and path and road_map.version == version:
+            self._put(key, tuple(path), _path_bytes(path))
+        return path
+
+    def invalidate(self, version=None):
+        # Drop the entries of one graph version, or all of them for None
+        with self._lock:
+            if version is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._origin_misses.clear()
+                self.bytes = 0
+            else:
+                stale = [key for key in self._entries if key[2] == version]
+                for key in stale:
+                    self.bytes -= self._entries.pop(key)[1]
+                self._origin_misses = {
+                    key: misses
+                    for key, misses in self._origin_misses.items()
+                    if key[0] != version
+                }
+                dropped = len(stale)
+            if dropped:
+                self.invalidations += 1
+            return dropped
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "tree_hits": self.tree_hits,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+route_cache = RouteCache()
+
+
+def cached_dijkstra(map, origin, destination, cities_dict5):
+    return route_cache.dijkstra(map, origin, destination, cities_dict5)
+
+
+def cached_astar(start, goal, h_func, road_map, cities_dict4):
+    return route_cache.astar(start, goal, h_func, road_map, cities_dict4)
+
+
+"""
+Runtime analysis:
+
+Hit: O(1) dictionary lookup plus O(length of the path) for the copy
+that is returned.
+
+Miss: one search as without the cache. After tree_after misses from
+the same origin one full Dijkstra search, O((V+E) log V), after which
+every route from that origin costs O(length of the path).
+
+Memory: about 120 bytes per step of a cached path and 40 bytes per
+city for a tree, bounded by max_bytes. Invalidating one version is
+O(entries); dropping everything is O(1).
+"""
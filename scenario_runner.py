@@ -0,0 +1,255 @@
+"""
+This code block defines a batch runner for what-if removal scenarios.
+
+A scenario file is a JSON list. Every entry names a scenario, the
+countries to remove and, optionally, single roads to close (given as
+pairs of city codes, e.g. border crossings):
+
+    [
+        {"name": "no-germany", "remove": ["Germany"]},
+        {"name": "de-fr", "remove": ["Germany", "France"]},
+        {"name": "pyrenees-closed", "close": [[228, 489], [172, 486]]}
+    ]
+
+For every scenario the runner reports:
+
+- the remaining, removed and isolated cities and the remaining roads,
+- the number of connected components and the size of the largest one,
+- the reachability loss: the share of the city pairs that were
+  connected in the full network and are no longer connected,
+- centrality shifts: the city with the highest betweenness and the
+  city whose betweenness grew the most compared with the full network.
+
+The masks of all scenarios are computed up front with the
+RemovalIndex of country_removal_simulation.py. The scenarios then run
+on a process pool; the base graph is put into shared memory once and
+every task only carries the node and arc masks of its scenario.
+
+The results are written as one CSV table:
+
+    python scenario_runner.py scenarios.json -o results.csv --workers 4
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import os
+
+import numpy as np
+
+from csr_graph import CSRGraph
+from connected_components_analysis import component_labels
+from brandes_betweenness import approximate_betweenness, brandes_betweenness
+from network_api import load_removal_index
+
+RESULT_COLUMNS = (
+    "scenario",
+    "removed_countries",
+    "closed_roads",
+    "cities",
+    "roads",
+    "removed_cities",
+    "isolated_cities",
+    "components",
+    "largest_component",
+    "reachable_pairs",
+    "reachability_loss",
+    "top_betweenness_city",
+    "top_betweenness",
+    "betweenness_gain_city",
+    "betweenness_gain",
+)
+
+BETWEENNESS_MODES = ("exact", "approximate", "none")
+
+# Base graph attached by each worker process of the pool
+_worker_graph = None
+
+
+def load_scenarios(path):
+    with open(path, "r", encoding="utf-8") as data:
+        entries = json.load(data)
+    if not isinstance(entries, list):
+        raise ValueError(f"'{path}' must contain a list of scenarios.")
+
+    scenarios = []
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Scenario {number} in '{path}' is not an object.")
+        scenarios.append(
+            {
+                "name": str(entry.get("name", f"scenario-{number}")),
+                "remove": tuple(entry.get("remove", ())),
+                "close": tuple(tuple(pair) for pair in entry.get("close", ())),
+            }
+        )
+    return scenarios
+
+
+def _attach_graph(block_name, layout):
+    from multiprocessing import shared_memory
+
+    global _worker_graph
+    _worker_graph = CSRGraph.from_shared_memory(
+        shared_memory.SharedMemory(name=block_name), layout
+    )
+
+
+def evaluate_scenario(base_graph, node_mask, arc_mask, betweenness="exact", seed=None):
+    # Graph measures of one scenario, computed on the masked base graph
+    graph = base_graph.subgraph(node_mask, arc_mask)
+    labels, count = component_labels(graph)
+    sizes = np.bincount(np.array(labels, dtype=np.int64), minlength=count)
+    degree = np.diff(np.frombuffer(graph.offsets, dtype=np.int64))
+    result = {
+        "cities": len(graph),
+        "isolated_cities": int((degree == 0).sum()),
+        "components": count,
+        "largest_component": int(sizes.max()) if count else 0,
+        # ordered pairs of distinct cities in the same component
+        "reachable_pairs": int((sizes * (sizes - 1)).sum()),
+        "betweenness": None,
+    }
+
+    cities = {city: None for city in graph.city_ids}
+    if betweenness == "exact":
+        result["betweenness"] = brandes_betweenness(graph, cities)
+    elif betweenness == "approximate":
+        result["betweenness"], _ = approximate_betweenness(
+            graph, cities, epsilon=0.05, seed=seed
+        )
+    elif betweenness != "none":
+        raise ValueError(f"Unknown betweenness mode '{betweenness}'.")
+    return result
+
+
+def _evaluate_task(task):
+    node_mask, arc_mask, betweenness, seed = task
+    return evaluate_scenario(
+        _worker_graph,
+        np.frombuffer(node_mask, dtype=bool),
+        np.frombuffer(arc_mask, dtype=bool),
+        betweenness,
+        seed,
+    )
+
+
+def _result_row(scenario, removal, result, base):
+    row = {
+        "scenario": scenario["name"],
+        "removed_countries": ";".join(scenario["remove"]),
+        "closed_roads": ";".join(f"{a}-{b}" for a, b in scenario["close"]),
+        "cities": result["cities"],
+        "roads": removal.road_count,
+        "removed_cities": base["cities"] - result["cities"],
+        "isolated_cities": result["isolated_cities"],
+        "components": result["components"],
+        "largest_component": result["largest_component"],
+        "reachable_pairs": result["reachable_pairs"],
+        "reachability_loss": (
+            1 - result["reachable_pairs"] / base["reachable_pairs"]
+            if base["reachable_pairs"]
+            else 0.0
+        ),
+    }
+    scores = result["betweenness"]
+    if scores:
+        top_city = max(scores, key=scores.get)
+        gains = {city: scores[city] - base["betweenness"][city] for city in scores}
+        gain_city = max(gains, key=gains.get)
+        row.update(
+            top_betweenness_city=top_city,
+            top_betweenness=scores[top_city],
+            betweenness_gain_city=gain_city,
+            betweenness_gain=gains[gain_city],
+        )
+    return row
+
+
+def run_scenarios(scenarios, workers=None, betweenness="exact", seed=None):
+    # Returns one result row (a dict with RESULT_COLUMNS) per scenario.
+    # The full network is evaluated first as the baseline for the shifts.
+    index = load_removal_index()
+    base_graph = index.graph
+    removals = [index.remove(s["remove"], s["close"]) for s in scenarios]
+    tasks = [(np.ones(len(base_graph), dtype=bool), None)]
+    tasks += [(removal.node_mask, removal.arc_mask()) for removal in removals]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        results = [
+            evaluate_scenario(base_graph, node_mask, arc_mask, betweenness, seed)
+            for node_mask, arc_mask in tasks
+        ]
+    else:
+        all_arcs = np.ones(base_graph.edge_count, dtype=bool)
+        payload = [
+            (
+                node_mask.tobytes(),
+                (all_arcs if arc_mask is None else arc_mask).tobytes(),
+                betweenness,
+                seed,
+            )
+            for node_mask, arc_mask in tasks
+        ]
+        block, layout = base_graph.to_shared_memory()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(tasks)),
+                initializer=_attach_graph,
+                initargs=(block.name, layout),
+            ) as pool:
+                results = list(pool.map(_evaluate_task, payload))
+        finally:
+            block.close()
+            block.unlink()
+
+    base = results[0]
+    return [
+        _result_row(scenario, removal, result, base)
+        for scenario, removal, result in zip(scenarios, removals, results[1:])
+    ]
+
+
+def write_results(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as output:
+        writer = csv.DictWriter(output, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a batch of country/road removal scenarios."
+    )
+    parser.add_argument("scenarios", help="JSON file with the scenarios")
+    parser.add_argument("-o", "--output", default="scenario_results.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--betweenness", choices=BETWEENNESS_MODES, default="exact")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    rows = run_scenarios(
+        load_scenarios(args.scenarios), args.workers, args.betweenness, args.seed
+    )
+    write_results(rows, args.output)
+    print(f"Wrote {len(rows)} scenarios to {args.output}")
+    return rows
+
+
+if __name__ == "__main__":
+    main()
+
+
+"""
+Runtime analysis:
+
+Building the masks costs O(n + r) per scenario in the parent process.
+Each scenario then needs O(n + m) for the masked graph and the
+components, plus O(n m log n) for exact betweenness (the dominant
+part) or O(r' m log n) for r' sampled paths with --betweenness
+approximate. The scenarios are independent, so with w workers the
+wall time drops to about 1/w of the serial run.
+"""
@@ -0,0 +1,17 @@
+import itertools
+
+from Astar_pathfinding import bidirectional_astar
+from landmarks import LandmarkIndex
+
+
+def test_bidirectional_astar_matches_dijkstra(graph, cities, shortest, check_route):
+    # Landmark bounds are consistent, as bidirectional_astar requires
+    landmarks = LandmarkIndex.build(graph, k=3, seed=1)
+    for origin, destination in itertools.product(range(1, 25), repeat=2):
+        path = bidirectional_astar(origin, destination, landmarks, graph, cities)
+        check_route(path, origin, destination, shortest[origin, destination])
+
+
+def test_bidirectional_astar_without_path(graph, cities):
+    landmarks = LandmarkIndex.build(graph, k=3, seed=1)
+    assert bidirectional_astar(1, 99, landmarks, graph, cities) is None
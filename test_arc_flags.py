@@ -0,0 +1,33 @@
+import itertools
+
+import pytest
+
+from arc_flags import ArcFlags
+from landmarks import LandmarkIndex
+
+
+@pytest.mark.parametrize("levels", [0, 2])
+def test_query_matches_dijkstra(graph, cities, shortest, check_route, levels):
+    flags = ArcFlags.build(graph, cities, levels)
+    for origin, destination in itertools.product(range(1, 25), repeat=2):
+        path = flags.query(origin, destination)
+        check_route(path, origin, destination, shortest[origin, destination])
+    assert flags.query(1, 99) == []
+
+
+def test_astar_matches_dijkstra(graph, cities, shortest, check_route):
+    flags = ArcFlags.build(graph, cities)
+    landmarks = LandmarkIndex.build(graph, k=3, seed=1)
+    for origin, destination in itertools.product(range(1, 25), repeat=2):
+        path = flags.astar(origin, destination, landmarks, cities)
+        check_route(path, origin, destination, shortest[origin, destination])
+
+
+def test_save_and_load(graph, cities, tmp_path):
+    flags = ArcFlags.build(graph, cities)
+    flags.save(tmp_path / "flags.npz")
+    loaded = ArcFlags.load(tmp_path / "flags.npz", graph)
+    assert (loaded.flags == flags.flags).all()
+    graph.set_distance(1, 2, 100)
+    with pytest.raises(ValueError, match="built for another graph"):
+        ArcFlags.load(tmp_path / "flags.npz", graph)
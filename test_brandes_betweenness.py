@@ -0,0 +1,82 @@
+import itertools
+import random
+
+import pytest
+
+from brandes_betweenness import brandes_betweenness, top_k_betweenness
+from csr_graph import CSRGraph
+
+
+def naive_betweenness(road_map):
+    # Sum over all pairs s, t of the share of shortest s-t paths through v,
+    # from all-pairs distances and shortest path counts
+    cities = list(road_map)
+    dist = {(s, t): float("inf") for s in cities for t in cities}
+    for s in cities:
+        dist[s, s] = 0
+        for t, distance in road_map[s].items():
+            dist[s, t] = min(dist[s, t], distance)
+    for v, s, t in itertools.product(cities, repeat=3):
+        dist[s, t] = min(dist[s, t], dist[s, v] + dist[v, t])
+
+    paths = {}
+    for s in cities:
+        # count the paths in order of distance, so predecessors come first
+        for t in sorted(cities, key=lambda t: dist[s, t]):
+            if t == s:
+                paths[s, t] = 1
+                continue
+            paths[s, t] = sum(
+                paths[s, u]
+                for u in cities
+                if t in road_map[u] and dist[s, u] + road_map[u][t] == dist[s, t]
+            )
+
+    scores = {city: 0.0 for city in cities}
+    for s, t in itertools.combinations(cities, 2):
+        if dist[s, t] == float("inf"):
+            continue
+        for v in cities:
+            if v not in (s, t) and dist[s, v] + dist[v, t] == dist[s, t]:
+                scores[v] += paths[s, v] * paths[v, t] / paths[s, t]
+    return scores
+
+
+def random_road_map(n, roads, seed):
+    # Small integer lengths give many shortest paths of equal length
+    rng = random.Random(seed)
+    road_map = {city: {} for city in range(n)}
+    while sum(len(neighbors) for neighbors in road_map.values()) < 2 * roads:
+        a, b = rng.sample(range(n), 2)
+        road_map[a][b] = road_map[b][a] = rng.randint(1, 4)
+    return road_map
+
+
+def test_stale_queue_entries():
+    # City 2 is queued at 10 from city 1, then at 2 through city 3; the
+    # stale entry must not add its shortest paths a second time
+    road_map = {
+        1: {2: 10, 3: 1},
+        2: {1: 10, 3: 1, 4: 1},
+        3: {1: 1, 2: 1, 5: 1},
+        4: {2: 1, 5: 1},
+        5: {3: 1, 4: 1},
+    }
+    expected = naive_betweenness(road_map)
+    scores = brandes_betweenness(CSRGraph.from_road_map(road_map), road_map)
+    assert scores == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_naive_count(seed):
+    road_map = random_road_map(12, 20, seed)
+    expected = naive_betweenness(road_map)
+    scores = brandes_betweenness(CSRGraph.from_road_map(road_map), road_map)
+    assert scores == pytest.approx(expected)
+
+
+def test_top_k_without_samples():
+    road_map = random_road_map(12, 20, 0)
+    graph = CSRGraph.from_road_map(road_map)
+    top = top_k_betweenness(graph, road_map, 3, max_samples=0)
+    assert top == [(0, 0.0, (0.0, 0.0)), (1, 0.0, (0.0, 0.0)), (2, 0.0, (0.0, 0.0))]
@@ -0,0 +1,40 @@
+import pytest
+
+from connected_components_analysis import component_labels, removal_sweep
+from country_removal_simulation import RemovalIndex
+
+
+@pytest.fixture
+def index(network):
+    countries, cities, roads = network
+    return RemovalIndex(roads, cities, countries)
+
+
+def components(scenario):
+    # Number of components and largest component from a full traversal
+    labels, count = component_labels(scenario.to_csr_graph())
+    return count, max((labels.count(label) for label in range(count)), default=0)
+
+
+def test_sweep_matches_traversal(index, network):
+    _, _, roads = network
+    steps = [
+        (roads[3].point_a, roads[3].point_b),
+        "Utopia",
+        (roads[20].point_a, roads[20].point_b),
+        (roads[0].point_a, roads[0].point_b),
+        "Atlantis",
+        "Utopia",
+    ]
+    history = removal_sweep(index, steps)
+    assert len(history) == len(steps) + 1
+    for step, result in enumerate(history):
+        countries = [item for item in steps[:step] if isinstance(item, str)]
+        closed = [item for item in steps[:step] if not isinstance(item, str)]
+        scenario = index.remove(dict.fromkeys(countries), closed)
+        assert result == components(scenario)
+
+
+def test_unknown_road(index):
+    with pytest.raises(KeyError, match="There is no road between 1 and 99"):
+        removal_sweep(index, [(1, 99)])
@@ -0,0 +1,18 @@
+import itertools
+
+from contraction_hierarchies import ContractionHierarchy
+
+
+def test_query_matches_dijkstra(graph, cities, shortest, check_route):
+    ch = ContractionHierarchy.build(graph)
+    for origin, destination in itertools.product(range(1, 25), repeat=2):
+        assert ch.distance(origin, destination) == shortest[origin, destination]
+        path = ch.query(origin, destination)
+        check_route(path, origin, destination, shortest[origin, destination])
+
+
+def test_query_without_path(graph):
+    ch = ContractionHierarchy.build(graph)
+    assert ch.distance(1, 99) == float("inf")
+    assert ch.query(1, 99) == []
+    assert ch.query(1, 404) == []
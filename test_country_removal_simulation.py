@@ -0,0 +1,33 @@
+import pytest
+
+from country_removal_simulation import RemovalIndex
+from initialization import City, Country, Road
+
+
+@pytest.fixture
+def index():
+    countries = {1: Country("Atlantis"), 2: Country("Utopia")}
+    cities = {
+        10: City("Poseidonia", 1, (0.0, 0.0)),
+        11: City("Kleito", 1, (0.0, 1.0)),
+        20: City("Amaurot", 2, (1.0, 1.0)),
+    }
+    roads = [Road(10, 11, 5), Road(11, 20, 7)]
+    return RemovalIndex(roads, cities, countries)
+
+
+def test_remove_country(index):
+    scenario = index.remove(["Atlantis"])
+    assert list(scenario.cities()) == [20]
+    assert scenario.road_count == 0
+    assert scenario.not_connected() == [20]
+
+
+def test_country_listed_twice(index):
+    with pytest.raises(ValueError, match="'Utopia' is listed more than once"):
+        index.remove(["Utopia", "Atlantis", "Utopia"])
+
+
+def test_unknown_country(index):
+    with pytest.raises(KeyError, match="'Lemuria' is not in the dataset"):
+        index.remove(["Lemuria"])
@@ -0,0 +1,14 @@
+import itertools
+
+from dijkstra_shortest_path import bidirectional_dijkstra
+
+
+def test_bidirectional_matches_dijkstra(graph, cities, shortest, check_route):
+    for origin, destination in itertools.product(range(1, 25), repeat=2):
+        path = bidirectional_dijkstra(graph, origin, destination, cities)
+        check_route(path, origin, destination, shortest[origin, destination])
+
+
+def test_bidirectional_without_path(graph, cities):
+    assert bidirectional_dijkstra(graph, 1, 99, cities) == []
+    assert bidirectional_dijkstra(graph, 1, 404, cities) == []
@@ -0,0 +1,26 @@
+import pytest
+
+from distance_table import distance_table, one_to_many
+
+
+@pytest.mark.parametrize("method", ["dijkstra", "buckets"])
+def test_table_matches_dijkstra(graph, cities, shortest, method):
+    origins = [1, 5, 99, 12, 5]
+    destinations = [24, 1, 99, 404, 7, 13]
+    table = distance_table(graph, origins, destinations, method)
+    assert table.shape == (len(origins), len(destinations))
+    for row, origin in enumerate(origins):
+        for column, destination in enumerate(destinations):
+            expected = shortest.get((origin, destination), float("inf"))
+            assert table[row, column] == expected
+
+
+def test_one_to_many(graph, shortest):
+    destinations = list(range(1, 25))
+    row = one_to_many(graph, 3, destinations)
+    assert row.tolist() == [shortest[3, destination] for destination in destinations]
+
+
+def test_unknown_method(graph):
+    with pytest.raises(ValueError, match="Unknown distance table method"):
+        distance_table(graph, [1], [2], method="floyd")
@@ -0,0 +1,26 @@
+import itertools
+
+import pytest
+
+from hub_labels import HubLabels
+
+
+def test_distance_matches_dijkstra(graph, cities, shortest):
+    labels = HubLabels.build(graph)
+    for origin, destination in itertools.product(cities, repeat=2):
+        assert labels.distance(origin, destination) == shortest[origin, destination]
+    assert labels.distance(1, 404) == float("inf")
+
+
+def test_save_and_load(graph, cities, shortest, tmp_path):
+    HubLabels.build(graph).save(tmp_path / "labels")
+    labels = HubLabels.load(tmp_path / "labels", graph)
+    for origin, destination in itertools.product(cities, repeat=2):
+        assert labels.distance(origin, destination) == shortest[origin, destination]
+
+
+def test_changed_roads(graph):
+    labels = HubLabels.build(graph)
+    graph.set_distance(1, 2, 100)
+    with pytest.raises(ValueError, match="rebuild it"):
+        labels.distance(1, 2)
@@ -0,0 +1,27 @@
+import itertools
+
+import pytest
+
+from Astar_pathfinding import astar
+from landmarks import LandmarkIndex
+
+
+@pytest.mark.parametrize("strategy", ["farthest", "avoid"])
+def test_lower_bounds(graph, cities, shortest, strategy):
+    landmarks = LandmarkIndex.build(graph, k=4, strategy=strategy, seed=1)
+    for origin, destination in itertools.product(cities, repeat=2):
+        assert landmarks(origin, destination) <= shortest[origin, destination]
+
+
+def test_alt_matches_dijkstra(graph, cities, shortest, check_route):
+    landmarks = LandmarkIndex.build(graph, k=4, seed=1)
+    for origin, destination in itertools.product(range(1, 25), repeat=2):
+        path = astar(origin, destination, landmarks, graph, cities)
+        check_route(path, origin, destination, shortest[origin, destination])
+
+
+def test_changed_roads(graph):
+    landmarks = LandmarkIndex.build(graph, k=4, seed=1)
+    graph.set_distance(1, 2, 100)
+    with pytest.raises(ValueError, match="rebuild it"):
+        landmarks(1, 2)
@@ -0,0 +1,47 @@
+import gc
+import weakref
+
+from csr_graph import CSRGraph
+from route_cache import RouteCache
+
+
+def test_repeated_queries(graph, cities, shortest, check_route):
+    cache = RouteCache(tree_after=2)
+    for destination in range(1, 25):
+        path = cache.dijkstra(graph, 1, destination, cities)
+        check_route(path, 1, destination, shortest[1, destination])
+    path = cache.dijkstra(graph, 1, 24, cities)
+    check_route(path, 1, 24, shortest[1, 24])
+    stats = cache.stats()
+    # two misses build the tree of city 1, which answers the rest
+    assert (stats["hits"], stats["misses"], stats["tree_hits"]) == (23, 2, 22)
+
+
+def test_changed_roads(graph, road_map, cities, check_route):
+    cache = RouteCache()
+    other = CSRGraph.from_road_map(road_map)
+    cache.dijkstra(graph, 1, 24, cities)
+    cache.dijkstra(other, 1, 24, cities)
+    entries = len(cache)
+
+    graph.set_distance(1, 2, 100)
+    assert len(cache) < entries
+    assert cache.stats()["invalidations"] == 1
+    road_map[1][2] = road_map[2][1] = 100
+    expected = CSRGraph.from_road_map(road_map)
+    path = cache.dijkstra(graph, 1, 2, cities)
+    check_route(path, 1, 2, cache.dijkstra(expected, 1, 2, cities)[-1][1])
+    # the entries of the other graph stay valid
+    misses = cache.stats()["misses"]
+    cache.dijkstra(other, 1, 24, cities)
+    assert cache.stats()["misses"] == misses
+
+
+def test_cache_is_collected(graph, cities):
+    cache = RouteCache()
+    cache.dijkstra(graph, 1, 24, cities)
+    reference = weakref.ref(cache)
+    del cache
+    gc.collect()
+    assert reference() is None
+    graph.set_distance(1, 2, 100)